@@ -1,15 +1,34 @@
+import contextlib
+import io
+import os
+import queue
+import time
 import streamlit as st
-import tensorflow as tf
 import numpy as np
-import json
 from PIL import Image
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime
+
+import build_assets
+import embeddings
+import inference
+import metrics
+import similarity
+import tiling
+from inference import load_image
+from batching import DynamicBatcher
+from pipeline import DECODE_ERRORS, IngestPipeline
+from prediction_cache import cache_from_env, cache_key, content_digest
+from taxonomy import Taxonomy
+from tta import AdaptiveTTA
 
 # ===============================================================
 # Plant Disease Classifier - Professional Enhanced Version
 # ===============================================================
+# TensorFlow, pandas and plotly are imported lazily on the Disease Detection
+# path so Home and About render without waiting for them; the model itself
+# loads on a background thread started at boot. benchmarks/bench_startup.py
+# enforces the cold-start budget.
+
+SCRIPT_START = time.perf_counter()
 
 st.set_page_config(
     page_title="Plant Disease Classifier",
@@ -18,610 +37,243 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling of whole script runs (?profile=1 or PLANT_PROFILE=1). The
+# profiler module is only imported when asked for, so normal runs pay nothing.
+PROFILE_RUN = st.query_params.get("profile") == "1" or os.environ.get("PLANT_PROFILE") == "1"
+
+def keep_profile(artifacts, limit=5):
+    """Remember the last few profiled runs of this session for download"""
+    profiles = st.session_state.setdefault("profiles", [])
+    profiles.append(artifacts)
+    del profiles[:-limit]
+
+if PROFILE_RUN:
+    import profiling
+    # A run that ended early (an exception, st.stop(), a rerun requested
+    # mid-run) never reached the stop at the bottom; save its profile first
+    profiling.finish_interrupted(st.session_state.get("run_profiler"), keep_profile)
+    run_profiler = st.session_state["run_profiler"] = profiling.RunProfiler().start()
+
+def count_section(name):
+    """Count one execution of a script section; the ?debug=1 panel shows the totals"""
+    metrics.count("plant_script_sections", "Script section executions", section=name)
+
+count_section("page_setup")
+
 # =======================
 # Enhanced CSS Styling - Netflix Professional Theme
 # =======================
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&display=swap');
-    
-    * {
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .main {
-        background: linear-gradient(135deg, #0f172a 0%, #1e293b 50%, #334155 100%);
-        padding: 2rem;
-        min-height: 100vh;
-    }
-    
-    /* Animated Background */
-    @keyframes gradient {
-        0% { background-position: 0% 50%; }
-        50% { background-position: 100% 50%; }
-        100% { background-position: 0% 50%; }
-    }
-    
-    /* Hero Section with Animation */
-    .hero-section {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 50%, #d946ef 100%);
-        background-size: 200% 200%;
-        animation: gradient 8s ease infinite;
-        padding: 4rem 2rem;
-        border-radius: 24px;
-        text-align: center;
-        color: white;
-        margin-bottom: 3rem;
-        box-shadow: 0 20px 60px rgba(139, 92, 246, 0.4);
-        position: relative;
-        overflow: hidden;
-        transition: all 0.6s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    .hero-section:hover {
-        transform: scale(1.01);
-        box-shadow: 0 25px 70px rgba(139, 92, 246, 0.5);
-    }
-    
-    .hero-section::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        bottom: 0;
-        background: radial-gradient(circle at 30% 50%, rgba(255,255,255,0.1) 0%, transparent 50%);
-        animation: pulse 4s ease-in-out infinite;
-    }
-    
-    @keyframes pulse {
-        0%, 100% { opacity: 0.5; }
-        50% { opacity: 1; }
-    }
-    
-    .hero-title {
-        font-size: 3.5rem;
-        font-weight: 800;
-        margin-bottom: 1rem;
-        color: white;
-        position: relative;
-        z-index: 1;
-        text-shadow: 0 4px 20px rgba(0,0,0,0.3);
-        letter-spacing: -1px;
-    }
-    
-    .hero-subtitle {
-        font-size: 1.3rem;
-        font-weight: 400;
-        opacity: 0.95;
-        color: white;
-        position: relative;
-        z-index: 1;
-    }
-    
-    /* Glassmorphism Cards - Netflix Style */
-    .glass-card {
-        background: rgba(255, 255, 255, 0.08);
-        backdrop-filter: blur(20px);
-        -webkit-backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        padding: 2rem;
-        border-radius: 20px;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-        margin-bottom: 2rem;
-        transition: all 0.6s cubic-bezier(0.4, 0, 0.2, 1);
-        position: relative;
-        overflow: hidden;
-        opacity: 0;
-        transform: translateY(30px);
-        animation: netflixFadeIn 0.8s ease forwards;
-    }
-    
-    @keyframes netflixFadeIn {
-        to {
-            opacity: 1;
-            transform: translateY(0);
-        }
-    }
-    
-    .glass-card::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255,255,255,0.1), transparent);
-        transition: left 0.7s;
-    }
-    
-    .glass-card:hover::before {
-        left: 100%;
-    }
-    
-    .glass-card:hover {
-        transform: translateY(-10px) scale(1.03);
-        box-shadow: 0 20px 60px rgba(139, 92, 246, 0.4);
-        border-color: rgba(139, 92, 246, 0.5);
-    }
-    
-    .glass-card h3 {
-        color: #e0e7ff;
-        margin-bottom: 1rem;
-        font-size: 1.4rem;
-        font-weight: 700;
-    }
-    
-    .glass-card p, .glass-card li {
-        color: #cbd5e1;
-        line-height: 1.8;
-        font-size: 1rem;
-    }
-    
-    /* Stats Card with Gradient */
-    .stat-card {
-        background: linear-gradient(135deg, rgba(99, 102, 241, 0.2) 0%, rgba(139, 92, 246, 0.2) 100%);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(139, 92, 246, 0.3);
-        padding: 2rem;
-        border-radius: 20px;
-        text-align: center;
-        margin-bottom: 1.5rem;
-        transition: all 0.6s cubic-bezier(0.4, 0, 0.2, 1);
-        position: relative;
-        overflow: hidden;
-        cursor: pointer;
-    }
-    
-    .stat-card::after {
-        content: '';
-        position: absolute;
-        top: 50%;
-        left: 50%;
-        width: 0;
-        height: 0;
-        border-radius: 50%;
-        background: rgba(255, 255, 255, 0.1);
-        transform: translate(-50%, -50%);
-        transition: width 0.8s, height 0.8s;
-    }
-    
-    .stat-card:hover::after {
-        width: 400px;
-        height: 400px;
-    }
-    
-    .stat-card:hover {
-        transform: translateY(-12px) scale(1.05);
-        box-shadow: 0 25px 70px rgba(139, 92, 246, 0.5);
-        border-color: rgba(139, 92, 246, 0.7);
-    }
-    
-    .stat-number {
-        font-size: 3rem;
-        font-weight: 800;
-        background: linear-gradient(135deg, #a78bfa 0%, #c084fc 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        margin: 1rem 0;
-        position: relative;
-        z-index: 1;
-    }
-    
-    .stat-label {
-        font-size: 1rem;
-        color: #cbd5e1;
-        font-weight: 500;
-        position: relative;
-        z-index: 1;
-    }
-    
-    /* Primary Prediction Card */
-    .primary-prediction {
-        background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-        background-size: 200% 200%;
-        animation: gradient 6s ease infinite;
-        color: white;
-        padding: 2.5rem;
-        border-radius: 20px;
-        margin: 2rem 0;
-        box-shadow: 0 20px 60px rgba(16, 185, 129, 0.4);
-        position: relative;
-        overflow: hidden;
-        opacity: 0;
-        transform: scale(0.9);
-        animation: netflixScaleIn 0.6s ease forwards;
-    }
-    
-    @keyframes netflixScaleIn {
-        to {
-            opacity: 1;
-            transform: scale(1);
-        }
-    }
-    
-    .primary-prediction::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        left: -50%;
-        width: 200%;
-        height: 200%;
-        background: radial-gradient(circle, rgba(255,255,255,0.1) 0%, transparent 70%);
-        animation: rotate 10s linear infinite;
-    }
-    
-    @keyframes rotate {
-        from { transform: rotate(0deg); }
-        to { transform: rotate(360deg); }
-    }
-    
-    .prediction-title {
-        font-size: 0.95rem;
-        font-weight: 600;
-        opacity: 0.9;
-        margin-bottom: 0.5rem;
-        color: white;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        position: relative;
-        z-index: 1;
-    }
-    
-    .prediction-result {
-        font-size: 2.2rem;
-        font-weight: 700;
-        margin: 1rem 0;
-        color: white;
-        position: relative;
-        z-index: 1;
-        text-shadow: 0 4px 20px rgba(0,0,0,0.2);
-    }
-    
-    .confidence-badge {
-        background: rgba(255,255,255,0.25);
-        backdrop-filter: blur(10px);
-        padding: 0.7rem 2rem;
-        border-radius: 30px;
-        display: inline-block;
-        font-size: 1.1rem;
-        font-weight: 600;
-        margin-top: 1rem;
-        color: white;
-        position: relative;
-        z-index: 1;
-        border: 1px solid rgba(255,255,255,0.3);
-    }
-    
-    /* Analysis Metric Card */
-    .metric-card {
-        background: linear-gradient(135deg, rgba(99, 102, 241, 0.15) 0%, rgba(139, 92, 246, 0.15) 100%);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(139, 92, 246, 0.3);
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin-bottom: 1rem;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    .metric-card:hover {
-        transform: translateX(8px);
-        border-color: rgba(139, 92, 246, 0.6);
-        box-shadow: 0 10px 30px rgba(139, 92, 246, 0.3);
-    }
-    
-    .metric-label {
-        font-size: 0.9rem;
-        color: #94a3b8;
-        font-weight: 500;
-        margin-bottom: 0.5rem;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-    
-    .metric-value {
-        font-size: 1.8rem;
-        font-weight: 700;
-        color: #e0e7ff;
-    }
-    
-    /* Premium Buttons - Netflix Style */
-    .stButton>button {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-        color: white;
-        border-radius: 12px;
-        padding: 1rem 2rem;
-        font-size: 1.1rem;
-        font-weight: 600;
-        border: none;
-        width: 100%;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-        box-shadow: 0 10px 30px rgba(99, 102, 241, 0.3);
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .stButton>button::before {
-        content: '';
-        position: absolute;
-        top: 50%;
-        left: 50%;
-        width: 0;
-        height: 0;
-        border-radius: 50%;
-        background: rgba(255, 255, 255, 0.2);
-        transform: translate(-50%, -50%);
-        transition: width 0.8s, height 0.8s;
-    }
-    
-    .stButton>button:hover::before {
-        width: 500px;
-        height: 500px;
-    }
-    
-    .stButton>button:hover {
-        transform: translateY(-4px) scale(1.02);
-        box-shadow: 0 20px 50px rgba(99, 102, 241, 0.6);
-    }
-    
-    /* Sidebar with Dark Theme */
-    [data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #1e293b 0%, #0f172a 100%);
-        border-right: 1px solid rgba(139, 92, 246, 0.2);
-    }
-    
-    [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] p {
-        color: #e2e8f0;
-    }
-    
-    /* Sidebar Accuracy Badge */
-    .sidebar-accuracy {
-        background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-        color: white;
-        padding: 1rem 1.5rem;
-        border-radius: 15px;
-        text-align: center;
-        margin: 1rem 0;
-        box-shadow: 0 10px 30px rgba(16, 185, 129, 0.4);
-        border: 2px solid rgba(255, 255, 255, 0.2);
-        transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    .sidebar-accuracy:hover {
-        transform: translateY(-2px) scale(1.02);
-        box-shadow: 0 15px 40px rgba(16, 185, 129, 0.6);
-    }
-    
-    .sidebar-accuracy-label {
-        font-size: 0.85rem;
-        font-weight: 600;
-        opacity: 0.9;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        margin-bottom: 0.5rem;
-    }
-    
-    .sidebar-accuracy-value {
-        font-size: 2rem;
-        font-weight: 800;
-        margin: 0;
-    }
-    
-    /* Radio buttons styling */
-    .stRadio > label {
-        color: #e2e8f0 !important;
-        font-weight: 600;
-        font-size: 1.1rem;
-    }
-    
-    .stRadio > div {
-        background: rgba(139, 92, 246, 0.1);
-        padding: 1rem;
-        border-radius: 12px;
-        border: 1px solid rgba(139, 92, 246, 0.2);
-    }
-    
-    .stRadio > div > label {
-        background: rgba(255, 255, 255, 0.05);
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 0.5rem 0;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-        cursor: pointer;
-        border: 1px solid transparent;
-    }
-    
-    .stRadio > div > label:hover {
-        background: rgba(139, 92, 246, 0.2);
-        border-color: rgba(139, 92, 246, 0.4);
-        transform: translateX(8px);
-    }
-    
-    /* Section Headers with Glow */
-    .section-header {
-        color: #e0e7ff;
-        font-size: 2rem;
-        font-weight: 700;
-        margin: 2.5rem 0 1.5rem 0;
-        padding-bottom: 0.75rem;
-        border-bottom: 2px solid rgba(139, 92, 246, 0.4);
-        position: relative;
-    }
-    
-    .section-header::after {
-        content: '';
-        position: absolute;
-        bottom: -2px;
-        left: 0;
-        width: 100px;
-        height: 2px;
-        background: linear-gradient(90deg, #8b5cf6, transparent);
-        animation: slideRight 2s ease infinite;
-    }
-    
-    @keyframes slideRight {
-        0%, 100% { transform: translateX(0); opacity: 0; }
-        50% { opacity: 1; }
-        100% { transform: translateX(200px); opacity: 0; }
-    }
-    
-    /* Upload Section */
-    .upload-info {
-        background: rgba(99, 102, 241, 0.1);
-        backdrop-filter: blur(10px);
-        padding: 2rem;
-        border-radius: 15px;
-        border: 2px dashed rgba(139, 92, 246, 0.4);
-        margin: 1.5rem 0;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    .upload-info:hover {
-        border-color: rgba(139, 92, 246, 0.8);
-        background: rgba(99, 102, 241, 0.15);
-        transform: scale(1.02);
-    }
-    
-    /* File Uploader Styling */
-    [data-testid="stFileUploader"] {
-        background: rgba(139, 92, 246, 0.1);
-        border: 2px dashed rgba(139, 92, 246, 0.4);
-        border-radius: 15px;
-        padding: 2rem;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    [data-testid="stFileUploader"]:hover {
-        border-color: rgba(139, 92, 246, 0.8);
-        background: rgba(139, 92, 246, 0.15);
-    }
-    
-    /* Image Container */
-    [data-testid="stImage"] {
-        border-radius: 15px;
-        overflow: hidden;
-        box-shadow: 0 10px 40px rgba(0, 0, 0, 0.3);
-        transition: all 0.5s cubic-bezier(0.4, 0, 0.2, 1);
-    }
-    
-    [data-testid="stImage"]:hover {
-        transform: scale(1.03);
-        box-shadow: 0 20px 60px rgba(139, 92, 246, 0.3);
-    }
-    
-    /* Result Item */
-    .result-item {
-        background: rgba(255, 255, 255, 0.05);
-        backdrop-filter: blur(10px);
-        padding: 1.2rem;
-        border-radius: 12px;
-        margin: 0.8rem 0;
-        border-left: 4px solid;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-        opacity: 0;
-        transform: translateX(-20px);
-        animation: slideInLeft 0.5s ease forwards;
-    }
-    
-    @keyframes slideInLeft {
-        to {
-            opacity: 1;
-            transform: translateX(0);
-        }
-    }
-    
-    .result-item:hover {
-        transform: translateX(10px) scale(1.02);
-        box-shadow: 0 10px 30px rgba(139, 92, 246, 0.3);
-    }
-    
-    /* Scrollbar */
-    ::-webkit-scrollbar {
-        width: 10px;
-        height: 10px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: rgba(15, 23, 42, 0.5);
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: linear-gradient(135deg, #6366f1, #8b5cf6);
-        border-radius: 5px;
-    }
-    
-    /* Animation Delays */
-    .glass-card:nth-child(1) { animation-delay: 0.1s; }
-    .glass-card:nth-child(2) { animation-delay: 0.2s; }
-    .glass-card:nth-child(3) { animation-delay: 0.3s; }
-    .glass-card:nth-child(4) { animation-delay: 0.4s; }
-    .result-item:nth-child(1) { animation-delay: 0.1s; }
-    .result-item:nth-child(2) { animation-delay: 0.2s; }
-    .result-item:nth-child(3) { animation-delay: 0.3s; }
-    .result-item:nth-child(4) { animation-delay: 0.4s; }
-    .result-item:nth-child(5) { animation-delay: 0.5s; }
-    </style>
-""", unsafe_allow_html=True)
+# The theme lives in static/theme.css; build_assets.py minifies it. By default
+# only a <link> to the static file goes into each run's deltas and the browser
+# caches the stylesheet. PLANT_THEME_CSS=inline embeds the minified CSS instead,
+# for servers without static serving.
+@st.cache_resource
+def load_theme():
+    css = build_assets.theme_css()
+    return css, build_assets.theme_version(css)
+
+theme_css, theme_version = load_theme()
+if os.environ.get("PLANT_THEME_CSS", "link") == "inline":
+    st.markdown(f"<style>{theme_css}</style>", unsafe_allow_html=True)
+else:
+    st.markdown(f'<link rel="stylesheet" href="app/static/theme.min.css?v={theme_version}">',
+                unsafe_allow_html=True)
 
 # =======================
 # Helper Functions
 # =======================
-def format_disease_name(class_name):
-    """Convert class names like 'Apple___Apple_scab' to 'Apple - Apple Scab'"""
-    parts = class_name.split('___')
-    plant = parts[0].replace('_', ' ').strip()
-    disease = parts[1].replace('_', ' ').strip() if len(parts) > 1 else 'Unknown'
-    
-    plant = ' '.join(word.capitalize() for word in plant.split())
-    disease = ' '.join(word.capitalize() for word in disease.split())
-    
-    return f"{plant} - {disease}"
+def admit_uploads(files):
+    """Split uploads into (admitted, over budget as (file name, reason), unreadable file names)
+
+    Reads only the headers, so oversized files are turned away before any decode.
+    """
+    admitted, rejected, unreadable = [], [], []
+    for f in files:
+        try:
+            inference.probe_image(f.getvalue())
+            admitted.append(f)
+        except inference.ImageRejected as exc:
+            rejected.append((f.name, str(exc)))
+        except DECODE_ERRORS:
+            unreadable.append(f.name)
+    return admitted, rejected, unreadable
 
-def get_plant_name(class_name):
-    """Extract plant name from class"""
-    return class_name.split('___')[0].replace('_', ' ').title()
+def load_upload(f):
+    return load_image(f.getvalue())
 
-def get_disease_name(class_name):
-    """Extract disease name from class"""
-    parts = class_name.split('___')
-    return parts[1].replace('_', ' ').title() if len(parts) > 1 else 'Unknown'
+def iter_micro_batches(files, batch_size):
+    """Yield (files, decoded images, unreadable file names) per micro-batch, decoding the next ones meanwhile
 
-def is_healthy(class_name):
-    """Check if prediction indicates healthy plant"""
-    return 'healthy' in class_name.lower()
+    Decoding runs on the shared ingest pipeline, a bounded number of
+    micro-batches ahead. Files that fail to decode are left out of the chunk.
+    """
+    for chunk, errors, batch in load_ingest().batches(files, batch_size, loader=load_upload):
+        yield ([f for f, error in zip(chunk, errors) if error is None], list(batch),
+               [f.name for f, error in zip(chunk, errors) if error is not None])
+
+def budget_caption():
+    return (f"Uploads are limited to {inference.MAX_IMAGE_BYTES / 2**20:.1f} MB and "
+            f"{inference.MAX_IMAGE_PIXELS / 1e6:.1f} MP")
+
+def queue_status(slot):
+    """Callback for DynamicBatcher.wait that shows the request's place in the shared queue"""
+    def on_wait(position, expected_wait):
+        eta = f", about {expected_wait:.1f}s to go" if expected_wait is not None else ""
+        slot.caption(f"Waiting for the shared model: position {position} in queue{eta}")
+    return on_wait
+
+def batch_result_rows(file_names, predictions):
+    """Summarize a micro-batch of predictions as rows of the batch results table"""
+    preds = np.stack(predictions)
+    top = np.argmax(preds, axis=1)
+    confidence = preds[np.arange(len(top)), top] * 100
+    healthy = taxonomy.healthy_probability(preds) * 100
+    return [{
+        "Image": name,
+        "Prediction": taxonomy.labels[idx],
+        "Status": "Healthy" if taxonomy.healthy[idx] else "Disease Detected",
+        "Confidence (%)": float(conf),
+        "Healthy (%)": float(healthy_pct),
+    } for name, idx, conf, healthy_pct in zip(file_names, top, confidence, healthy)]
 
 # =======================
 # Load Model and Data
 # =======================
+DEFAULT_BACKEND, TFLITE_THREADS = inference.backend_from_env()
+
+@st.cache_resource
+def start_model_load(backend=DEFAULT_BACKEND):
+    # On keras this is a SplitModel, whose backbone also embeds uploads for the similar-leaves search
+    return inference.load_model_async(backend, threads=TFLITE_THREADS, loader=embeddings.load_classifier)
+
+def get_model(backend):
+    """Wait for the background model load, showing a warming-up state while it runs"""
+    future = start_model_load(backend)
+    if not future.done():
+        with st.spinner("Model warming up..."):
+            return future.result()
+    return future.result()
+
+@st.cache_resource
+def load_scheduler(backend=DEFAULT_BACKEND):
+    """One inference queue shared by every session, capping concurrent forward passes"""
+    model_future = start_model_load(backend)
+
+    def forward(batch):
+        model = model_future.result()
+        if not isinstance(model, embeddings.SplitModel):
+            return inference.predict_batch(model, batch)
+        # Keep the embeddings so the similar-leaves search needs no second backbone pass
+        kept = {}
+
+        def split_pass(batch):
+            kept["embedding"] = model.embed(batch)
+            return model.head(kept["embedding"])
+        return inference.predict_batch(split_pass, batch), kept["embedding"]
+
+    return DynamicBatcher(
+        forward,
+        max_batch_size=int(os.environ.get("PLANT_SCHEDULER_BATCH", "16")),
+        max_delay_ms=float(os.environ.get("PLANT_SCHEDULER_DELAY_MS", "10")),
+        workers=int(os.environ.get("PLANT_SCHEDULER_WORKERS", "1")),
+        name=backend,
+    )
+
 @st.cache_resource
-def load_model():
-    model = tf.keras.models.load_model("plant_model.keras")
-    return model
+def load_ingest():
+    """Decode pool shared by every session; uint8 rows go straight into the scheduler's batches"""
+    return IngestPipeline(dtype=np.uint8)
 
 @st.cache_resource
 def load_class_names():
-    with open("class_names.json", "r") as f:
-        return json.load(f)
+    return inference.load_class_names()
+
+@st.cache_resource
+def load_taxonomy():
+    return Taxonomy(load_class_names())
 
 @st.cache_resource
 def load_model_info():
-    info = {}
-    try:
-        with open("model_metrics.json", "r") as f:
-            info["metrics"] = json.load(f)
-    except:
-        info["metrics"] = None
-    return info
+    return {"metrics": inference.load_metrics()}
+
+@st.cache_resource
+def load_model_version(backend=DEFAULT_BACKEND):
+    return f"{backend}-{inference.model_version(inference.model_path_for(backend))}"
+
+@st.cache_resource
+def load_prediction_cache():
+    return cache_from_env()
+
+@st.cache_resource
+def load_tta():
+    """Shared so the measured cost per augmented view carries across sessions"""
+    return AdaptiveTTA()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def preview_thumbnail(digest, _image_bytes):
+    """Display-sized JPEG of an upload, built once per content hash"""
+    return inference.make_thumbnail(_image_bytes)
 
-model = load_model()
+@st.cache_resource(max_entries=1)
+def open_similarity_index(version, stamp, _model):
+    return similarity.open_index(_model, similarity.SIMILARITY_DIR)
+
+def load_similarity_index(backend):
+    """The reference index for the loaded backbone, or None when there is none
+
+    Uses the scheduler's own model, so it is only available on the keras
+    backend once that has loaded. The cache is keyed on the store's files,
+    so rows from a `similarity.py build` or lists from a `train-ivf` run
+    while the app is up are picked up on the next render, and a missing
+    index is not cached.
+    """
+    future = start_model_load(backend)
+    if not future.done() or future.exception() is not None:
+        return None
+    model = future.result()
+    if not isinstance(model, embeddings.SplitModel):
+        return None
+    if model.version not in embeddings.store_versions(similarity.SIMILARITY_DIR):
+        return None
+    stamp = similarity.index_stamp(similarity.SIMILARITY_DIR, model.version)
+    return open_similarity_index(model.version, stamp, model)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def similar_cases(prediction_key, index_rows, _index, _scheduler, _image_bytes, _embedding=None, k=4):
+    """Most similar labelled reference leaves for an upload
+
+    Uses the embedding from the prediction's forward pass when there is one;
+    otherwise (a cached, tiled or earlier prediction) queues the image on the
+    shared scheduler, like any prediction, and takes the embedding its
+    forward pass returns. ``index_rows`` keys the cache, so a grown index is searched again.
+    """
+    if _embedding is None:
+        future = _scheduler.submit(load_image(_image_bytes))
+        _scheduler.wait(future)
+        _embedding = future.embedding
+    return _index.search(_embedding, k)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def reference_thumbnail(path):
+    return inference.make_thumbnail(path, max_side=256)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def tile_overlay(prediction_key, _preview, _plan, _heatmap):
+    """Preview tinted by the per-tile disease map, built once per tiled prediction"""
+    return tiling.heatmap_overlay(Image.open(io.BytesIO(_preview)), _plan, _heatmap)
+
+if os.environ.get("PLANT_PRELOAD_MODEL", "1") != "0":
+    start_model_load()
 class_names = load_class_names()
+taxonomy = load_taxonomy()
 model_info = load_model_info()
+prediction_cache = load_prediction_cache()
 
 # =======================
 # Navigation Sidebar
 # =======================
 with st.sidebar:
+    count_section("sidebar")
     if model_info["metrics"]:
         accuracy = model_info["metrics"]["accuracy"] * 100
         st.markdown(f"""
@@ -639,6 +291,22 @@ with st.sidebar:
         ["Home", "Disease Detection", "About"],
         label_visibility="collapsed"
     )
+    if PROFILE_RUN:
+        run_profiler.label = page
+    
+    backends = inference.available_backends()
+    if DEFAULT_BACKEND not in backends:
+        backends.insert(0, DEFAULT_BACKEND)
+    if len(backends) > 1:
+        st.markdown("---")
+        backend = st.selectbox(
+            "Inference Backend",
+            backends,
+            index=backends.index(DEFAULT_BACKEND),
+            help="TFLite variants are produced by export_tflite.py"
+        )
+    else:
+        backend = DEFAULT_BACKEND
     
     st.markdown("---")
     
@@ -649,10 +317,341 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+# =======================
+# Detection Results Fragment
+# =======================
+@st.fragment
+def analysis_pane(image_bytes, prediction_key, backend, use_tta=False, tile_plan=None, preview=None):
+    """Analyze button and results for one uploaded image
+
+    Runs as a fragment: clicking Analyze reruns only this function, so the CSS,
+    sidebar and image preview above are neither re-executed nor re-sent. With a
+    tile plan, the cached prediction holds one row per tile.
+    """
+    count_section("analysis_pane")
+    # A fragment-only rerun starts after the full run's profiler has stopped
+    if not PROFILE_RUN or run_profiler.running:
+        render_analysis(image_bytes, prediction_key, backend, use_tta, tile_plan, preview,
+                        run_profiler if PROFILE_RUN else None)
+        return
+    with profiling.session(keep_profile, "Analyze Image") as pane_profiler:
+        render_analysis(image_bytes, prediction_key, backend, use_tta, tile_plan, preview, pane_profiler)
+
+def render_analysis(image_bytes, prediction_key, backend, use_tta, tile_plan, preview, profiler):
+    """Body of analysis_pane; ``profiler``, when set, traces the forward pass"""
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col2:
+        if st.button("Analyze Image", key="analyze_image", use_container_width=True):
+            metrics.count("plant_requests", "Analyses started from the app", endpoint="single")
+            get_model(backend)
+            scheduler = load_scheduler(backend)
+            queue_slot = st.empty()
+            with st.spinner("Analyzing leaf patterns..."):
+                first_embeddings = []
+
+                def predict_many(images):
+                    # All views are queued together so the scheduler runs them as one batch
+                    futures = scheduler.submit_many(images)
+                    results = [scheduler.wait(f, queue_status(queue_slot)) for f in futures]
+                    if not first_embeddings:
+                        first_embeddings.extend(getattr(f, "embedding", None) for f in futures)
+                    return results
+
+                def run_model():
+                    # Preprocess and queue for the shared scheduler
+                    with profiler.tf_trace() if profiler else contextlib.nullcontext():
+                        if tile_plan is not None:
+                            tiled_image, _ = tiling.open_tiled(image_bytes)
+                            return tiling.predict_tiles(predict_many, tiled_image, tile_plan)
+                        if use_tta:
+                            preds, info = load_tta()(predict_many, image_bytes)
+                            st.session_state['tta_info'] = info
+                            st.session_state['tta_key'] = prediction_key
+                        else:
+                            _, errors, batch = next(load_ingest().batches([image_bytes]))
+                            if errors[0] is not None:
+                                raise ValueError(errors[0])
+                            preds = predict_many(list(batch))[0]
+                        # Both paths forward the unaugmented image first; its embedding feeds the similar-leaves search
+                        st.session_state['embedding'] = first_embeddings[0]
+                        st.session_state['embedding_key'] = prediction_key
+                        return preds
+
+                try:
+                    # Store in session state
+                    st.session_state['predictions'] = prediction_cache.get_or_compute(prediction_key, run_model)
+                    st.session_state['prediction_key'] = prediction_key
+                except queue.Full:
+                    queue_slot.error("The analysis queue is full right now. Please try again in a moment.")
+
+    # Display results if this image was analyzed now or before, in this or another session
+    if st.session_state.get('prediction_key') == prediction_key:
+        preds = st.session_state['predictions']
+    else:
+        preds = prediction_cache.peek(prediction_key)
+
+    tiled = None
+    if preds is not None and tile_plan is not None:
+        tiled = tiling.aggregate(preds, tile_plan, taxonomy)
+        preds = tiled["preds"]
+
+    if preds is not None:
+        render_start = time.perf_counter()
+        cache_stats = prediction_cache.stats()
+        st.caption(
+            f"Prediction cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits, "
+            f"{cache_stats['misses']} misses, {cache_stats['coalesced']} coalesced "
+            f"({cache_stats['hit_rate']:.0%} hit rate)"
+        )
+        tta_info = st.session_state.get('tta_info')
+        if use_tta and tta_info and st.session_state.get('tta_key') == prediction_key:
+            if tta_info["views"]:
+                st.caption(f"First pass was {tta_info['first_confidence']:.0%} confident, so "
+                           f"{tta_info['views']} augmented views were averaged in "
+                           f"(+{tta_info['extra_ms']:.0f} ms).")
+        
+        # Get all predictions sorted
+        all_indices = np.argsort(preds)[::-1]
+        top_indices = all_indices[:5]
+        
+        # Primary prediction
+        primary_idx = top_indices[0]
+        primary_score = preds[primary_idx] * 100
+        primary_formatted = taxonomy.labels[primary_idx]
+        rollup = taxonomy.rollup(preds)
+        plant_score = rollup["plant"][taxonomy.plant_ids[primary_idx]] * 100
+        disease_score = rollup["disease"][taxonomy.disease_ids[primary_idx]] * 100
+        healthy_score = rollup["healthy"] * 100
+        
+        # Analysis metrics
+        max_confidence = np.max(preds) * 100
+        avg_top5_confidence = np.mean(preds[top_indices]) * 100
+        confidence_spread = (preds[top_indices[0]] - preds[top_indices[4]]) * 100
+        
+        st.markdown("<h2 class='section-header'>Primary Detection</h2>", unsafe_allow_html=True)
+        
+        st.markdown(f"""
+        <div class='primary-prediction'>
+            <div class='prediction-title'>Detected Condition</div>
+            <div class='prediction-result'>{primary_formatted}</div>
+            <div class='confidence-badge'>Confidence: {primary_score:.2f}%</div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if tiled is not None:
+            st.markdown("<h2 class='section-header'>Disease Map</h2>", unsafe_allow_html=True)
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col2:
+                st.image(tile_overlay(prediction_key, preview, tile_plan, tiled["heatmap"]),
+                         use_container_width=True)
+                st.caption(f"{tiled['tiles']} tiles of {tiling.TILE_SIZE} px at "
+                           f"{tile_plan['scale']:.0%} scale; {tiled['affected_share']:.0%} look diseased. "
+                           f"The verdict above averages those tiles.")
+        
+        # Detailed Analysis Section
+        st.markdown("<h2 class='section-header'>Comprehensive Analysis</h2>", unsafe_allow_html=True)
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>Plant Species</div>
+                <div class='metric-value' style='font-size: 1.4rem;'>{taxonomy.plant_name(primary_idx)}</div>
+                <div class='metric-label' style='margin: 0.5rem 0 0 0;'>{plant_score:.1f}% across its classes</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            health_status = "Healthy" if taxonomy.healthy[primary_idx] else "Disease Detected"
+            status_color = "#10b981" if taxonomy.healthy[primary_idx] else "#ef4444"
+            st.markdown(f"""
+            <div class='metric-card' style='border: 2px solid {status_color};'>
+                <div class='metric-label'>Health Status</div>
+                <div class='metric-value' style='font-size: 1.4rem; color: {status_color};'>{health_status}</div>
+                <div class='metric-label' style='margin: 0.5rem 0 0 0;'>{healthy_score:.1f}% healthy overall</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>Condition</div>
+                <div class='metric-value' style='font-size: 1.4rem;'>{taxonomy.disease_name(primary_idx)}</div>
+                <div class='metric-label' style='margin: 0.5rem 0 0 0;'>{disease_score:.1f}% across all plants</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        # Model Insights
+        st.markdown("<h2 class='section-header'>Model Insights</h2>", unsafe_allow_html=True)
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>Max Confidence</div>
+                <div class='metric-value'>{max_confidence:.2f}%</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>Avg Top-5 Confidence</div>
+                <div class='metric-value'>{avg_top5_confidence:.2f}%</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col3:
+            st.markdown(f"""
+            <div class='metric-card'>
+                <div class='metric-label'>Confidence Spread</div>
+                <div class='metric-value'>{confidence_spread:.2f}%</div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        # Top 5 Predictions Visualization
+        st.markdown("<h2 class='section-header'>Top 5 Predictions</h2>", unsafe_allow_html=True)
+        
+        top_scores = preds[top_indices] * 100
+        formatted_classes = [taxonomy.labels[i] for i in top_indices]
+        
+        # Horizontal Bar Chart
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Bar(
+            x=top_scores[::-1],
+            y=formatted_classes[::-1],
+            orientation='h',
+            text=[f"{s:.2f}%" for s in top_scores[::-1]],
+            textposition='outside',
+            marker=dict(
+                color=top_scores[::-1],
+                colorscale=[[0, '#6366f1'], [0.5, '#8b5cf6'], [1, '#a78bfa']],
+                line=dict(color='rgba(139, 92, 246, 0.5)', width=2)
+            ),
+            hovertemplate='<b>%{y}</b><br>Confidence: %{x:.2f}%<extra></extra>'
+        ))
+        
+        fig.update_layout(
+            title={
+                'text': "Confidence Distribution",
+                'font': {'size': 20, 'color': '#e0e7ff', 'family': 'system-ui, sans-serif'}
+            },
+            xaxis_title="Confidence (%)",
+            yaxis_title="",
+            template="plotly_dark",
+            plot_bgcolor='rgba(30, 41, 59, 0.5)',
+            paper_bgcolor='rgba(30, 41, 59, 0.5)',
+            height=400,
+            font=dict(color='#cbd5e1', family='system-ui, sans-serif'),
+            xaxis=dict(gridcolor='rgba(139, 92, 246, 0.2)', range=[0, 100]),
+            yaxis=dict(gridcolor='rgba(139, 92, 246, 0.2)'),
+            showlegend=False,
+            margin=dict(l=20, r=100, t=60, b=40)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Similar reference cases, once `python similarity.py build` has indexed an archive
+        similarity_index = load_similarity_index(backend)
+        if similarity_index is not None:
+            st.markdown("<h2 class='section-header'>Similar Reference Leaves</h2>", unsafe_allow_html=True)
+            embedding = None
+            if st.session_state.get('embedding_key') == prediction_key:
+                embedding = st.session_state['embedding']
+            cases = similar_cases(prediction_key, len(similarity_index), similarity_index,
+                                  load_scheduler(backend), image_bytes, embedding)
+            for col, case in zip(st.columns(max(len(cases), 1)), cases):
+                with col:
+                    st.image(reference_thumbnail(case["path"]), use_container_width=True)
+                    label = taxonomy.labels[case["label"]] if case["label"] >= 0 else "Unlabelled"
+                    st.caption(f"{label} · {case['similarity']:.0%} similar")
+        
+        # Full Probability Distribution
+        st.markdown("<h2 class='section-header'>Complete Probability Distribution</h2>", unsafe_allow_html=True)
+        
+        # Show top 10 in detail
+        top10_indices = all_indices[:10]
+        for i, idx in enumerate(top10_indices):
+            score = preds[idx] * 100
+            formatted = taxonomy.labels[idx]
+            
+            if i == 0:
+                border_color = "#10b981"
+            elif i < 3:
+                border_color = "#6366f1"
+            elif i < 5:
+                border_color = "#8b5cf6"
+            else:
+                border_color = "#64748b"
+            
+            st.markdown(f"""
+            <div class='result-item' style='border-left-color: {border_color};'>
+                <p style='margin: 0; color: #e2e8f0;'>
+                    <strong style='font-size: 1.1rem;'>{i+1}. {formatted}</strong>
+                    <span style='float: right; color: {border_color}; font-weight: 700; font-size: 1.1rem;'>{score:.2f}%</span>
+                </p>
+                <div style='margin-top: 0.5rem; background: rgba(139, 92, 246, 0.1); border-radius: 10px; height: 8px; overflow: hidden;'>
+                    <div style='background: linear-gradient(90deg, {border_color}, rgba(139, 92, 246, 0.5)); height: 100%; width: {score}%; transition: width 1s ease;'></div>
+                </div>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        # Statistical Summary
+        st.markdown("<h2 class='section-header'>Statistical Summary</h2>", unsafe_allow_html=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.markdown("""
+            <div class='glass-card'>
+                <h3>Prediction Statistics</h3>
+            """, unsafe_allow_html=True)
+            
+            mean_conf = np.mean(preds) * 100
+            median_conf = np.median(preds) * 100
+            std_conf = np.std(preds) * 100
+            
+            st.markdown(f"""
+                <p><strong>Mean Confidence:</strong> {mean_conf:.2f}%</p>
+                <p><strong>Median Confidence:</strong> {median_conf:.2f}%</p>
+                <p><strong>Std Deviation:</strong> {std_conf:.2f}%</p>
+                <p><strong>Total Classes:</strong> {len(class_names)}</p>
+                <p><strong>Classes > 1%:</strong> {np.sum(preds > 0.01)}</p>
+                <p><strong>Classes > 5%:</strong> {np.sum(preds > 0.05)}</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            st.markdown("""
+            <div class='glass-card'>
+                <h3>Confidence Analysis</h3>
+            """, unsafe_allow_html=True)
+            
+            if max_confidence > 90:
+                interpretation = "The model is very confident in this prediction. The detected condition is highly likely."
+            elif max_confidence > 75:
+                interpretation = "The model shows high confidence. The prediction is reliable but consider the top alternatives."
+            elif max_confidence > 60:
+                interpretation = "The model has moderate confidence. Review the top predictions carefully."
+            else:
+                interpretation = "The model has low confidence. Multiple conditions are possible."
+            
+            st.markdown(f"""
+                <p>{interpretation}</p>
+                <p style='margin-top: 1rem; padding: 1rem; background: rgba(139, 92, 246, 0.1); border-radius: 8px; border-left: 3px solid #8b5cf6;'>
+                    <strong>Note:</strong> This tool provides preliminary analysis. Always verify results with agricultural professionals.
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        metrics.stage("render").observe(time.perf_counter() - render_start)
+
 # =======================
 # HOME PAGE
 # =======================
 if page == "Home":
+    count_section("home")
     st.markdown("""
     <div class='hero-section'>
         <div class='hero-title'>Plant Disease AI</div>
@@ -682,7 +681,7 @@ if page == "Home":
         """, unsafe_allow_html=True)
     
     with col3:
-        plants_count = len(set(name.split('___')[0] for name in class_names))
+        plants_count = taxonomy.num_plants
         st.markdown(f"""
         <div class='stat-card'>
             <div class='stat-number'>{plants_count}</div>
@@ -760,10 +759,8 @@ if page == "Home":
     
     st.markdown("<h2 class='section-header'>Supported Plants</h2>", unsafe_allow_html=True)
     
-    plants = sorted(set(name.split('___')[0].replace('_', ' ') for name in class_names))
-    
     cols = st.columns(4)
-    for idx, plant in enumerate(plants):
+    for idx, plant in enumerate(taxonomy.plant_names):
         with cols[idx % 4]:
             st.markdown(f"""
             <div class='glass-card' style='padding: 1.5rem; text-align: center;'>
@@ -775,6 +772,7 @@ if page == "Home":
 # DISEASE DETECTION PAGE
 # =======================
 elif page == "Disease Detection":
+    count_section("detection")
     st.markdown("""
     <div class='hero-section'>
         <div class='hero-title'>Disease Detection</div>
@@ -796,20 +794,159 @@ elif page == "Disease Detection":
         </div>
         """, unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader(
-        "Choose an image file (JPG, JPEG, PNG)",
-        type=["jpg", "jpeg", "png"],
-        label_visibility="collapsed"
-    )
+    if not start_model_load(backend).done():
+        st.info("The model is warming up in the background. You can upload images while it loads.")
+    
+    batch_mode = st.toggle("Batch mode (analyze many images at once)")
+    
+    uploaded_file = None
+    use_tta = use_tiles = False
+    if batch_mode:
+        uploaded_files = st.file_uploader(
+            "Choose image files (JPG, JPEG, PNG)",
+            type=["jpg", "jpeg", "png"],
+            accept_multiple_files=True,
+            label_visibility="collapsed"
+        )
+        batch_size = st.select_slider(
+            "Micro-batch size",
+            options=[8, 16, 32, 64],
+            value=32,
+            help="Images decoded and queued for the model per step"
+        )
+        
+        if uploaded_files:
+            import pandas as pd
+            
+            batch_key = tuple((f.name, f.size) for f in uploaded_files)
+            table_columns = {
+                "Confidence (%)": st.column_config.ProgressColumn(
+                    "Confidence (%)", format="%.2f%%", min_value=0, max_value=100
+                ),
+                "Healthy (%)": st.column_config.NumberColumn(
+                    "Healthy (%)", format="%.1f%%",
+                    help="Probability summed over all healthy classes"
+                ),
+            }
+            
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col2:
+                run_batch = st.button(f"Analyze {len(uploaded_files)} Images", use_container_width=True)
+            
+            table_slot = st.empty()
+            if run_batch:
+                metrics.count("plant_requests", "Analyses started from the app", endpoint="batch")
+                get_model(backend)
+                scheduler = load_scheduler(backend)
+                rows = []
+                admitted, rejected, unreadable = admit_uploads(uploaded_files)
+                progress = st.progress(0.0, text="Analyzing leaf patterns...")
+                queue_slot = st.empty()
+                try:
+                    for chunk, images, chunk_unreadable in iter_micro_batches(admitted, batch_size):
+                        unreadable.extend(chunk_unreadable)
+                        futures = scheduler.submit_many(images)
+                        predictions = [scheduler.wait(f, queue_status(queue_slot)) for f in futures]
+                        queue_slot.empty()
+                        if predictions:
+                            rows.extend(batch_result_rows([f.name for f in chunk], predictions))
+                        done = len(rows) + len(rejected) + len(unreadable)
+                        progress.progress(done / len(uploaded_files),
+                                          text=f"Analyzed {done} of {len(uploaded_files)} images")
+                        table_slot.dataframe(pd.DataFrame(rows), column_config=table_columns,
+                                             hide_index=True, use_container_width=True)
+                except queue.Full:
+                    queue_slot.error("The analysis queue is full right now; results so far are shown below.")
+                progress.empty()
+                st.session_state['batch_results'] = rows
+                st.session_state['batch_rejected'] = rejected
+                st.session_state['batch_unreadable'] = unreadable
+                st.session_state['batch_key'] = batch_key
+            
+            if st.session_state.get('batch_key') == batch_key:
+                rows = st.session_state['batch_results']
+                if st.session_state['batch_rejected']:
+                    st.warning(
+                        f"{len(st.session_state['batch_rejected'])} images were not analyzed. "
+                        f"{budget_caption()}.\n\n"
+                        + "\n".join(f"- {name}: {reason}" for name, reason in st.session_state['batch_rejected'])
+                    )
+                if st.session_state['batch_unreadable']:
+                    st.warning(
+                        f"{len(st.session_state['batch_unreadable'])} files could not be read as images "
+                        f"and were skipped.\n\n"
+                        + "\n".join(f"- {name}" for name in st.session_state['batch_unreadable'])
+                    )
+                healthy_count = sum(row["Status"] == "Healthy" for row in rows)
+                
+                st.markdown("<h2 class='section-header'>Batch Summary</h2>", unsafe_allow_html=True)
+                
+                col1, col2, col3 = st.columns(3)
+                for col, label, value in (
+                    (col1, "Images Analyzed", len(rows)),
+                    (col2, "Healthy", healthy_count),
+                    (col3, "Disease Detected", len(rows) - healthy_count),
+                ):
+                    with col:
+                        st.markdown(f"""
+                        <div class='metric-card'>
+                            <div class='metric-label'>{label}</div>
+                            <div class='metric-value'>{value}</div>
+                        </div>
+                        """, unsafe_allow_html=True)
+                
+                table_slot.dataframe(pd.DataFrame(rows), column_config=table_columns,
+                                     hide_index=True, use_container_width=True)
+    else:
+        uploaded_file = st.file_uploader(
+            "Choose an image file (JPG, JPEG, PNG)",
+            type=["jpg", "jpeg", "png"],
+            label_visibility="collapsed"
+        )
+        use_tiles = st.toggle(
+            "Tiled analysis (whole-plant and field photos)",
+            help=f"Scores overlapping {tiling.TILE_SIZE} px tiles at up to full resolution, "
+                 f"at most {tiling.MAX_TILES} per photo, and maps where disease shows up"
+        )
+        use_tta = st.toggle(
+            "Refine uncertain results",
+            value=os.environ.get("PLANT_TTA", "0") == "1",
+            disabled=use_tiles,
+            help=f"Below {load_tta().threshold:.0%} confidence, flipped, cropped and rotated views "
+                 f"are scored in one extra batch and averaged, within a {load_tta().budget_ms:.0f} ms budget"
+        )
+    
+    if uploaded_file is not None:
+        image_bytes = uploaded_file.getvalue()
+        try:
+            # Reads only the header: size, format and mode, checked against the budgets
+            image, draft_scale = inference.probe_image(image_bytes)
+        except inference.ImageRejected as exc:
+            st.error(f"This image was not analyzed: {exc}. {budget_caption()}.")
+            uploaded_file = None
+        except DECODE_ERRORS:
+            st.error(f"This image was not analyzed: {uploaded_file.name} could not be read as an image.")
+            uploaded_file = None
     
     if uploaded_file is not None:
-        image = Image.open(uploaded_file).convert("RGB")
+        count_section("upload_preview")
+        digest = content_digest(image_bytes)
+        if draft_scale > 1:
+            st.info(f"This photo is larger than the {inference.MAX_IMAGE_PIXELS / 1e6:.1f} MP budget, "
+                    f"so it is decoded at 1/{draft_scale} scale.")
+        tile_plan = tiling.plan_tiles(image.size, 1.0 / draft_scale) if use_tiles else None
+        if use_tiles:
+            mode = f"+tiles{tiling.MAX_TILES}-{tiling.TILE_OVERLAP}"
+        else:
+            mode = "+tta" if use_tta else ""
+        prediction_key = cache_key(image_bytes, load_model_version(backend) + mode, digest=digest)
         
         st.markdown("<h2 class='section-header'>Uploaded Image</h2>", unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
-            st.image(image, use_container_width=True)
+            preview = preview_thumbnail(digest, image_bytes)
+            st.image(preview, use_container_width=True)
         
         col1, col2, col3 = st.columns([1, 1, 1])
         
@@ -837,237 +974,13 @@ elif page == "Disease Detection":
             </div>
             """, unsafe_allow_html=True)
         
-        col1, col2, col3 = st.columns([1, 1, 1])
-        with col2:
-            if st.button("Analyze Image", use_container_width=True):
-                with st.spinner("Analyzing leaf patterns..."):
-                    # Preprocess
-                    img = image.resize((224, 224))
-                    img_array = np.array(img) / 255.0
-                    img_array = np.expand_dims(img_array, axis=0)
-
-                    # Predict
-                    predictions = model.predict(img_array, verbose=0)
-                    preds = predictions[0]
-
-                    # Store in session state
-                    st.session_state['predictions'] = preds
-                    st.session_state['last_analyzed_file'] = uploaded_file.name
-                    st.rerun()
-
-        # Display results if analysis was run
-        if st.session_state.get('last_analyzed_file') == uploaded_file.name and 'predictions' in st.session_state:
-            preds = st.session_state['predictions']
-            
-            # Get all predictions sorted
-            all_indices = np.argsort(preds)[::-1]
-            top_indices = all_indices[:5]
-            
-            # Primary prediction
-            primary_idx = top_indices[0]
-            primary_class = class_names[primary_idx]
-            primary_score = preds[primary_idx] * 100
-            primary_formatted = format_disease_name(primary_class)
-            
-            # Analysis metrics
-            max_confidence = np.max(preds) * 100
-            avg_top5_confidence = np.mean(preds[top_indices]) * 100
-            confidence_spread = (preds[top_indices[0]] - preds[top_indices[4]]) * 100
-            
-            st.markdown("<h2 class='section-header'>Primary Detection</h2>", unsafe_allow_html=True)
-            
-            st.markdown(f"""
-            <div class='primary-prediction'>
-                <div class='prediction-title'>Detected Condition</div>
-                <div class='prediction-result'>{primary_formatted}</div>
-                <div class='confidence-badge'>Confidence: {primary_score:.2f}%</div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Detailed Analysis Section
-            st.markdown("<h2 class='section-header'>Comprehensive Analysis</h2>", unsafe_allow_html=True)
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.markdown(f"""
-                <div class='metric-card'>
-                    <div class='metric-label'>Plant Species</div>
-                    <div class='metric-value' style='font-size: 1.4rem;'>{get_plant_name(primary_class)}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                health_status = "Healthy" if is_healthy(primary_class) else "Disease Detected"
-                status_color = "#10b981" if is_healthy(primary_class) else "#ef4444"
-                st.markdown(f"""
-                <div class='metric-card' style='border: 2px solid {status_color};'>
-                    <div class='metric-label'>Health Status</div>
-                    <div class='metric-value' style='font-size: 1.4rem; color: {status_color};'>{health_status}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown(f"""
-                <div class='metric-card'>
-                    <div class='metric-label'>Condition</div>
-                    <div class='metric-value' style='font-size: 1.4rem;'>{get_disease_name(primary_class)}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Model Insights
-            st.markdown("<h2 class='section-header'>Model Insights</h2>", unsafe_allow_html=True)
-            
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                st.markdown(f"""
-                <div class='metric-card'>
-                    <div class='metric-label'>Max Confidence</div>
-                    <div class='metric-value'>{max_confidence:.2f}%</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown(f"""
-                <div class='metric-card'>
-                    <div class='metric-label'>Avg Top-5 Confidence</div>
-                    <div class='metric-value'>{avg_top5_confidence:.2f}%</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col3:
-                st.markdown(f"""
-                <div class='metric-card'>
-                    <div class='metric-label'>Confidence Spread</div>
-                    <div class='metric-value'>{confidence_spread:.2f}%</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Top 5 Predictions Visualization
-            st.markdown("<h2 class='section-header'>Top 5 Predictions</h2>", unsafe_allow_html=True)
-            
-            top_classes = [class_names[i] for i in top_indices]
-            top_scores = preds[top_indices] * 100
-            formatted_classes = [format_disease_name(cls) for cls in top_classes]
-            
-            # Horizontal Bar Chart
-            fig = go.Figure(go.Bar(
-                x=top_scores[::-1],
-                y=formatted_classes[::-1],
-                orientation='h',
-                text=[f"{s:.2f}%" for s in top_scores[::-1]],
-                textposition='outside',
-                marker=dict(
-                    color=top_scores[::-1],
-                    colorscale=[[0, '#6366f1'], [0.5, '#8b5cf6'], [1, '#a78bfa']],
-                    line=dict(color='rgba(139, 92, 246, 0.5)', width=2)
-                ),
-                hovertemplate='<b>%{y}</b><br>Confidence: %{x:.2f}%<extra></extra>'
-            ))
-            
-            fig.update_layout(
-                title={
-                    'text': "Confidence Distribution",
-                    'font': {'size': 20, 'color': '#e0e7ff', 'family': 'Inter'}
-                },
-                xaxis_title="Confidence (%)",
-                yaxis_title="",
-                template="plotly_dark",
-                plot_bgcolor='rgba(30, 41, 59, 0.5)',
-                paper_bgcolor='rgba(30, 41, 59, 0.5)',
-                height=400,
-                font=dict(color='#cbd5e1', family='Inter'),
-                xaxis=dict(gridcolor='rgba(139, 92, 246, 0.2)', range=[0, 100]),
-                yaxis=dict(gridcolor='rgba(139, 92, 246, 0.2)'),
-                showlegend=False,
-                margin=dict(l=20, r=100, t=60, b=40)
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Full Probability Distribution
-            st.markdown("<h2 class='section-header'>Complete Probability Distribution</h2>", unsafe_allow_html=True)
-            
-            # Show top 10 in detail
-            top10_indices = all_indices[:10]
-            for i, idx in enumerate(top10_indices):
-                cls = class_names[idx]
-                score = preds[idx] * 100
-                formatted = format_disease_name(cls)
-                
-                if i == 0:
-                    border_color = "#10b981"
-                elif i < 3:
-                    border_color = "#6366f1"
-                elif i < 5:
-                    border_color = "#8b5cf6"
-                else:
-                    border_color = "#64748b"
-                
-                st.markdown(f"""
-                <div class='result-item' style='border-left-color: {border_color};'>
-                    <p style='margin: 0; color: #e2e8f0;'>
-                        <strong style='font-size: 1.1rem;'>{i+1}. {formatted}</strong>
-                        <span style='float: right; color: {border_color}; font-weight: 700; font-size: 1.1rem;'>{score:.2f}%</span>
-                    </p>
-                    <div style='margin-top: 0.5rem; background: rgba(139, 92, 246, 0.1); border-radius: 10px; height: 8px; overflow: hidden;'>
-                        <div style='background: linear-gradient(90deg, {border_color}, rgba(139, 92, 246, 0.5)); height: 100%; width: {score}%; transition: width 1s ease;'></div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Statistical Summary
-            st.markdown("<h2 class='section-header'>Statistical Summary</h2>", unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("""
-                <div class='glass-card'>
-                    <h3>Prediction Statistics</h3>
-                """, unsafe_allow_html=True)
-                
-                mean_conf = np.mean(preds) * 100
-                median_conf = np.median(preds) * 100
-                std_conf = np.std(preds) * 100
-                
-                st.markdown(f"""
-                    <p><strong>Mean Confidence:</strong> {mean_conf:.2f}%</p>
-                    <p><strong>Median Confidence:</strong> {median_conf:.2f}%</p>
-                    <p><strong>Std Deviation:</strong> {std_conf:.2f}%</p>
-                    <p><strong>Total Classes:</strong> {len(class_names)}</p>
-                    <p><strong>Classes > 1%:</strong> {np.sum(preds > 0.01)}</p>
-                    <p><strong>Classes > 5%:</strong> {np.sum(preds > 0.05)}</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                st.markdown("""
-                <div class='glass-card'>
-                    <h3>Confidence Analysis</h3>
-                """, unsafe_allow_html=True)
-                
-                if max_confidence > 90:
-                    interpretation = "The model is very confident in this prediction. The detected condition is highly likely."
-                elif max_confidence > 75:
-                    interpretation = "The model shows high confidence. The prediction is reliable but consider the top alternatives."
-                elif max_confidence > 60:
-                    interpretation = "The model has moderate confidence. Review the top predictions carefully."
-                else:
-                    interpretation = "The model has low confidence. Multiple conditions are possible."
-                
-                st.markdown(f"""
-                    <p>{interpretation}</p>
-                    <p style='margin-top: 1rem; padding: 1rem; background: rgba(139, 92, 246, 0.1); border-radius: 8px; border-left: 3px solid #8b5cf6;'>
-                        <strong>Note:</strong> This tool provides preliminary analysis. Always verify results with agricultural professionals.
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
+        analysis_pane(image_bytes, prediction_key, backend, use_tta, tile_plan, preview)
 
 # =======================
 # ABOUT PAGE
 # =======================
 elif page == "About":
+    count_section("about")
     st.markdown("""
     <div class='hero-section'>
         <div class='hero-title'>About the System</div>
@@ -1093,12 +1006,19 @@ elif page == "About":
     
     with col2:
         if model_info["metrics"]:
+            predict_stats = metrics.stage("predict").summary()
+            if predict_stats["count"]:
+                inference_time = (f"{predict_stats['p50'] * 1000:.0f} ms median, "
+                                  f"{predict_stats['p95'] * 1000:.0f} ms p95 "
+                                  f"({predict_stats['count']} forward passes)")
+            else:
+                inference_time = "not measured yet in this process"
             st.markdown(f"""
             <div class='glass-card'>
                 <h3>Performance Metrics</h3>
                 <p><strong>Test Accuracy:</strong> {model_info["metrics"]["accuracy"]*100:.2f}%</p>
                 <p><strong>Total Classes:</strong> {model_info["metrics"]["num_classes"]}</p>
-                <p><strong>Inference Time:</strong> ~0.5 seconds</p>
+                <p><strong>Inference Time:</strong> {inference_time}</p>
                 <p><strong>Model Type:</strong> {model_info["metrics"]["model_type"]}</p>
                 <p><strong>TensorFlow:</strong> v{model_info["metrics"]["tensorflow_version"]}</p>
             </div>
@@ -1201,3 +1121,53 @@ elif page == "About":
             <p>Transfer Learning</p>
         </div>
         """, unsafe_allow_html=True)
+
+# =======================
+# Instrumentation
+# =======================
+metrics.stage("script_run").observe(time.perf_counter() - SCRIPT_START)
+
+if st.query_params.get("debug") == "1" or os.environ.get("PLANT_DEBUG_PANEL") == "1":
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("Debug: pipeline metrics", expanded=True):
+            rows = ["| Stage | Count | p50 (ms) | p95 (ms) |", "|---|---:|---:|---:|"]
+            for stage_name, stats in sorted(metrics.REGISTRY.stage_summaries().items()):
+                if stats["count"]:
+                    rows.append(f"| {stage_name} | {stats['count']} | {stats['p50'] * 1000:.1f} "
+                                f"| {stats['p95'] * 1000:.1f} |")
+            st.markdown("\n".join(rows))
+            sections = metrics.REGISTRY.values("plant_script_sections")
+            st.caption("Sections executed: " + ", ".join(
+                f"{dict(key)['section']} {value:.0f}" for key, value in sorted(sections.items())))
+            scheduler_stats = load_scheduler(backend).stats()
+            st.caption(f"Queue depth: {scheduler_stats['queue_depth']}, "
+                       f"forward passes in flight: {scheduler_stats['in_flight']}")
+            cache_stats = prediction_cache.stats()
+            st.caption(f"Prediction cache: {cache_stats['entries']} entries, "
+                       f"{cache_stats['hit_rate']:.0%} hit rate")
+            st.caption(f"Resident memory: {metrics.rss_bytes() / 2**20:.0f} MiB")
+
+if os.environ.get("PLANT_METRICS_FILE"):
+    metrics.write_prometheus_file(os.environ["PLANT_METRICS_FILE"])
+
+# =======================
+# Profiling Results
+# =======================
+if PROFILE_RUN:
+    keep_profile(run_profiler.stop())
+    with st.sidebar:
+        st.markdown("---")
+        with st.expander("Profiling", expanded=True):
+            st.caption("cProfile of each script run; .collapsed.txt opens in speedscope or flamegraph.pl, "
+                       "the TF trace in TensorBoard's profile tab.")
+            for artifacts in reversed(st.session_state["profiles"]):
+                st.markdown(f"**{artifacts['label']}**: {artifacts['seconds'] * 1000:.0f} ms")
+                downloads = [("pstats", "run.pstats"), ("collapsed", "run.collapsed.txt"),
+                             ("tf_trace", "tf_trace.zip")]
+                for kind, file_name in downloads:
+                    if artifacts[kind]:
+                        with open(artifacts[kind], "rb") as f:
+                            st.download_button(f"Download {file_name}", f.read(), file_name=file_name,
+                                               key=f"{artifacts['directory']}-{kind}")
+            st.code(st.session_state["profiles"][-1]["summary"], language=None)
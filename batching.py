@@ -0,0 +1,192 @@
+import itertools
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future, wait
+
+import numpy as np
+
+import inference
+import metrics
+
+# ===============================================================
+# Dynamic request batching
+# ===============================================================
+# Concurrent callers each submit one model-sized image; a worker thread
+# drains the queue into a preallocated batch buffer until either
+# max_batch_size images are waiting or the oldest one has waited
+# max_delay_ms, then runs a single forward pass and resolves every caller's
+# Future with its own row of probabilities. A predict_fn may also return
+# (probabilities, embeddings); each Future then carries its embedding row as
+# ``future.embedding``, so callers get both from one pass. ``workers`` caps how many forward
+# passes run at once, so many callers cannot oversubscribe the CPU; requests
+# beyond that wait in the bounded queue, where each one can ask for its
+# position and an expected wait derived from recent batch latencies.
+
+class DynamicBatcher:
+    """Coalesce concurrent single-image requests into batched forward passes"""
+
+    def __init__(self, predict_fn, max_batch_size=32, max_delay_ms=5.0, max_queue=1024, workers=1,
+                 dtype=np.float32, name="default"):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.workers = workers
+        self.dtype = dtype
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._tickets = itertools.count(1)
+        self._dequeued = 0
+        self._batch_seconds = None
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "batches": 0, "images": 0, "in_flight": 0}
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"dynamic-batcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        metrics.REGISTRY.gauge("plant_queue_depth", "Requests waiting for a forward pass",
+                               fn=self._queue.qsize, batcher=name)
+        metrics.REGISTRY.gauge("plant_forward_passes_in_flight", "Forward passes currently running",
+                               fn=lambda: self._counts["in_flight"], batcher=name)
+        self._batch_sizes = metrics.REGISTRY.histogram("plant_batch_size_images", "Images per dynamic batch",
+                                                       buckets=(1, 2, 4, 8, 16, 32, 64, 128), batcher=name)
+        self._queue_wait = metrics.stage("queue_wait")
+
+    def submit(self, image):
+        """Queue one 224x224 RGB image (PIL image or uint8 HWC array) and return a Future
+
+        The Future carries a ``ticket`` used by position() and expected_wait().
+        Raises queue.Full when the queue is at capacity so callers can shed load.
+        """
+        if self._closed:
+            raise RuntimeError("batcher is closed")
+        future = Future()
+        future.submitted = time.perf_counter()
+        with self._lock:
+            future.ticket = next(self._tickets)
+            self._queue.put_nowait((future.ticket, image, future))
+            self._counts["requests"] += 1
+        return future
+
+    def submit_many(self, images):
+        return [self.submit(image) for image in images]
+
+    def predict(self, image, timeout=None):
+        """Submit one image and wait for its probabilities"""
+        return self.submit(image).result(timeout)
+
+    def position(self, future):
+        """Number of queued requests ahead of this one, including itself; 0 once it is running"""
+        if future.done() or future.running():
+            return 0
+        with self._lock:
+            return max(0, future.ticket - self._dequeued)
+
+    def expected_wait(self, future):
+        """Rough seconds until this request's batch completes, from recent batch latencies"""
+        position = self.position(future)
+        with self._lock:
+            batch_seconds = self._batch_seconds
+        if batch_seconds is None:
+            return None
+        rounds = math.ceil(position / (self.max_batch_size * self.workers)) if position else 0
+        return (rounds + 1) * batch_seconds
+
+    def wait(self, future, on_wait=None, poll_seconds=0.25):
+        """Block until a Future resolves, calling on_wait(position, expected_wait) while it is pending"""
+        while True:
+            done, _ = wait([future], timeout=poll_seconds)
+            if done:
+                return future.result()
+            if on_wait is not None:
+                on_wait(self.position(future), self.expected_wait(future))
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the delay expires"""
+        items = [self._queue.get()]
+        if items[0] is None:
+            self._queue.put(None)
+            return None
+        deadline = time.perf_counter() + self.max_delay
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            items.append(item)
+        with self._lock:
+            self._dequeued = max(self._dequeued, items[-1][0])
+        return items
+
+    def _run(self):
+        buffer = inference.BatchBuffer(self.max_batch_size, dtype=self.dtype)
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            buffer.reset()
+            live = []
+            dequeued = time.perf_counter()
+            for _, image, future in items:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._queue_wait.observe(dequeued - future.submitted)
+                try:
+                    buffer.add(image)
+                    live.append(future)
+                except Exception as exc:
+                    future.set_exception(exc)
+            if not live:
+                continue
+
+            with self._lock:
+                self._counts["in_flight"] += 1
+            start = time.perf_counter()
+            embeddings = None
+            try:
+                predictions = self.predict_fn(buffer.view())
+                if isinstance(predictions, tuple):
+                    predictions, embeddings = predictions
+                predictions = np.asarray(predictions)
+            except Exception as exc:
+                for future in live:
+                    future.set_exception(exc)
+                continue
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._counts["in_flight"] -= 1
+            for i, (future, preds) in enumerate(zip(live, predictions)):
+                if embeddings is not None:
+                    future.embedding = np.array(embeddings[i])
+                future.set_result(preds)
+            self._batch_sizes.observe(len(live))
+            with self._lock:
+                self._counts["batches"] += 1
+                self._counts["images"] += len(live)
+                previous = self._batch_seconds
+                self._batch_seconds = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts["queue_depth"] = self._queue.qsize()
+        counts["mean_batch_size"] = counts["images"] / counts["batches"] if counts["batches"] else 0.0
+        counts["batch_seconds_ewma"] = self._batch_seconds
+        return counts
+
+    def close(self):
+        """Stop accepting work and let the worker finish what is queued"""
+        self._closed = True
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
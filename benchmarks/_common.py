@@ -0,0 +1,74 @@
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# ===============================================================
+# Shared helpers for the benchmark scripts
+# ===============================================================
+
+# Megapixel sizes of the sample images: thumbnail, old phone, 12 MP and 48 MP cameras
+RESOLUTIONS_MP = (0.3, 3, 12, 48)
+
+def dimensions_for(megapixels, aspect=4 / 3):
+    """Width and height of a 4:3 image with roughly the given pixel count"""
+    height = int(round((megapixels * 1e6 / aspect) ** 0.5))
+    return int(round(height * aspect)), height
+
+def synthetic_leaf(megapixels, seed=0, fmt="JPEG", quality=90):
+    """Encode a leaf-like test image (smooth background, textured ellipse, spots)"""
+    rng = np.random.default_rng(seed)
+    width, height = dimensions_for(megapixels)
+
+    coarse = rng.integers(40, 200, size=(24, 32, 3), dtype=np.uint8)
+    image = Image.fromarray(coarse).resize((width, height), Image.BICUBIC)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((width * 0.15, height * 0.1, width * 0.85, height * 0.9), fill=(60, 140, 50))
+    for _ in range(40):
+        x, y = rng.uniform(0.25, 0.75) * width, rng.uniform(0.2, 0.8) * height
+        r = rng.uniform(0.005, 0.02) * width
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(110, 80, 30))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+def percentiles(samples_ms):
+    """p50/p95/p99 and mean of a list of millisecond timings"""
+    values = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
+
+def time_ms(fn, *args):
+    """Call fn and return (result, elapsed milliseconds)"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def environment():
+    """Commit and library versions recorded with results so runs can be compared"""
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {name: getattr(sys.modules.get(name), "__version__", None)
+                for name in ("numpy", "PIL", "tensorflow", "keras")}
+    return {"commit": commit, "python": platform.python_version(), "machine": platform.machine(),
+            "cpu_count": os.cpu_count(), "versions": versions}
+
+def write_json(path, payload):
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Wrote {path}")
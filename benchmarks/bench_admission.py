@@ -0,0 +1,94 @@
+"""Peak memory of decoding oversized uploads, with and without the admission budget.
+
+    python -m benchmarks.bench_admission [--json out.json]
+
+Writes a 100 MP PNG (a cheap-to-store decompression bomb), a 100 MP JPEG and
+a 12 MP JPEG, then decodes each in a fresh interpreter the way the app does
+(inference.decode_image for the model and make_thumbnail for the preview)
+and records the peak RSS growth and the outcome: decoded, downscaled or
+rejected. "unbounded" raises the pixel and byte budgets far above the input
+size to show what the same decode cost before admission existed.
+
+Exits non-zero when an admitted run's peak growth exceeds what the budget
+allows: three bytes per budgeted pixel plus the byte budget plus --slack-mb.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from PIL import Image
+
+import inference
+from benchmarks._common import synthetic_leaf, write_json
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys
+import inference
+with open(sys.argv[1], "rb") as f:
+    data = f.read()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    _, scale = inference.probe_image(data)
+    inference.decode_image(data)
+    inference.make_thumbnail(data)
+    outcome = "downscaled" if scale > 1 else "decoded"
+except inference.ImageRejected as exc:
+    outcome = "rejected"
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"outcome": outcome, "peak_growth_mb": (peak - before) / 1024}))
+"""
+
+def write_inputs(directory):
+    paths = {}
+    paths["png-100MP"] = os.path.join(directory, "bomb.png")
+    Image.new("1", (10000, 10000)).save(paths["png-100MP"])
+    paths["jpeg-100MP"] = os.path.join(directory, "huge.jpg")
+    Image.new("L", (11547, 8660), 128).save(paths["jpeg-100MP"], quality=90)
+    paths["jpeg-12MP"] = os.path.join(directory, "photo.jpg")
+    with open(paths["jpeg-12MP"], "wb") as f:
+        f.write(synthetic_leaf(12))
+    return paths
+
+def decode_in_child(path, env):
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, path],
+                         cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--slack-mb", type=float, default=64.0,
+                        help="allowance for decoder buffers and the thumbnail on top of the budget")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    budget_mb = (3 * inference.MAX_IMAGE_PIXELS + inference.MAX_IMAGE_BYTES) / 2**20 + args.slack_mb
+    modes = {
+        "budget": dict(os.environ),
+        "unbounded": dict(os.environ, PLANT_MAX_IMAGE_MP="100000", PLANT_MAX_IMAGE_MB="100000"),
+    }
+    results, failures = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, path in write_inputs(directory).items():
+            for mode, env in modes.items():
+                row = {"input": name, "mode": mode, **decode_in_child(path, env)}
+                results.append(row)
+                print(f"{name:>11} {mode:>9}: {row['outcome']:>10}  peak +{row['peak_growth_mb']:7.1f} MB")
+                if mode == "budget" and row["peak_growth_mb"] > budget_mb:
+                    failures.append(f"{name} grew {row['peak_growth_mb']:.0f} MB, budget {budget_mb:.0f} MB")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "admission", "max_pixels": inference.MAX_IMAGE_PIXELS,
+                               "max_bytes": inference.MAX_IMAGE_BYTES, "rss_budget_mb": budget_mb,
+                               "results": results})
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Measure per-image allocations of input tensor construction.
+
+    python -m benchmarks.bench_alloc [--batch-size 32] [--batches 10] [--json out.json]
+
+Compares the original ``np.array(img) / 255.0`` + ``np.stack`` + float32
+cast (the cast TF performs on float64 input) with writing into a reused
+inference.BatchBuffer. Both paths start from already-resized 224x224 images
+so only tensor construction is measured.
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+import inference
+from benchmarks._common import write_json
+
+def original_batch(images):
+    arrays = [np.array(img) / 255.0 for img in images]
+    return np.stack(arrays).astype(np.float32)
+
+def buffered_batch(images, buffer):
+    buffer.reset()
+    for img in images:
+        buffer.add(img)
+    return buffer.view()
+
+def measure(build, batches):
+    """Total bytes allocated, peak traced memory and wall time across batches"""
+    tracemalloc.start()
+    allocated = 0
+    start = time.perf_counter()
+    for _ in range(batches):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        build()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"allocated_bytes": allocated, "peak_bytes": peak, "seconds": elapsed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    size = inference.INPUT_SIZE
+    images = [Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+              for _ in range(args.batch_size)]
+    buffer = inference.BatchBuffer(args.batch_size)
+
+    reference = original_batch(images)
+    assert np.allclose(buffered_batch(images, buffer), reference, atol=1e-6)
+
+    results = {
+        "original": measure(lambda: original_batch(images), args.batches),
+        "buffered": measure(lambda: buffered_batch(images, buffer), args.batches),
+    }
+    n_images = args.batch_size * args.batches
+    for name, stats in results.items():
+        stats["bytes_per_image"] = stats["allocated_bytes"] / n_images
+        print(f"{name:>9}: {stats['bytes_per_image'] / 1024:9.1f} KiB allocated/image, "
+              f"peak {stats['peak_bytes'] / 2**20:7.1f} MiB, "
+              f"{n_images / stats['seconds']:8.0f} img/s")
+    ratio = results["original"]["bytes_per_image"] / max(results["buffered"]["bytes_per_image"], 1)
+    print(f"allocation reduction: {ratio:.1f}x")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "alloc", "batch_size": args.batch_size, "results": results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Throughput of serial decode-then-predict versus the prefetching ingest pipeline.
+
+    python -m benchmarks.bench_ingest [--images 256] [--megapixels 3] [--workers 1 2 4] [--json out.json]
+
+Scores --images synthetic photos in batches of --batch-size two ways: the
+old serial loop (inference.load_batch, then the model) and IngestPipeline.run
+with each --workers count, which decodes the next batches on a thread pool
+while the model runs. With the model available the real forward pass is
+used; --model-ms (or a missing TensorFlow) stands in a sleep of that many
+milliseconds per image, which like TF releases the GIL. Reports images/sec,
+the speedup over serial and the time the consumer spent waiting on decode.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import inference
+from pipeline import IngestPipeline
+from benchmarks._common import synthetic_leaf, write_json
+
+def simulated_model(ms_per_image):
+    def model(batch):
+        time.sleep(ms_per_image * len(batch) / 1000)
+        return np.zeros((len(batch), 1), dtype=np.float32)
+    return model
+
+def serial(model, sample, batch_size):
+    buffer = inference.BatchBuffer(batch_size)
+    for i in range(0, len(sample), batch_size):
+        inference.load_batch(sample[i:i + batch_size], buffer)
+        inference.predict_batch(model, buffer.view())
+
+def pipelined(model, sample, batch_size, workers, prefetch):
+    """Run the pipeline; returns the seconds the model side spent waiting for decoded batches"""
+    waited = 0.0
+    with IngestPipeline(batch_size, workers, prefetch) as ingest:
+        batches = ingest.batches(sample)
+        while True:
+            start = time.perf_counter()
+            item = next(batches, None)
+            waited += time.perf_counter() - start
+            if item is None:
+                return waited
+            inference.predict_batch(model, item[2])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--megapixels", type=float, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--prefetch", type=int, default=2)
+    parser.add_argument("--model-ms", type=float, help="simulate the model at this many ms per image")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    model = None
+    if args.model_ms is None:
+        try:
+            model = inference.load_model()
+        except ImportError as exc:
+            args.model_ms = 10.0
+            print(f"No model ({exc}); simulating {args.model_ms:.0f} ms per image", file=sys.stderr)
+    if model is None:
+        model = simulated_model(args.model_ms)
+    model(np.zeros((args.batch_size,) + inference.INPUT_SIZE[::-1] + (3,), dtype=np.float32))
+
+    sample = [synthetic_leaf(args.megapixels, seed=i % 16) for i in range(args.images)]
+    results = {"images": args.images, "megapixels": args.megapixels, "batch_size": args.batch_size,
+               "prefetch": args.prefetch, "model": "simulated" if args.model_ms is not None else "real",
+               "model_ms_per_image": args.model_ms}
+
+    start = time.perf_counter()
+    serial(model, sample, args.batch_size)
+    serial_rate = args.images / (time.perf_counter() - start)
+    results["serial_images_per_second"] = serial_rate
+    print(f"{'serial':>12}: {serial_rate:7.1f} img/s")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        waited = pipelined(model, sample, args.batch_size, workers, args.prefetch)
+        rate = args.images / (time.perf_counter() - start)
+        row = {"images_per_second": rate, "speedup": rate / serial_rate, "decode_wait_seconds": waited}
+        results[f"pipelined_workers{workers}"] = row
+        print(f"{f'{workers} workers':>12}: {rate:7.1f} img/s  ({row['speedup']:.2f}x)  "
+              f"waited {row['decode_wait_seconds']:.2f}s on decode")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "ingest", **results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Single-image inference latency: Keras model.predict versus inference.CompiledModel.
+
+    python -m benchmarks.bench_latency [--runs 200] [--model plant_model.keras] [--json out.json]
+
+Both paths receive the same preprocessed float32 input; the first call of
+each path is excluded so tracing and warmup costs do not skew p50.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import inference
+from benchmarks._common import percentiles, time_ms, write_json
+
+def bench(fn, batch, runs):
+    fn(batch)
+    return percentiles([time_ms(fn, batch)[1] for _ in range(runs)])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--model", default=inference.MODEL_PATH)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    keras_model = inference.load_keras_model(args.model)
+    start = time.perf_counter()
+    compiled = inference.CompiledModel(keras_model)
+    trace_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    batch = rng.random((1,) + compiled.input_shape, dtype=np.float32)
+    np.testing.assert_allclose(compiled(batch), keras_model.predict(batch, verbose=0), atol=1e-5)
+
+    results = {
+        "model.predict": bench(lambda x: keras_model.predict(x, verbose=0), batch, args.runs),
+        "CompiledModel": bench(compiled, batch, args.runs),
+    }
+    for name, stats in results.items():
+        print(f"{name:>14}: p50 {stats['p50_ms']:7.2f}ms  p95 {stats['p95_ms']:7.2f}ms  "
+              f"p99 {stats['p99_ms']:7.2f}ms")
+    speedup = results["model.predict"]["p50_ms"] / results["CompiledModel"]["p50_ms"]
+    print(f"p50 speedup: {speedup:.1f}x (tracing + warmup at load: {trace_seconds:.2f}s)")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "latency", "runs": args.runs,
+                               "trace_seconds": trace_seconds, "results": results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Per-rerun delta payload of the theme, linked as a static asset or inlined.
+
+    python -m benchmarks.bench_payload [--runs 5] [--json out.json]
+
+Runs the Home page through streamlit.testing with PLANT_THEME_CSS=link (the
+default: a <link> to static/theme.min.css) and =inline (the minified CSS in a
+<style> element), and records for each run the bytes of all delta messages,
+the server time to the completed render, and any external URLs in the
+payload. Before the theme moved to static/, every run carried the
+unminified source inline and an @import of Google Fonts, which blocked
+first paint until fonts.googleapis.com answered; "legacy_inline_bytes"
+reports that source size for comparison.
+
+Exits non-zero if the linked theme still costs more than --max-theme-bytes
+per run or if any run references an external host.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+from unittest import mock
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+import build_assets
+from benchmarks._common import write_json
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+EXTERNAL_URL = re.compile(rb"https?://[\w.-]+")
+
+def measured_runs(mode, runs):
+    os.environ["PLANT_THEME_CSS"] = mode
+    # The link carries the file name; inline mode carries the minified CSS itself
+    markers = (b"theme.min.css", build_assets.theme_css().encode()[:64])
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    rows = []
+    enqueue = ForwardMsgQueue.enqueue
+    for _ in range(runs):
+        sizes = {"bytes": 0, "theme_bytes": 0, "external": set()}
+
+        def recording_enqueue(queue, msg):
+            if msg.HasField("delta"):
+                data = msg.SerializeToString()
+                sizes["bytes"] += len(data)
+                if any(marker in data for marker in markers):
+                    sizes["theme_bytes"] += len(data)
+                sizes["external"].update(url.decode() for url in EXTERNAL_URL.findall(data))
+            return enqueue(queue, msg)
+
+        with mock.patch.object(ForwardMsgQueue, "enqueue", recording_enqueue):
+            start = time.perf_counter()
+            app.run()
+            elapsed = time.perf_counter() - start
+        rows.append({"seconds": elapsed, "bytes": sizes["bytes"], "theme_bytes": sizes["theme_bytes"],
+                     "external": sorted(sizes["external"])})
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-theme-bytes", type=int, default=512)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("PLANT_PRELOAD_MODEL", "0")
+    results = {"legacy_inline_bytes": os.path.getsize(build_assets.THEME_SOURCE)}
+    failures = []
+    for mode in ("link", "inline"):
+        rows = measured_runs(mode, args.runs)
+        summary = {
+            "median_ms": statistics.median(r["seconds"] for r in rows) * 1000,
+            "median_bytes": statistics.median(r["bytes"] for r in rows),
+            "theme_bytes": rows[-1]["theme_bytes"],
+            "external": sorted({url for r in rows for url in r["external"]}),
+        }
+        results[mode] = summary
+        print(f"{mode:>6}: {summary['median_bytes'] / 1024:7.1f} KiB per run "
+              f"(theme {summary['theme_bytes']} B), server render {summary['median_ms']:6.1f} ms, "
+              f"external hosts: {', '.join(summary['external']) or 'none'}")
+        if summary["external"]:
+            failures.append(f"{mode} run references {', '.join(summary['external'])}")
+    print(f"legacy inline theme source: {results['legacy_inline_bytes']} B per run")
+    if results["link"]["theme_bytes"] > args.max_theme_bytes:
+        failures.append(f"linked theme costs {results['link']['theme_bytes']} B per run")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "payload", **results})
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
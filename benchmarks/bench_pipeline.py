@@ -0,0 +1,132 @@
+"""Per-stage latency of the detection pipeline, without the UI.
+
+    python -m benchmarks.bench_pipeline [--batch-sizes 1 8 32] [--samples photos/] [--json out.json]
+
+Times each stage separately on synthetic leaf photos at 0.3, 3, 12 and 48 MP
+(plus any real images under --samples):
+
+    preview      inference.make_thumbnail, the app's upload preview (bytes reported too)
+    decode       inference.decode_image (draft-mode JPEG decode to RGB)
+    resize       inference.resize_image to 224x224
+    normalize    writing pixels into a reused float32 BatchBuffer
+    predict      one forward pass per batch (skipped with --no-model)
+    postprocess  argsort, top-5, taxonomy roll-ups and the summary statistics the results page shows
+
+Per-image stages are reported as p50/p95/p99 per resolution; predict and
+postprocess per batch size, together with end-to-end images/sec. The JSON
+output records the commit and library versions so runs can be compared.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import inference
+import score
+from taxonomy import Taxonomy
+from benchmarks._common import (RESOLUTIONS_MP, environment, percentiles, synthetic_leaf,
+                                time_ms, write_json)
+
+def postprocess(preds, taxonomy):
+    """The work the results page does on one prediction vector"""
+    all_indices = np.argsort(preds)[::-1]
+    top_indices = all_indices[:5]
+    return (top_indices, preds[top_indices], np.mean(preds), np.median(preds), np.std(preds),
+            np.sum(preds > 0.01), np.sum(preds > 0.05), all_indices[:10], taxonomy.rollup(preds))
+
+def bench_image_stages(data, repeat, buffer):
+    timings = {"preview": [], "decode": [], "resize": [], "normalize": []}
+    for _ in range(repeat):
+        _, elapsed = time_ms(inference.make_thumbnail, data)
+        timings["preview"].append(elapsed)
+        image, elapsed = time_ms(inference.decode_image, data)
+        timings["decode"].append(elapsed)
+        resized, elapsed = time_ms(inference.resize_image, image)
+        timings["resize"].append(elapsed)
+        buffer.reset()
+        _, elapsed = time_ms(buffer.add, resized)
+        timings["normalize"].append(elapsed)
+    return {stage: percentiles(values) for stage, values in timings.items()}, resized
+
+def bench_batch_stages(model, resized, batch_size, repeat, taxonomy):
+    buffer = inference.BatchBuffer(batch_size)
+    for _ in range(batch_size):
+        buffer.add(resized)
+    batch = buffer.view()
+    timings = {"predict": [], "postprocess": []}
+    if model is not None:
+        preds = inference.predict_batch(model, batch)
+    else:
+        preds = np.full((batch_size, taxonomy.num_classes), 1 / taxonomy.num_classes, dtype=np.float32)
+    for _ in range(repeat):
+        if model is not None:
+            preds, elapsed = time_ms(inference.predict_batch, model, batch)
+            timings["predict"].append(elapsed)
+        start = time.perf_counter()
+        for row in preds:
+            postprocess(row, taxonomy)
+        timings["postprocess"].append((time.perf_counter() - start) * 1000)
+    return {stage: percentiles(values) for stage, values in timings.items() if values}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--samples", help="directory or manifest of real images to include")
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="keras")
+    parser.add_argument("--no-model", action="store_true", help="skip the predict stage")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    inputs = [(f"synthetic-{mp}MP", synthetic_leaf(mp)) for mp in RESOLUTIONS_MP]
+    if args.samples:
+        for path in score.list_images(args.samples):
+            with open(path, "rb") as f:
+                inputs.append((os.path.basename(path), f.read()))
+
+    model = None if args.no_model else inference.load_model(args.backend)
+    taxonomy = Taxonomy(inference.load_class_names())
+    buffer = inference.BatchBuffer(1)
+    results = {"environment": environment(), "backend": None if model is None else args.backend,
+               "images": [], "batches": []}
+
+    print(f"{'input':>20} {'stage':>10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    resized = None
+    for name, data in inputs:
+        stages, resized = bench_image_stages(data, args.repeat, buffer)
+        preview_bytes = len(inference.make_thumbnail(data))
+        results["images"].append({"input": name, "bytes": len(data), "preview_bytes": preview_bytes,
+                                  "stages": stages})
+        print(f"{name:>20} upload {len(data) / 1024:.0f} KiB, preview {preview_bytes / 1024:.0f} KiB")
+        for stage, stats in stages.items():
+            print(f"{name:>20} {stage:>10} {stats['p50_ms']:7.2f}ms {stats['p95_ms']:7.2f}ms "
+                  f"{stats['p99_ms']:7.2f}ms")
+
+    per_image_ms = {
+        row["input"]: sum(stats["p50_ms"] for stage, stats in row["stages"].items() if stage != "preview")
+        for row in results["images"]
+    }
+    for batch_size in args.batch_sizes:
+        stages = bench_batch_stages(model, resized, batch_size, args.repeat, taxonomy)
+        batch_ms = sum(stats["p50_ms"] for stats in stages.values())
+        throughput = {
+            name: batch_size / ((ms * batch_size + batch_ms) / 1000)
+            for name, ms in per_image_ms.items()
+        }
+        results["batches"].append({"batch_size": batch_size, "stages": stages,
+                                   "images_per_s": throughput})
+        for stage, stats in stages.items():
+            print(f"{'batch ' + str(batch_size):>20} {stage:>10} {stats['p50_ms']:7.2f}ms "
+                  f"{stats['p95_ms']:7.2f}ms {stats['p99_ms']:7.2f}ms")
+        print(f"{'batch ' + str(batch_size):>20} img/s: "
+              + ", ".join(f"{name} {rate:.1f}" for name, rate in throughput.items()))
+
+    if args.json:
+        write_json(args.json, {"benchmark": "pipeline", **results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Compare the original full-resolution preprocessing with the fast decode path.
+
+    python -m benchmarks.bench_preprocess [--repeat 5] [--max-delta 0.01] [--json out.json]
+
+For each sample resolution this reports decode and resize timings for both
+paths and the mean/max absolute difference of the normalized model inputs.
+It exits non-zero when the mean difference exceeds --max-delta, so it can
+gate changes to inference.load_image.
+"""
+
+import argparse
+import io
+import sys
+
+import numpy as np
+from PIL import Image
+
+import inference
+from benchmarks._common import RESOLUTIONS_MP, percentiles, synthetic_leaf, time_ms, write_json
+
+def full_decode(data):
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+def full_resize(image):
+    return image.resize(inference.INPUT_SIZE)
+
+def fast_decode(data):
+    return inference.decode_image(data)
+
+def fast_resize(image):
+    return inference.resize_image(image)
+
+def bench_path(data, decode, resize, repeat):
+    decode_ms, resize_ms = [], []
+    for _ in range(repeat):
+        image, elapsed = time_ms(decode, data)
+        decode_ms.append(elapsed)
+        resized, elapsed = time_ms(resize, image)
+        resize_ms.append(elapsed)
+    return inference.preprocess_image(resized), {
+        "decode": percentiles(decode_ms),
+        "resize": percentiles(resize_ms),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-delta", type=float, default=0.01,
+                        help="allowed mean absolute difference of [0, 1] model inputs")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results, failed = [], False
+    print(f"{'MP':>5} {'path':>9} {'decode p50':>11} {'resize p50':>11} {'mean |d|':>9} {'max |d|':>8}")
+    for mp in RESOLUTIONS_MP:
+        data = synthetic_leaf(mp)
+        baseline, before = bench_path(data, full_decode, full_resize, args.repeat)
+        fast, after = bench_path(data, fast_decode, fast_resize, args.repeat)
+        assert np.allclose(fast, inference.preprocess_image(inference.load_image(data)))
+
+        delta = np.abs(fast - baseline)
+        mean_delta, max_delta = float(delta.mean()), float(delta.max())
+        failed |= mean_delta > args.max_delta
+        for name, timings, shown in (("original", before, ""), ("fast", after, f"{mean_delta:9.4f} {max_delta:8.4f}")):
+            print(f"{mp:>5} {name:>9} {timings['decode']['p50_ms']:>9.1f}ms "
+                  f"{timings['resize']['p50_ms']:>9.1f}ms {shown}")
+        results.append({"megapixels": mp, "original": before, "fast": after,
+                        "mean_abs_delta": mean_delta, "max_abs_delta": max_delta})
+
+    if args.json:
+        write_json(args.json, {"benchmark": "preprocess", "results": results})
+    if failed:
+        print(f"FAIL: mean input delta above {args.max_delta}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
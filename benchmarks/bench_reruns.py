@@ -0,0 +1,96 @@
+"""Script sections, server time and payload of one Analyze Image click.
+
+    python -m benchmarks.bench_reruns [--megapixels 12] [--json out.json]
+
+Drives app.py through streamlit.testing: opens Disease Detection, uploads a
+synthetic leaf photo, clicks Analyze Image and then clicks it again (a
+prediction-cache hit). For each run it records which script sections
+executed (the plant_script_sections counters), the wall time, and the bytes
+of every delta message, split into deltas produced inside the analysis_pane
+fragment and everything else.
+
+streamlit.testing always replays a click as a full script run, so the
+"static" bytes and sections it reports are what the old st.rerun() flow
+paid twice per click; a live server re-executes and re-sends only the
+fragment part. Exits non-zero if a click executes the page setup more than
+once per run or if the results pane never rendered.
+"""
+
+import argparse
+import os
+import sys
+import time
+from unittest import mock
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+import metrics
+from benchmarks._common import synthetic_leaf, write_json
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+def section_counts():
+    return {dict(key)["section"]: value for key, value in
+            metrics.REGISTRY.values("plant_script_sections").items()}
+
+def measured_run(action):
+    """Run one AppTest interaction; returns sections executed, seconds and delta bytes"""
+    sizes = {"fragment_bytes": 0, "static_bytes": 0}
+    enqueue = ForwardMsgQueue.enqueue
+
+    def recording_enqueue(queue, msg):
+        if msg.HasField("delta"):
+            kind = "fragment_bytes" if msg.delta.fragment_id else "static_bytes"
+            sizes[kind] += msg.ByteSize()
+        return enqueue(queue, msg)
+
+    before = section_counts()
+    with mock.patch.object(ForwardMsgQueue, "enqueue", recording_enqueue):
+        start = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - start
+    after = section_counts()
+    sections = {name: int(after[name] - before.get(name, 0)) for name in after
+                if after[name] != before.get(name, 0)}
+    return {"seconds": elapsed, "sections": sections, **sizes}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per script run")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    app = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    app.run()
+    app.radio[0].set_value("Disease Detection").run()
+    photo = synthetic_leaf(args.megapixels)
+
+    results = {
+        "upload": measured_run(
+            lambda: app.file_uploader[0].set_value(("leaf.jpg", photo, "image/jpeg")).run()),
+        "analyze": measured_run(lambda: app.button(key="analyze_image").click().run()),
+        "analyze_cached": measured_run(lambda: app.button(key="analyze_image").click().run()),
+    }
+    for name, row in results.items():
+        print(f"{name:>15}: {row['seconds'] * 1000:8.1f} ms  fragment {row['fragment_bytes'] / 1024:8.1f} KiB  "
+              f"static {row['static_bytes'] / 1024:8.1f} KiB  sections {row['sections']}")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "reruns", "megapixels": args.megapixels, "runs": results})
+
+    failures = []
+    if app.exception:
+        failures.append(f"app.py raised: {app.exception[0].message}")
+    for name in ("analyze", "analyze_cached"):
+        if results[name]["sections"].get("page_setup", 0) > 1:
+            failures.append(f"{name} executed the page setup {results[name]['sections']['page_setup']} times")
+        if not results[name]["fragment_bytes"]:
+            failures.append(f"{name} rendered nothing inside the results fragment")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Re-scoring an archive from stored embeddings versus a full backbone pass.
+
+    python -m benchmarks.bench_rescore [--archive 100000] [--sample 256] [--json out.json]
+
+Fills an EmbeddingStore with --archive float16 embeddings, then times
+applying a head to all of them twice: the head alone (memmap read, dense
+layers, top-1) and the whole ``score.py rescore`` command including JSONL
+output. The full-pass cost is the per-image time of decode, backbone and
+head on --sample synthetic 0.3 MP photos in batches of --batch-size,
+extrapolated to the archive. With the model available the real head is
+used; --no-model (or a missing TensorFlow) uses a random head of the same
+shape and times decode and preprocessing only, a lower bound on a full pass.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import embeddings
+import inference
+import score
+from benchmarks._common import synthetic_leaf, write_json
+
+EMBEDDING_DIM = 1280
+
+def random_head(dim, classes, seed=0):
+    rng = np.random.default_rng(seed)
+    return embeddings.DenseHead([
+        ("affine", (rng.standard_normal((dim, classes)) * 0.05).astype(np.float32), np.zeros(classes, np.float32)),
+        ("act", "softmax"),
+    ])
+
+def fill_store(directory, rows, dim, chunk=8192):
+    store = embeddings.EmbeddingStore(directory, dim, "bench")
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        keys = [f"{i:064x}" for i in range(start, start + n)]
+        store.add(keys, rng.random((n, dim), dtype=np.float32), [f"archive/{i}.jpg" for i in range(start, start + n)])
+    return store
+
+def full_pass_ms(model, sample, batch_size):
+    """Milliseconds per image for decode, preprocess and (if given) backbone + head"""
+    buffer = inference.BatchBuffer(batch_size)
+    start = time.perf_counter()
+    for i in range(0, len(sample), batch_size):
+        inference.load_batch(sample[i:i + batch_size], buffer)
+        if model is not None:
+            model(buffer.view())
+    return (time.perf_counter() - start) * 1000 / len(sample)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--no-model", action="store_true", help="skip the backbone; random head")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    model = None
+    if not args.no_model:
+        try:
+            model = embeddings.load_split_model()
+        except ImportError as exc:
+            print(f"No model ({exc}); timing decode and preprocessing only", file=sys.stderr)
+    class_names = inference.load_class_names()
+    head = model.head if model is not None else random_head(EMBEDDING_DIM, len(class_names))
+
+    sample = [synthetic_leaf(0.3, seed=i) for i in range(args.sample)]
+    if model is not None:
+        model(np.zeros((args.batch_size,) + model.input_shape, dtype=np.float32))
+    per_image_ms = full_pass_ms(model, sample, args.batch_size)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = fill_store(directory, args.archive, head.dim)
+        head_path = os.path.join(directory, "head.npz")
+        head.save(head_path)
+
+        start = time.perf_counter()
+        top1 = [np.argmax(head(rows), axis=1) for _, _, rows in store.iter_chunks()]
+        head_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        score.main(["rescore", "-o", os.path.join(directory, "rescored.jsonl"), "--store", directory,
+                    "--version", "bench", "--head", head_path, "--top-k", "5"])
+        command_seconds = time.perf_counter() - start
+        store_mb = store.vectors().nbytes / 2**20
+
+    full_seconds = per_image_ms * args.archive / 1000
+    results = {
+        "archive": args.archive,
+        "store_mb": store_mb,
+        "full_pass": "decode+backbone+head" if model is not None else "decode+preprocess only",
+        "full_pass_ms_per_image": per_image_ms,
+        "full_pass_seconds": full_seconds,
+        "rescore_head_seconds": head_seconds,
+        "rescore_command_seconds": command_seconds,
+        "speedup_head": full_seconds / head_seconds,
+        "speedup_command": full_seconds / command_seconds,
+    }
+    assert sum(len(chunk) for chunk in top1) == args.archive
+    print(f"store: {args.archive} embeddings, {store_mb:.0f} MiB float16")
+    print(f"full pass ({results['full_pass']}): {per_image_ms:.2f} ms/image -> {full_seconds:8.1f}s")
+    print(f"rescore, head only:      {head_seconds:8.2f}s  ({results['speedup_head']:.0f}x faster)")
+    print(f"rescore, score.py + I/O: {command_seconds:8.2f}s  ({results['speedup_command']:.0f}x faster)")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "rescore", "batch_size": args.batch_size, **results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
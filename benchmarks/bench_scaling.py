@@ -0,0 +1,65 @@
+"""Batch-scoring throughput against the number of pinned worker processes.
+
+    python -m benchmarks.bench_scaling [--workers 1 2 4 8] [--images 512] [--json out.json]
+
+Writes --images synthetic 3 MP JPEGs to a temporary directory once, then
+scores them with worker_pool.InferencePool at each worker count (decode and
+inference both happen in the workers, as in ``score.py run --workers N``).
+Reports images/sec and scaling efficiency relative to one worker.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import inference
+from benchmarks._common import synthetic_leaf, write_json
+from worker_pool import InferencePool
+
+def write_samples(directory, count, megapixels):
+    paths = []
+    variants = [synthetic_leaf(megapixels, seed=i) for i in range(8)]
+    for i in range(count):
+        path = os.path.join(directory, f"leaf_{i:05d}.jpg")
+        with open(path, "wb") as f:
+            f.write(variants[i % len(variants)])
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)])
+    parser.add_argument("--images", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--megapixels", type=float, default=3.0)
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="keras")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_samples(directory, args.images, args.megapixels)
+        batches = [paths[i:i + args.batch_size] for i in range(0, len(paths), args.batch_size)]
+        for workers in args.workers:
+            with InferencePool(workers, args.backend) as pool:
+                pool.wait_ready()
+                start = time.perf_counter()
+                for _ in pool.imap_paths(batches):
+                    pass
+                elapsed = time.perf_counter() - start
+            rate = len(paths) / elapsed
+            baseline = results[0]["images_per_s"] / results[0]["workers"] if results else rate / workers
+            row = {"workers": workers, "images_per_s": rate, "efficiency": rate / (baseline * workers)}
+            results.append(row)
+            print(f"{workers:>3} workers: {rate:8.1f} img/s  efficiency {row['efficiency']:.0%}")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "scaling", "backend": args.backend,
+                               "cpu_count": os.cpu_count(), "results": results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
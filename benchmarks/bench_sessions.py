@@ -0,0 +1,83 @@
+"""Throughput and tail latency of N concurrent app sessions, with and without the shared scheduler.
+
+    python -m benchmarks.bench_sessions [--sessions 1 5 10 20] [--requests 20] [--json out.json]
+
+"direct" reproduces the old behaviour where every Streamlit session thread
+calls the model on its own; "scheduler" routes the same requests through
+the batching.DynamicBatcher the app now shares across sessions. Inputs are
+pre-decoded 224x224 uint8 images so only the inference path is compared.
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+
+import inference
+from batching import DynamicBatcher
+from benchmarks._common import percentiles, write_json
+
+def run_sessions(n_sessions, n_requests, image, infer):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(n_sessions)
+
+    def session():
+        barrier.wait()
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            infer(image)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=session) for _ in range(n_sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {"sessions": n_sessions, "images_per_s": len(latencies) / elapsed, "latency": percentiles(latencies)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--requests", type=int, default=20, help="analyses per session")
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="keras")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-delay-ms", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1, help="scheduler forward passes in flight")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    model = inference.load_model(args.backend)
+    h, w = inference.INPUT_SIZE[1], inference.INPUT_SIZE[0]
+    image = np.random.default_rng(0).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+    def direct(img):
+        batch = inference.BatchBuffer(1)
+        batch.add(img)
+        return inference.predict_batch(model, batch.view())[0]
+
+    scheduler = DynamicBatcher(lambda batch: inference.predict_batch(model, batch),
+                               args.max_batch_size, args.max_delay_ms, workers=args.workers)
+
+    results = []
+    for n in args.sessions:
+        for mode, infer in (("direct", direct), ("scheduler", scheduler.predict)):
+            row = run_sessions(n, args.requests, image, infer)
+            row["mode"] = mode
+            results.append(row)
+            print(f"{n:>3} sessions {mode:>9}: {row['images_per_s']:7.1f} img/s  "
+                  f"p50 {row['latency']['p50_ms']:7.1f}ms  p99 {row['latency']['p99_ms']:7.1f}ms")
+    scheduler.close()
+
+    if args.json:
+        write_json(args.json, {"benchmark": "sessions", "backend": args.backend, "results": results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Build cost, query latency and recall of the similar-reference-leaves index.
+
+    python -m benchmarks.bench_similarity [--rows 100000] [--lists 256] [--json out.json]
+
+Fills a SimilarityIndex with clustered synthetic 1280-d embeddings a chunk
+at a time (as ``similarity.py build`` does), recording throughput and the
+peak RSS growth, which stays near one chunk however large the index gets.
+Then times --queries searches exactly and through IVF at several nprobe
+values, reporting p50/p95 latency and recall@k against the exact results.
+"""
+
+import argparse
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import inference
+import similarity
+from benchmarks._common import percentiles, write_json
+
+EMBEDDING_DIM = 1280
+
+def clustered(rng, centers, n, noise=0.9):
+    labels = rng.integers(0, len(centers), n)
+    return labels, centers[labels] + noise * rng.standard_normal((n, centers.shape[1]), dtype=np.float32)
+
+def timed_search(index, queries, k, **kwargs):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append({hit["path"] for hit in index.search(query, k, **kwargs)})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, percentiles(latencies)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk", type=int, default=8192, help="rows embedded and appended per step")
+    parser.add_argument("--lists", type=int, default=256)
+    parser.add_argument("--sample", type=int, default=16384, help="rows used to fit the IVF centroids")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    class_names = inference.load_class_names()
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((4 * len(class_names), EMBEDDING_DIM), dtype=np.float32)
+    results = {"rows": args.rows, "lists": args.lists, "k": args.k}
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = similarity.SimilarityIndex(directory, EMBEDDING_DIM, "bench", class_names)
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        for offset in range(0, args.rows, args.chunk):
+            n = min(args.chunk, args.rows - offset)
+            labels, vectors = clustered(rng, centers, n)
+            keys = [f"{i:064x}" for i in range(offset, offset + n)]
+            sources = [f"refs/{class_names[label % len(class_names)]}/{i}.jpg"
+                       for i, label in zip(range(offset, offset + n), labels)]
+            index.add(keys, vectors, sources)
+        results["build_rows_per_second"] = args.rows / (time.perf_counter() - start)
+        results["build_peak_growth_mb"] = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+        results["index_mb"] = index.store.vectors().nbytes / 2**20
+        print(f"built {args.rows} rows ({results['index_mb']:.0f} MiB float16) at "
+              f"{results['build_rows_per_second']:.0f} rows/s, peak +{results['build_peak_growth_mb']:.0f} MB")
+
+        _, queries = clustered(rng, centers, args.queries)
+        index.search(queries[0], args.k, exact=True)
+        exact, results["exact"] = timed_search(index, queries, args.k, exact=True)
+        print(f"{'exact':>10}: p50 {results['exact']['p50_ms']:7.2f}ms  p95 {results['exact']['p95_ms']:7.2f}ms")
+
+        start = time.perf_counter()
+        index.train_ivf(args.lists, args.sample)
+        results["ivf_train_seconds"] = time.perf_counter() - start
+        print(f"IVF with {args.lists} lists trained in {results['ivf_train_seconds']:.1f}s")
+        for nprobe in args.nprobe:
+            found, row = timed_search(index, queries, args.k, nprobe=nprobe)
+            row["recall"] = float(np.mean([len(a & b) / len(a) for a, b in zip(exact, found)]))
+            results[f"ivf_nprobe{nprobe}"] = row
+            print(f"{f'nprobe {nprobe}':>10}: p50 {row['p50_ms']:7.2f}ms  p95 {row['p95_ms']:7.2f}ms  "
+                  f"recall@{args.k} {row['recall']:.3f}")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "similarity", **results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Cold-start budget check for the Streamlit app.
+
+    python -m benchmarks.bench_startup [--budget 3.0] [--runs 3] [--json out.json]
+
+Each run starts a fresh interpreter that executes app.py once on the Home
+page through streamlit.testing (no browser, background model preload
+disabled) and reports the wall time to the first completed render and which
+heavy modules that render pulled in. Exits non-zero when the median
+time-to-first-render exceeds --budget seconds or when the Home page pulls in
+TensorFlow, plotly or pandas beyond what streamlit itself imports.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks._common import write_json
+
+HEAVY_MODULES = ("tensorflow", "keras", "plotly", "pandas")
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+preloaded = set(sys.modules)
+app = AppTest.from_file("app.py", default_timeout=60)
+app.run()
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules and m not in preloaded]
+print(json.dumps({{"seconds": elapsed, "heavy_modules": heavy, "exception": bool(app.exception)}}))
+"""
+
+def cold_run():
+    env = dict(os.environ, PLANT_PRELOAD_MODEL="0")
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(heavy=HEAVY_MODULES)],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=3.0, help="seconds to first render")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    runs = [cold_run() for _ in range(args.runs)]
+    median = statistics.median(run["seconds"] for run in runs)
+    heavy = sorted({m for run in runs for m in run["heavy_modules"]})
+    print(f"time to first render: median {median:.2f}s over {args.runs} cold runs (budget {args.budget:.2f}s)")
+    print(f"heavy modules imported: {', '.join(heavy) or 'none'}")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "startup", "budget_s": args.budget,
+                               "median_s": median, "runs": runs})
+
+    failures = []
+    if median > args.budget:
+        failures.append(f"median {median:.2f}s exceeds budget {args.budget:.2f}s")
+    if heavy:
+        failures.append(f"Home page imported {', '.join(heavy)}")
+    if any(run["exception"] for run in runs):
+        failures.append("app.py raised during the Home page render")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
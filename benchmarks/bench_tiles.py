@@ -0,0 +1,91 @@
+"""Throughput and peak memory of tiled sliding-window inference on 12 MP photos.
+
+    python -m benchmarks.bench_tiles [--max-tiles 64 256 1024] [--backend keras] [--json out.json]
+
+For each tile cap, a fresh interpreter loads the model, warms it up, then
+runs tiling.open_tiled and tiling.predict_tiles on a synthetic leaf photo
+the way the app does, and reports the tile grid, the decode time, tiles per
+second through the model and the peak RSS growth over the warmed-up
+baseline. --no-model replaces the forward pass with a no-op after the tiles
+are written into the batch buffer, isolating decode, crop and preprocessing.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks._common import synthetic_leaf, write_json
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+import numpy as np
+import inference, tiling
+path, backend, max_tiles, batch_size = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+with open(path, "rb") as f:
+    data = f.read()
+buffer = inference.BatchBuffer(batch_size)
+model = None if backend == "none" else inference.load_model(backend)
+
+def predict_many(tiles):
+    buffer.reset()
+    for tile in tiles:
+        buffer.add(tile)
+    if model is None:
+        return np.zeros((len(tiles), 1), dtype=np.float32)
+    return inference.predict_batch(model, buffer.view())
+
+predict_many([inference.load_image(data)] * batch_size)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+image, plan = tiling.open_tiled(data, max_tiles)
+decoded = time.perf_counter()
+probs = tiling.predict_tiles(predict_many, image, plan, batch_size)
+done = time.perf_counter()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "grid": [len(plan["ys"]), len(plan["xs"])], "tiles": len(probs), "scale": plan["scale"],
+    "decode_ms": (decoded - start) * 1000, "total_ms": (done - start) * 1000,
+    "tiles_per_second": len(probs) / (done - decoded), "peak_growth_mb": (peak - before) / 1024,
+}))
+"""
+
+def run_child(path, backend, max_tiles, batch_size):
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", CHILD, path, backend, str(max_tiles),
+                          str(batch_size)], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--max-tiles", type=int, nargs="+", default=[64, 256, 1024])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--no-model", action="store_true", help="skip the forward pass")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    backend = "none" if args.no_model else args.backend
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "field.jpg")
+        with open(path, "wb") as f:
+            f.write(synthetic_leaf(args.megapixels))
+        for max_tiles in args.max_tiles:
+            row = {"max_tiles": max_tiles, **run_child(path, backend, max_tiles, args.batch_size)}
+            results.append(row)
+            print(f"cap {max_tiles:>5}: {row['grid'][0]:>3}x{row['grid'][1]:<3} = {row['tiles']:>4} tiles "
+                  f"at {row['scale']:5.0%}  decode {row['decode_ms']:7.1f}ms  total {row['total_ms']:8.1f}ms  "
+                  f"{row['tiles_per_second']:8.1f} tiles/s  peak +{row['peak_growth_mb']:6.1f} MB")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "tiles", "megapixels": args.megapixels, "backend": backend,
+                               "batch_size": args.batch_size, "results": results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Accuracy gain and latency cost of adaptive test-time augmentation.
+
+    python -m benchmarks.bench_tta --eval-dir PlantVillage/test [--limit 500] [--json out.json]
+
+Scores every image three ways: a single pass, augmentation on every image
+(all views, no budget) and the adaptive mode the app uses (views only below
+the confidence threshold, capped by the latency budget). Reports top-1
+accuracy, p50/p95 latency, the share of images that were augmented and the
+mean number of extra views. Without --eval-dir it times synthetic leaves and
+reports no accuracy.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import inference
+import tta
+from benchmarks._common import percentiles, synthetic_leaf, write_json
+
+def batch_predictor(model, capacity):
+    """predict_many for AdaptiveTTA: one forward pass over every view it is given"""
+    buffer = inference.BatchBuffer(capacity)
+
+    def predict_many(images):
+        buffer.reset()
+        for image in images:
+            buffer.add(image)
+        return inference.predict_batch(model, buffer.view())
+    return predict_many
+
+def run_mode(augmenter, predict_many, samples, force=False):
+    top1, latencies, views = [], [], []
+    for source, _ in samples:
+        start = time.perf_counter()
+        preds, info = augmenter(predict_many, source, force=force)
+        latencies.append((time.perf_counter() - start) * 1000)
+        top1.append(int(np.argmax(preds)))
+        views.append(info["views"])
+    views = np.asarray(views)
+    return np.asarray(top1), {
+        "latency": percentiles(latencies),
+        "augmented_share": float(np.mean(views > 0)),
+        "mean_extra_views": float(views.mean()),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--eval-dir", help="labelled PlantVillage-style directory for accuracy")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--synthetic", type=int, default=50, help="synthetic images without --eval-dir")
+    parser.add_argument("--backend", default="keras", choices=inference.BACKENDS)
+    parser.add_argument("--threshold", type=float, default=tta.TTA_THRESHOLD)
+    parser.add_argument("--budget-ms", type=float, default=tta.TTA_BUDGET_MS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    if args.eval_dir:
+        samples = inference.list_labelled_images(args.eval_dir, inference.load_class_names())
+        if len(samples) > args.limit:
+            rng = np.random.default_rng(0)
+            samples = [samples[i] for i in sorted(rng.choice(len(samples), args.limit, replace=False))]
+    else:
+        samples = [(synthetic_leaf(12, seed=i), -1) for i in range(args.synthetic)]
+    labels = np.asarray([label for _, label in samples])
+
+    model = inference.load_model(args.backend)
+    predict_many = batch_predictor(model, len(tta.VIEWS) + 1)
+    predict_many([inference.load_image(samples[0][0])])
+
+    modes = {
+        "single": (tta.AdaptiveTTA(threshold=0.0), False),
+        "always": (tta.AdaptiveTTA(budget_ms=float("inf")), True),
+        "adaptive": (tta.AdaptiveTTA(threshold=args.threshold, budget_ms=args.budget_ms), False),
+    }
+    results = {}
+    for name, (augmenter, force) in modes.items():
+        top1, row = run_mode(augmenter, predict_many, samples, force)
+        if args.eval_dir:
+            row["accuracy"] = float(np.mean(top1 == labels))
+        results[name] = row
+        print(f"{name:>9}: p50 {row['latency']['p50_ms']:7.1f}ms  p95 {row['latency']['p95_ms']:7.1f}ms  "
+              f"augmented {row['augmented_share']:6.1%}  extra views {row['mean_extra_views']:4.2f}  "
+              f"accuracy {row.get('accuracy', float('nan')):.4f}")
+
+    if args.json:
+        write_json(args.json, {"benchmark": "tta", "backend": args.backend, "samples": len(samples),
+                               "threshold": args.threshold, "budget_ms": args.budget_ms,
+                               "results": results})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Closed-loop load generator for server.py.
+
+    python -m benchmarks.loadgen --url http://127.0.0.1:8080 --concurrency 16 --duration 30
+    python -m benchmarks.loadgen --mode tensor --images-per-request 8
+
+Each worker thread sends requests back to back for --duration seconds, using
+a synthetic leaf photo (--mode jpeg) or a pre-decoded uint8 tensor
+(--mode tensor). Reports request and image throughput, latency percentiles
+and the server's mean batch size from /readyz.
+"""
+
+import argparse
+import base64
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+import inference
+from benchmarks._common import percentiles, synthetic_leaf, write_json
+
+def build_request(url, mode, images_per_request, megapixels):
+    if mode == "tensor":
+        h, w = inference.INPUT_SIZE[1], inference.INPUT_SIZE[0]
+        pixels = np.random.default_rng(0).integers(0, 256, (images_per_request, h, w, 3), dtype=np.uint8)
+        return (f"{url}/predict", pixels.tobytes(),
+                {"Content-Type": "application/x-uint8-tensor",
+                 "X-Tensor-Shape": f"{images_per_request},{h},{w},3"})
+    data = synthetic_leaf(megapixels)
+    if images_per_request == 1:
+        return f"{url}/predict", data, {"Content-Type": "image/jpeg"}
+    payload = json.dumps({"images": [base64.b64encode(data).decode()] * images_per_request}).encode()
+    return f"{url}/predict", payload, {"Content-Type": "application/json"}
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/readyz") as response:
+                return json.load(response)
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.5)
+    raise SystemExit(f"{url} not ready after {timeout}s")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mode", choices=("jpeg", "tensor"), default="jpeg")
+    parser.add_argument("--images-per-request", type=int, default=1)
+    parser.add_argument("--megapixels", type=float, default=3.0, help="size of the synthetic JPEG")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    wait_until_ready(args.url, timeout=300)
+    target, body, headers = build_request(args.url, args.mode, args.images_per_request, args.megapixels)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def worker():
+        while time.perf_counter() < stop_at:
+            request = urllib.request.Request(target, data=body, headers=headers, method="POST")
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+            except urllib.error.HTTPError as exc:
+                with lock:
+                    errors.append(exc.code)
+            except (urllib.error.URLError, ConnectionError) as exc:
+                with lock:
+                    errors.append(str(exc))
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        raise SystemExit(f"no successful requests ({len(errors)} errors)")
+    stats = percentiles(latencies)
+    result = {
+        "concurrency": args.concurrency,
+        "mode": args.mode,
+        "images_per_request": args.images_per_request,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_s": len(latencies) / elapsed,
+        "images_per_s": len(latencies) * args.images_per_request / elapsed,
+        "latency": stats,
+        "server": wait_until_ready(args.url, timeout=5).get("batcher"),
+    }
+    print(f"{result['requests_per_s']:.1f} req/s, {result['images_per_s']:.1f} img/s, "
+          f"p50 {stats['p50_ms']:.1f}ms p95 {stats['p95_ms']:.1f}ms p99 {stats['p99_ms']:.1f}ms, "
+          f"{len(errors)} errors, mean server batch {result['server']['mean_batch_size']:.1f}")
+    if args.json:
+        write_json(args.json, {"benchmark": "loadgen", **result})
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Build the app's static assets.
+
+    python build_assets.py
+
+Minifies static/theme.css into static/theme.min.css. app.py links that file
+from /app/static (Streamlit's enableStaticServing, see .streamlit/config.toml)
+so the browser fetches and caches it once instead of receiving the whole
+theme in every script run's deltas.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+THEME_SOURCE = os.path.join(STATIC_DIR, "theme.css")
+THEME_MIN = os.path.join(STATIC_DIR, "theme.min.css")
+
+def minify_css(css):
+    """Strip comments and insignificant whitespace; enough for hand-written CSS without hacks"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"([{;])\s*([\w-]+)\s*:\s*", r"\1\2:", css)
+    return css.replace(";}", "}").strip()
+
+def theme_css():
+    """The minified theme, rebuilt from the source when the built file is missing or stale"""
+    if (not os.path.exists(THEME_MIN)
+            or os.path.getmtime(THEME_MIN) < os.path.getmtime(THEME_SOURCE)):
+        return build_theme()
+    with open(THEME_MIN, encoding="utf-8") as f:
+        return f.read()
+
+def theme_version(css):
+    """Short content hash used to bust the browser cache when the theme changes"""
+    return hashlib.sha256(css.encode()).hexdigest()[:10]
+
+def build_theme():
+    with open(THEME_SOURCE, encoding="utf-8") as f:
+        css = minify_css(f.read())
+    with open(THEME_MIN, "w", encoding="utf-8") as f:
+        f.write(css)
+    return css
+
+def main(argv=None):
+    argparse.ArgumentParser(description="Build the app's static assets").parse_args(argv)
+
+    source_size = os.path.getsize(THEME_SOURCE)
+    css = build_theme()
+    print(f"{os.path.relpath(THEME_MIN, BASE_DIR)}: {source_size} -> {len(css.encode())} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import inference
+import metrics
+from pipeline import IngestPipeline
+from prediction_cache import content_digest
+
+# ===============================================================
+# Backbone / head split and the embedding store
+# ===============================================================
+# Almost all of a forward pass is the MobileNetV2 backbone; the classifier
+# on top is a few dense layers over the pooled 1280-d embedding. Splitting
+# the model there lets embeddings be computed once per image, kept in a
+# compact float16 store keyed by content hash, and re-scored with a new or
+# recalibrated head in NumPy, with no backbone pass and no TensorFlow.
+
+EMBEDDINGS_DIR = os.environ.get("PLANT_EMBEDDINGS_DIR", os.path.join(inference.BASE_DIR, "embeddings"))
+HEAD_LAYERS = ("Dense", "Dropout", "BatchNormalization", "Activation")
+
+def _relu6(x):
+    return np.clip(x, 0.0, 6.0)
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _softmax(x):
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    return x / x.sum(axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "relu6": _relu6,
+    "sigmoid": _sigmoid,
+    "swish": lambda x: x * _sigmoid(x),
+    "silu": lambda x: x * _sigmoid(x),
+    "softmax": _softmax,
+}
+
+
+class DenseHead:
+    """Classification head as NumPy steps: embeddings (n, dim) -> probabilities (n, classes)
+
+    Each step is ("affine", weight, bias), ("scale", scale, shift) for a
+    folded BatchNormalization, or ("act", name). ``temperature`` divides the
+    logits before a final softmax, for recalibrating confidence.
+    """
+
+    def __init__(self, steps, temperature=1.0):
+        self.steps = steps
+        self.temperature = temperature
+        for step in steps:
+            if step[0] == "act" and step[1] not in ACTIVATIONS:
+                raise ValueError(f"unsupported head activation {step[1]!r}")
+
+    @classmethod
+    def from_keras(cls, layers):
+        """Convert the dense layers after the embedding; Dropout is an identity at inference"""
+        steps = []
+        for layer in layers:
+            kind = type(layer).__name__
+            if kind == "Dense":
+                weight = layer.kernel.numpy()
+                bias = layer.bias.numpy() if layer.use_bias else np.zeros(weight.shape[1], np.float32)
+                steps.append(("affine", weight, bias))
+                steps.append(("act", layer.activation.__name__))
+            elif kind == "BatchNormalization":
+                dim = layer.moving_mean.shape[-1]
+                gamma = layer.gamma.numpy() if layer.scale else np.ones(dim, np.float32)
+                beta = layer.beta.numpy() if layer.center else np.zeros(dim, np.float32)
+                scale = gamma / np.sqrt(layer.moving_variance.numpy() + layer.epsilon)
+                steps.append(("scale", scale, beta - layer.moving_mean.numpy() * scale))
+            elif kind == "Activation":
+                steps.append(("act", layer.activation.__name__))
+            elif kind != "Dropout":
+                raise ValueError(f"cannot convert {kind} layer {layer.name!r} into a head")
+        return cls([step for step in steps if step != ("act", "linear")])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            spec = json.loads(str(data["spec"]))
+            steps = [(kind, *[data[f"{i}_{j}"] for j in range(arrays)]) if arrays else (kind, name)
+                     for i, (kind, name, arrays) in enumerate(spec["steps"])]
+        return cls(steps, spec.get("temperature", 1.0))
+
+    def save(self, path):
+        spec, arrays = [], {}
+        for i, step in enumerate(self.steps):
+            if step[0] == "act":
+                spec.append((step[0], step[1], 0))
+            else:
+                spec.append((step[0], None, len(step) - 1))
+                arrays.update({f"{i}_{j}": array for j, array in enumerate(step[1:])})
+        np.savez(path, spec=json.dumps({"steps": spec, "temperature": self.temperature}), **arrays)
+
+    @property
+    def dim(self):
+        return next(step[1].shape[0] for step in self.steps if step[0] != "act")
+
+    def __call__(self, embeddings):
+        x = np.asarray(embeddings, dtype=np.float32)
+        last = len(self.steps) - 1
+        for i, step in enumerate(self.steps):
+            if step[0] == "affine":
+                x = x @ step[1] + step[2]
+            elif step[0] == "scale":
+                x = x * step[1] + step[2]
+            else:
+                if i == last and step[1] == "softmax" and self.temperature != 1.0:
+                    x = x / self.temperature
+                x = ACTIVATIONS[step[1]](x)
+        return x
+
+def split_keras_model(model):
+    """Split a classifier at its pooled embedding into (backbone Keras model, DenseHead)
+
+    The head is the run of Dense/Dropout/BatchNormalization/Activation
+    layers at the end of the model; the layer before it must output a flat
+    embedding.
+    """
+    import tensorflow as tf
+    layers = model.layers
+    cut = len(layers)
+    while cut > 1 and type(layers[cut - 1]).__name__ in HEAD_LAYERS:
+        cut -= 1
+    embedding = layers[cut - 1].output
+    if cut == len(layers) or len(embedding.shape) != 2:
+        raise ValueError("model does not end in a dense head over a flat embedding")
+    return tf.keras.Model(model.inputs, embedding), DenseHead.from_keras(layers[cut:])
+
+def backbone_version(backbone):
+    """Short hash of the backbone weights; stored embeddings are only valid for this value
+
+    Hashing the weights rather than the model file keeps the store valid
+    when only the head is retrained.
+    """
+    digest = hashlib.sha256()
+    for weight in backbone.weights:
+        digest.update(np.ascontiguousarray(weight.numpy()).tobytes())
+    return digest.hexdigest()[:16]
+
+
+class SplitModel:
+    """Classifier run as backbone then head, so embeddings can be kept and reused
+
+    Callable like CompiledModel (batch -> probabilities); embed() stops at
+    the pooled embedding.
+    """
+
+    def __init__(self, keras_model, buckets=inference.BATCH_BUCKETS, head=None):
+        backbone, default_head = split_keras_model(keras_model)
+        self.version = backbone_version(backbone)
+        self.backbone = inference.CompiledModel(backbone, buckets)
+        self.head = head or default_head
+        self.input_shape = self.backbone.input_shape
+
+    def embed(self, batch):
+        with metrics.timed("embed"):
+            return self.backbone(batch)
+
+    def __call__(self, batch):
+        return self.head(self.embed(batch))
+
+def load_split_model(path=inference.MODEL_PATH, head_path=None, buckets=inference.BATCH_BUCKETS):
+    head = load_head(head_path) if head_path else None
+    return SplitModel(inference.load_keras_model(path), buckets, head)
+
+def load_classifier(backend="keras", path=None, threads=None, buckets=inference.BATCH_BUCKETS):
+    """Like inference.load_model, but a keras classifier comes back as a SplitModel
+
+    The same backbone then serves both predictions and embeddings. Models
+    that do not end in a dense head load as a plain CompiledModel.
+    """
+    if backend != "keras":
+        return inference.load_model(backend, path=path, threads=threads, buckets=buckets)
+    start = time.perf_counter()
+    keras_model = inference.load_keras_model(path or inference.model_path_for(backend))
+    try:
+        model = SplitModel(keras_model, buckets)
+    except ValueError:
+        model = inference.CompiledModel(keras_model, buckets)
+    metrics.REGISTRY.gauge("plant_model_load_seconds", "Model load and warmup time",
+                           backend=backend).set(time.perf_counter() - start)
+    return model
+
+def load_head(path):
+    """A head from a saved .npz, or the head of a full Keras model file"""
+    if path.endswith(".npz"):
+        return DenseHead.load(path)
+    return split_keras_model(inference.load_keras_model(path))[1]
+
+class _AlreadyStored(ValueError):
+    """Raised by the embed_files loader for content the store already holds"""
+
+
+def embed_files(store, model, paths, batch_size=32, progress=None):
+    """Embed image files into a store, skipping content it already holds
+
+    ``store`` is anything with ``in`` and add(keys, embeddings, sources);
+    ``progress(done, added, unreadable)`` is called after every batch.
+    Files are read, hashed and decoded on an IngestPipeline thread pool
+    while the backbone embeds the previous batch. Missing or unreadable
+    files count as unreadable instead of aborting. Returns (added, unreadable).
+    """
+    digests, stored = {}, set()
+
+    def load(item):
+        i, path = item
+        with open(path, "rb") as f:
+            blob = f.read()
+        digests[i] = content_digest(blob)
+        if digests[i] in store:
+            stored.add(i)
+            raise _AlreadyStored(digests[i])
+        return inference.load_image(blob)
+
+    added = failed = done = 0
+    with IngestPipeline(batch_size) as ingest:
+        for chunk, errors, batch in ingest.batches(list(enumerate(paths)), loader=load):
+            ok = [item for item, error in zip(chunk, errors) if error is None]
+            failed += sum(error is not None and i not in stored for (i, _), error in zip(chunk, errors))
+            if ok:
+                added += store.add([digests[i] for i, _ in ok], model.embed(batch), [path for _, path in ok])
+            for i, _ in chunk:
+                digests.pop(i, None)
+                stored.discard(i)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, added, failed)
+    return added, failed
+
+def store_versions(directory=EMBEDDINGS_DIR):
+    """Backbone versions that have an embedding store under directory"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if os.path.exists(os.path.join(directory, name, "keys.tsv")))
+
+
+class EmbeddingStore:
+    """Append-only float16 embeddings keyed by image content hash
+
+    One directory per backbone version holds ``vectors.f16`` (raw rows,
+    memory-mapped for reading) and ``keys.tsv`` (digest and source path per
+    row, in row order). Rows are written before their keys, so after a crash
+    the store reopens at the last row with a key and drops any partial tail.
+    """
+
+    def __init__(self, directory, dim, version):
+        self.directory = os.path.join(directory, version)
+        self.dim = dim
+        self.version = version
+        os.makedirs(self.directory, exist_ok=True)
+        self._vectors_path = os.path.join(self.directory, "vectors.f16")
+        self._keys_path = os.path.join(self.directory, "keys.tsv")
+        lines = []
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, encoding="utf-8") as f:
+                lines = f.readlines()
+        row_bytes = dim * 2
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        # Only the last key line can be torn; keep as many rows as have both a whole row and a key
+        complete = [line for line in lines if line.endswith("\n")]
+        complete = complete[:min(size // row_bytes, len(complete))]
+        pairs = [line[:-1].split("\t", 1) for line in complete]
+        self.keys = [key for key, _ in pairs]
+        self.sources = [source for _, source in pairs]
+        if len(complete) != len(lines):
+            with open(self._keys_path, "w", encoding="utf-8") as f:
+                f.writelines(complete)
+        if size != len(complete) * row_bytes:
+            os.truncate(self._vectors_path, len(complete) * row_bytes)
+        self.index = {key: row for row, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def vectors(self):
+        """All rows as a read-only (n, dim) float16 memmap"""
+        if not self.keys:
+            return np.empty((0, self.dim), dtype=np.float16)
+        return np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(len(self.keys), self.dim))
+
+    def get(self, keys):
+        """Rows for keys, in order; raises KeyError for a key that was never stored"""
+        return self.vectors()[[self.index[key] for key in keys]]
+
+    def add(self, keys, embeddings, sources=None):
+        """Append embeddings for keys not already stored; returns how many were new"""
+        sources = sources or [""] * len(keys)
+        new, seen = [], set()
+        for i, key in enumerate(keys):
+            if key not in self.index and key not in seen:
+                seen.add(key)
+                new.append(i)
+        if not new:
+            return 0
+        rows = np.asarray(embeddings, dtype=np.float16)[new]
+        with open(self._vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(rows).tobytes())
+        with open(self._keys_path, "a", encoding="utf-8") as f:
+            f.writelines(f"{keys[i]}\t{sources[i]}\n" for i in new)
+        for i in new:
+            self.index[keys[i]] = len(self.keys)
+            self.keys.append(keys[i])
+            self.sources.append(sources[i])
+        metrics.count("plant_embeddings_stored", "Embeddings added to the store", amount=len(new))
+        return len(new)
+
+    def iter_chunks(self, chunk_rows=8192):
+        """(keys, sources, float16 rows) in storage order, a chunk at a time"""
+        vectors = self.vectors()
+        for start in range(0, len(self.keys), chunk_rows):
+            end = start + chunk_rows
+            yield self.keys[start:end], self.sources[start:end], np.asarray(vectors[start:end])
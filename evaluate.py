@@ -0,0 +1,150 @@
+"""Evaluate the classifier on a labelled directory and rewrite model_metrics.json.
+
+    python evaluate.py PlantVillage/test [--backend keras] [--batch-size 32] [--workers 4]
+
+Streams a PlantVillage-style tree (one folder per class named as in
+class_names.json) through the ingest pipeline, which decodes on a thread
+pool --prefetch batches ahead of batched inference, and accumulates the confusion matrix and
+summed loss batch by batch, so memory stays constant however many images
+there are. Accuracy, test loss, per-class precision/recall/F1, the confusion
+matrix and throughput are merged into the metrics file the app reads; other
+keys already in it are kept.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import inference
+from pipeline import IngestPipeline
+
+LOSS_EPSILON = 1e-7
+
+def load_sample(sample):
+    return inference.load_image(sample[0])
+
+def per_class_report(confusion, class_names):
+    """Precision, recall, F1 and support per class from a confusion matrix (rows are true labels)"""
+    true_positive = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    precision = np.divide(true_positive, predicted, out=np.zeros_like(true_positive), where=predicted > 0)
+    recall = np.divide(true_positive, support, out=np.zeros_like(true_positive), where=support > 0)
+    denominator = precision + recall
+    f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(true_positive),
+                   where=denominator > 0)
+    return {
+        name: {"precision": float(p), "recall": float(r), "f1": float(f), "support": int(s)}
+        for name, p, r, f, s in zip(class_names, precision, recall, f1, support)
+    }
+
+def evaluate(model, samples, num_classes, batch_size=32, workers=None, prefetch=2, progress=None):
+    """Stream samples through the model; returns the metrics dict for model_metrics.json"""
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+    loss_sum = 0.0
+    unreadable = []
+    start = time.perf_counter()
+    with IngestPipeline(batch_size, workers or os.cpu_count() or 1, prefetch, loader=load_sample) as ingest:
+        for chunk, errors, batch in ingest.batches(samples):
+            unreadable.extend(f"{path}: {error}" for (path, _), error in zip(chunk, errors) if error)
+            labels = np.asarray([label for (_, label), error in zip(chunk, errors) if error is None], dtype=np.intp)
+            if len(labels):
+                preds = inference.predict_batch(model, batch)
+                np.add.at(confusion, (labels, np.argmax(preds, axis=1)), 1)
+                loss_sum -= float(np.log(np.clip(preds[np.arange(len(labels)), labels], LOSS_EPSILON, 1.0)).sum())
+            if progress is not None:
+                progress(int(confusion.sum()) + len(unreadable), time.perf_counter() - start)
+    seconds = time.perf_counter() - start
+
+    evaluated = int(confusion.sum())
+    return {
+        "accuracy": float(np.trace(confusion) / evaluated) if evaluated else 0.0,
+        "test_loss": loss_sum / evaluated if evaluated else 0.0,
+        "num_classes": num_classes,
+        "evaluated_images": evaluated,
+        "unreadable_images": len(unreadable),
+        "images_per_second": evaluated / seconds if seconds else 0.0,
+        "eval_seconds": seconds,
+        "confusion_matrix": confusion.tolist(),
+    }, unreadable
+
+def write_metrics(path, updates):
+    """Merge updates into the metrics file, replacing it atomically"""
+    current = inference.load_metrics(path) or {}
+    current.update(updates)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(current, f, indent=4)
+    os.replace(tmp_path, path)
+
+def library_versions():
+    """TensorFlow and Keras versions, when the backend loaded them"""
+    versions = {}
+    for module, key in (("tensorflow", "tensorflow_version"), ("keras", "keras_version")):
+        version = getattr(sys.modules.get(module), "__version__", None)
+        if version:
+            versions[key] = version
+    return versions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="directory with one folder per class")
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="keras")
+    parser.add_argument("--model", help="override the backend's model file")
+    parser.add_argument("--threads", type=int, help="TFLite interpreter threads")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, help="decode threads (default: one per CPU)")
+    parser.add_argument("--prefetch", type=int, default=2, help="batches decoded ahead of the model")
+    parser.add_argument("--limit", type=int, help="evaluate a seeded random subset of this size")
+    parser.add_argument("--class-names", default=inference.CLASS_NAMES_PATH)
+    parser.add_argument("-o", "--output", default=inference.METRICS_PATH, help="metrics file to update")
+    parser.add_argument("--dry-run", action="store_true", help="print the metrics without writing them")
+    args = parser.parse_args(argv)
+
+    class_names = inference.load_class_names(args.class_names)
+    samples = inference.list_labelled_images(args.input, class_names)
+    if args.limit and len(samples) > args.limit:
+        rng = np.random.default_rng(0)
+        samples = [samples[i] for i in sorted(rng.choice(len(samples), args.limit, replace=False))]
+    if not samples:
+        print(f"No labelled images under {args.input}", file=sys.stderr)
+        return 2
+    print(f"Evaluating {len(samples)} images from {args.input}", file=sys.stderr)
+
+    model = inference.load_model(args.backend, path=args.model, threads=args.threads)
+
+    def progress(done, seconds):
+        print(f"\r{done}/{len(samples)} images ({done / seconds:.1f} img/s)", end="", file=sys.stderr)
+
+    results, unreadable = evaluate(model, samples, len(class_names), args.batch_size, args.workers,
+                                   args.prefetch, progress)
+    print(file=sys.stderr)
+    for error in unreadable[:10]:
+        print(f"unreadable: {error}", file=sys.stderr)
+
+    results["per_class"] = per_class_report(np.asarray(results["confusion_matrix"]), class_names)
+    results.update(library_versions())
+    results.update({
+        "backend": args.backend,
+        "model_version": inference.model_version(args.model or inference.model_path_for(args.backend)),
+        "eval_dir": os.path.abspath(args.input),
+        "evaluated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    })
+    worst = sorted(results["per_class"].items(), key=lambda item: item[1]["recall"])[:5]
+    print(f"accuracy {results['accuracy']:.4f}  loss {results['test_loss']:.4f}  "
+          f"{results['images_per_second']:.1f} img/s over {results['evaluated_images']} images", file=sys.stderr)
+    for name, row in worst:
+        print(f"  lowest recall: {name:<50} recall {row['recall']:.3f}  precision {row['precision']:.3f}",
+              file=sys.stderr)
+
+    if not args.dry_run:
+        write_metrics(args.output, results)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
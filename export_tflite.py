@@ -0,0 +1,157 @@
+"""Export plant_model.keras to TFLite and compare the variants with the Keras model.
+
+    python export_tflite.py --calibration-dir samples/ --eval-dir PlantVillage/test
+
+Writes plant_model_fp32.tflite, plant_model_fp16.tflite and, when calibration
+images are given, plant_model_int8.tflite (weights and activations quantized
+with a representative dataset, float32 input/output kept). Every exported
+variant is then checked against the Keras model: top-1 agreement, accuracy on
+a labelled PlantVillage-style directory next to the model_metrics.json
+baseline, single-image latency, and peak resident memory of a fresh process
+that loads only that backend.
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import numpy as np
+
+import inference
+import score
+from benchmarks._common import percentiles, time_ms
+
+VARIANTS = ("fp32", "fp16", "int8")
+
+# =======================
+# Conversion
+# =======================
+def representative_dataset(paths):
+    """Calibration generator for int8 conversion"""
+    def generate():
+        for path in paths:
+            yield [np.expand_dims(inference.preprocess_image(inference.load_image(path)), 0)]
+    return generate
+
+def convert(keras_model, variant, calibration_paths=None):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if variant == "fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_paths)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+# =======================
+# Parity Checks
+# =======================
+def peak_rss_worker(backend, threads, queue):
+    model = inference.load_model(backend, threads=threads)
+    model(np.zeros((1,) + model.input_shape, dtype=np.float32))
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+def peak_rss_mb(backend, threads):
+    """Peak RSS (MiB) of a fresh process that loads one backend and runs one image"""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=peak_rss_worker, args=(backend, threads, queue))
+    process.start()
+    value = queue.get()
+    process.join()
+    return value
+
+def evaluate(model, samples, batch_size):
+    """Top-1 predictions for every sample, batched through one reusable buffer"""
+    buffer = inference.BatchBuffer(batch_size)
+    top1 = []
+    for start in range(0, len(samples), batch_size):
+        buffer.reset()
+        for path, _ in samples[start:start + batch_size]:
+            buffer.add(inference.load_image(path))
+        top1.extend(np.argmax(inference.predict_batch(model, buffer.view()), axis=1))
+    return np.asarray(top1)
+
+def single_image_latency(model, runs=100):
+    batch = np.random.default_rng(0).random((1,) + model.input_shape, dtype=np.float32)
+    model(batch)
+    return percentiles([time_ms(model, batch)[1] for _ in range(runs)])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--calibration-dir", help="images for int8 calibration (directory or manifest)")
+    parser.add_argument("--calibration-size", type=int, default=200)
+    parser.add_argument("--eval-dir", help="labelled PlantVillage-style directory for accuracy")
+    parser.add_argument("--eval-limit", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, help="TFLite interpreter threads")
+    parser.add_argument("--report", default="tflite_report.json")
+    args = parser.parse_args(argv)
+
+    keras_model = inference.load_keras_model()
+    class_names = inference.load_class_names()
+
+    calibration = []
+    if args.calibration_dir:
+        calibration = score.list_images(args.calibration_dir)
+        rng = np.random.default_rng(0)
+        if len(calibration) > args.calibration_size:
+            calibration = sorted(rng.choice(calibration, args.calibration_size, replace=False))
+
+    exported = []
+    for variant in args.variants:
+        if variant == "int8" and not calibration:
+            print("Skipping int8: it needs --calibration-dir images", file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        data = convert(keras_model, variant, calibration)
+        path = inference.model_path_for(f"tflite-{variant}")
+        with open(path, "wb") as f:
+            f.write(data)
+        exported.append(f"tflite-{variant}")
+        print(f"Wrote {path} ({len(data) / 2**20:.1f} MiB) in {time.perf_counter() - start:.1f}s")
+
+    samples = []
+    if args.eval_dir:
+        samples = inference.list_labelled_images(args.eval_dir, class_names)
+        if len(samples) > args.eval_limit:
+            rng = np.random.default_rng(0)
+            samples = [samples[i] for i in sorted(rng.choice(len(samples), args.eval_limit, replace=False))]
+    elif calibration:
+        samples = [(path, -1) for path in calibration]
+    labels = np.asarray([label for _, label in samples])
+
+    baseline = inference.load_metrics() or {}
+    report = {"baseline_accuracy": baseline.get("accuracy"), "samples": len(samples), "backends": {}}
+    reference = None
+    for backend in ["keras"] + exported:
+        model = inference.load_model(backend, threads=args.threads)
+        row = {"latency": single_image_latency(model), "peak_rss_mb": peak_rss_mb(backend, args.threads)}
+        if samples:
+            top1 = evaluate(model, samples, args.batch_size)
+            if reference is None:
+                reference = top1
+            row["top1_agreement_with_keras"] = float(np.mean(top1 == reference))
+            if args.eval_dir:
+                row["accuracy"] = float(np.mean(top1 == labels))
+        report["backends"][backend] = row
+        print(f"{backend:>12}: p50 {row['latency']['p50_ms']:6.2f}ms  "
+              f"peak RSS {row['peak_rss_mb']:7.1f} MiB  "
+              f"agreement {row.get('top1_agreement_with_keras', float('nan')):.4f}  "
+              f"accuracy {row.get('accuracy', float('nan')):.4f}")
+
+    if report["baseline_accuracy"] is not None:
+        print(f"model_metrics.json baseline accuracy: {report['baseline_accuracy']:.4f}")
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.report}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
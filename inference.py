@@ -0,0 +1,442 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+import metrics
+
+# ===============================================================
+# Shared inference helpers used by the Streamlit app and the CLI
+# ===============================================================
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "plant_model.keras")
+CLASS_NAMES_PATH = os.path.join(BASE_DIR, "class_names.json")
+METRICS_PATH = os.path.join(BASE_DIR, "model_metrics.json")
+
+INPUT_SIZE = (224, 224)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Fast decode keeps at least this multiple of the target size before the
+# final filter pass; see benchmarks/bench_preprocess.py for the accuracy check.
+DRAFT_OVERSAMPLE = 2
+REDUCING_GAP = 2.0
+
+# Longest side of the upload preview shown in the app; large enough for a
+# half-width column on a high-DPI screen
+PREVIEW_MAX_SIDE = 960
+
+# Admission budgets, checked against the image header before any pixels are
+# decoded. Oversized JPEGs are decoded at a reduced DCT scale that fits the
+# pixel budget ("downscale"); other formats cannot be, and are rejected.
+MAX_IMAGE_PIXELS = int(float(os.environ.get("PLANT_MAX_IMAGE_MP", "50")) * 1e6)
+MAX_IMAGE_BYTES = int(float(os.environ.get("PLANT_MAX_IMAGE_MB", "25")) * 2**20)
+OVERSIZE_POLICY = os.environ.get("PLANT_OVERSIZE_POLICY", "downscale")
+JPEG_DRAFT_SCALES = (1, 2, 4, 8)
+
+PIXEL_SCALE = np.float32(1.0 / 255.0)
+
+# Batch sizes the inference graph is traced for; other sizes are padded up
+BATCH_BUCKETS = (1, 8, 32)
+
+# "keras" runs plant_model.keras; the TFLite variants are produced by export_tflite.py
+BACKENDS = ("keras", "tflite-fp32", "tflite-fp16", "tflite-int8")
+
+# =======================
+# Class Name Helpers
+# =======================
+def format_disease_name(class_name):
+    """Convert class names like 'Apple___Apple_scab' to 'Apple - Apple Scab'"""
+    parts = class_name.split('___')
+    plant = parts[0].replace('_', ' ').strip()
+    disease = parts[1].replace('_', ' ').strip() if len(parts) > 1 else 'Unknown'
+
+    plant = ' '.join(word.capitalize() for word in plant.split())
+    disease = ' '.join(word.capitalize() for word in disease.split())
+
+    return f"{plant} - {disease}"
+
+def get_plant_name(class_name):
+    """Extract plant name from class"""
+    return class_name.split('___')[0].replace('_', ' ').title()
+
+def get_disease_name(class_name):
+    """Extract disease name from class"""
+    parts = class_name.split('___')
+    return parts[1].replace('_', ' ').title() if len(parts) > 1 else 'Unknown'
+
+def is_healthy(class_name):
+    """Check if prediction indicates healthy plant"""
+    return 'healthy' in class_name.lower()
+
+# =======================
+# Model and Metadata
+# =======================
+def configure_threading(intra_op=None, inter_op=None):
+    """Set TF intra/inter-op pool sizes; must run before TensorFlow executes anything"""
+    import tensorflow as tf
+    if intra_op:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+    if inter_op:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+
+def load_keras_model(path=MODEL_PATH):
+    """Deserialize the Keras classifier"""
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+def model_path_for(backend):
+    """Model file used by a backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "keras":
+        return MODEL_PATH
+    return os.path.join(BASE_DIR, f"plant_model_{backend.split('-', 1)[1]}.tflite")
+
+def available_backends():
+    """Backends whose model file exists on disk"""
+    return [backend for backend in BACKENDS if os.path.exists(model_path_for(backend))]
+
+def backend_from_env():
+    """Backend and TFLite thread count from PLANT_BACKEND and PLANT_TFLITE_THREADS"""
+    threads = os.environ.get("PLANT_TFLITE_THREADS")
+    return os.environ.get("PLANT_BACKEND", "keras"), int(threads) if threads else None
+
+def load_model(backend="keras", path=None, threads=None, buckets=BATCH_BUCKETS):
+    """Load the classifier for a backend as a warmed-up callable: batch -> probabilities"""
+    path = path or model_path_for(backend)
+    start = time.perf_counter()
+    if backend == "keras":
+        model = CompiledModel(load_keras_model(path), buckets)
+    else:
+        model = TFLiteModel(path, threads)
+    metrics.REGISTRY.gauge("plant_model_load_seconds", "Model load and warmup time",
+                           backend=backend).set(time.perf_counter() - start)
+    return model
+
+def load_model_async(backend="keras", path=None, threads=None, loader=None):
+    """Start loading a model on a daemon thread and return a Future for it
+
+    TensorFlow import, deserialization and warmup take seconds; running them
+    in the background lets pages that do not need the model render at once.
+    ``loader`` replaces load_model, taking the same arguments.
+    """
+    loader = loader or load_model
+    future = Future()
+
+    def target():
+        try:
+            future.set_result(loader(backend, path=path, threads=threads))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=target, name=f"load-model-{backend}", daemon=True).start()
+    return future
+
+class CompiledModel:
+    """Direct-call inference wrapper with one traced graph per batch-size bucket
+
+    model.predict runs Keras's full predict loop (data adapter, callbacks,
+    step function) on every call, which costs far more than the forward pass
+    for one image. Here each bucket size is traced once at load time and
+    warmed up, and incoming batches are zero-padded up to the nearest bucket
+    so no call ever retraces. Batches larger than the biggest bucket are split.
+    """
+
+    def __init__(self, model, buckets=BATCH_BUCKETS):
+        import tensorflow as tf
+        self.model = model
+        self.buckets = tuple(sorted(buckets))
+        self.input_shape = (INPUT_SIZE[1], INPUT_SIZE[0], 3)
+
+        forward = tf.function(lambda x: model(x, training=False))
+        self._functions = {
+            size: forward.get_concrete_function(tf.TensorSpec((size,) + self.input_shape, tf.float32))
+            for size in self.buckets
+        }
+        for size in self.buckets:
+            self._run(np.zeros((size,) + self.input_shape, dtype=np.float32))
+
+    def _bucket_for(self, n):
+        return next(size for size in self.buckets if size >= n)
+
+    def _run(self, batch):
+        return self._functions[batch.shape[0]](batch).numpy()
+
+    def __call__(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        largest = self.buckets[-1]
+        if len(batch) > largest:
+            return np.concatenate([self(batch[i:i + largest]) for i in range(0, len(batch), largest)])
+
+        n = len(batch)
+        bucket = self._bucket_for(n)
+        if bucket != n:
+            padded = np.zeros((bucket,) + self.input_shape, dtype=np.float32)
+            padded[:n] = batch
+            batch = padded
+        return self._run(batch)[:n]
+
+def model_version(path=MODEL_PATH):
+    """Short content hash of the model file, used to key cached predictions"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+class TFLiteModel:
+    """TFLite interpreter behind the same callable interface as CompiledModel
+
+    Uses the standalone tflite_runtime package when it is installed, which
+    keeps the full TensorFlow runtime out of memory, and falls back to
+    tf.lite otherwise. Float kernels run through the default XNNPACK delegate
+    with ``threads`` worker threads. Exported models keep float32 input and
+    output even when quantized, so callers feed the usual [0, 1] batches.
+    """
+
+    def __init__(self, path, threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=path, num_threads=threads)
+        self.interpreter.allocate_tensors()
+        input_details = self.interpreter.get_input_details()[0]
+        self._input_index = input_details["index"]
+        self._output_index = self.interpreter.get_output_details()[0]["index"]
+        self._batch_size = int(input_details["shape"][0])
+        self.input_shape = tuple(int(d) for d in input_details["shape"][1:])
+        self._lock = threading.Lock()
+        self(np.zeros((1,) + self.input_shape, dtype=np.float32))
+
+    def __call__(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_index, (len(batch),) + self.input_shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self._input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self._output_index).copy()
+
+def load_class_names(path=CLASS_NAMES_PATH):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def list_labelled_images(root, class_names):
+    """(path, class index) pairs from a PlantVillage-style tree with one folder per class"""
+    index = {name: i for i, name in enumerate(class_names)}
+    samples = []
+    for class_dir in sorted(os.listdir(root)):
+        if class_dir not in index:
+            continue
+        folder = os.path.join(root, class_dir)
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(folder, name), index[class_dir]))
+    return samples
+
+def load_metrics(path=METRICS_PATH):
+    """Return the stored evaluation metrics, or None if they are missing or unreadable"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# =======================
+# Admission
+# =======================
+class ImageRejected(ValueError):
+    """An image over the admission budget; the message states the budget that applied"""
+
+
+def _source_bytes(source):
+    """Size in bytes of a path, file object or bytes blob, without reading it"""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+def admission_scale(image, nbytes, max_pixels=None, max_bytes=None, policy=None):
+    """Check a lazily opened image against the budgets using only its header
+
+    Returns the JPEG DCT reduction (1 means decode as is) needed to fit the
+    pixel budget, or raises ImageRejected.
+    """
+    max_pixels = MAX_IMAGE_PIXELS if max_pixels is None else max_pixels
+    max_bytes = MAX_IMAGE_BYTES if max_bytes is None else max_bytes
+    policy = policy or OVERSIZE_POLICY
+    if nbytes > max_bytes:
+        metrics.count("plant_images_rejected", "Images refused at admission", reason="bytes")
+        raise ImageRejected(f"file is {nbytes / 2**20:.1f} MB; the limit is {max_bytes / 2**20:.1f} MB")
+    width, height = image.size
+    if width * height <= max_pixels:
+        return 1
+    if policy == "downscale" and image.format == "JPEG":
+        for scale in JPEG_DRAFT_SCALES[1:]:
+            if (width // scale) * (height // scale) <= max_pixels:
+                metrics.count("plant_images_downscaled", "Oversized JPEGs decoded at reduced scale")
+                return scale
+    metrics.count("plant_images_rejected", "Images refused at admission", reason="pixels")
+    raise ImageRejected(f"image is {width} x {height} ({width * height / 1e6:.1f} MP); "
+                        f"the limit is {max_pixels / 1e6:.1f} MP")
+
+def probe_image(source, max_pixels=None, max_bytes=None, policy=None):
+    """Read only the header of a path, file object or bytes blob
+
+    Returns (lazily opened image, DCT reduction from admission_scale); raises
+    ImageRejected for anything over budget.
+    """
+    nbytes = _source_bytes(source)
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with metrics.timed("probe"):
+        try:
+            image = Image.open(source)
+        except Image.DecompressionBombError as exc:
+            metrics.count("plant_images_rejected", "Images refused at admission", reason="pixels")
+            raise ImageRejected(str(exc)) from exc
+        return image, admission_scale(image, nbytes, max_pixels, max_bytes, policy)
+
+def open_image(source, draft_size=None, max_pixels=None, max_bytes=None, policy=None):
+    """Open an image lazily and apply the admission budgets before any decode
+
+    JPEGs are put in draft mode at the coarsest DCT scale that still covers
+    ``draft_size`` and fits the pixel budget, so full resolution is never
+    materialized.
+    """
+    image, scale = probe_image(source, max_pixels, max_bytes, policy)
+    if image.format == "JPEG":
+        width, height = image.size
+        request = (width // scale, height // scale)
+        if draft_size is not None:
+            request = (min(request[0], draft_size[0]), min(request[1], draft_size[1]))
+        image.draft("RGB", request)
+    return image
+
+# =======================
+# Preprocessing and Prediction
+# =======================
+def decode_image(source, size=INPUT_SIZE):
+    """Decode a path, file object or bytes blob to RGB, at reduced scale for JPEGs
+
+    JPEGs are decoded with DCT scaling (draft mode) to the smallest scale that
+    still covers DRAFT_OVERSAMPLE times the target size, so a 12-48 MP photo
+    never materializes at full resolution. Inputs over the admission budget
+    raise ImageRejected before decoding.
+    """
+    image = open_image(source, (size[0] * DRAFT_OVERSAMPLE, size[1] * DRAFT_OVERSAMPLE))
+    with metrics.timed("decode"):
+        return image.convert("RGB")
+
+def resize_image(image, size=INPUT_SIZE):
+    """Box-reduce by an integer factor, then one bicubic pass to the exact size"""
+    with metrics.timed("resize"):
+        return image.resize(size, Image.BICUBIC, reducing_gap=REDUCING_GAP)
+
+def load_image(source, size=INPUT_SIZE):
+    """Decode a path, file object or bytes blob straight to an RGB image of the model input size"""
+    return resize_image(decode_image(source, size), size)
+
+def make_thumbnail(source, max_side=PREVIEW_MAX_SIDE, quality=85):
+    """Encode a display-sized JPEG preview, decoding large JPEGs in draft mode"""
+    image = open_image(source, (max_side, max_side))
+    with metrics.timed("thumbnail"):
+        image = image.convert("RGB")
+        image.thumbnail((max_side, max_side), Image.BICUBIC, reducing_gap=REDUCING_GAP)
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=quality)
+        return out.getvalue()
+
+def write_pixels(image, out):
+    """Write an RGB image into a preallocated slot, scaling to [0, 1] for float buffers
+
+    The uint8 pixels are multiplied straight into ``out`` in float32, so no
+    float64 temporary is created and TF receives the dtype it computes in.
+    """
+    with metrics.timed("normalize"):
+        pixels = np.asarray(image)
+        if out.dtype == np.uint8:
+            np.copyto(out, pixels)
+        else:
+            np.multiply(pixels, PIXEL_SCALE, out=out, dtype=np.float32)
+    return out
+
+def preprocess_image(image):
+    """Resize an RGB image to the model input size and scale pixels to [0, 1] as float32"""
+    if image.size != INPUT_SIZE:
+        image = image.resize(INPUT_SIZE)
+    out = np.empty((INPUT_SIZE[1], INPUT_SIZE[0], 3), dtype=np.float32)
+    return write_pixels(image, out)
+
+class BatchBuffer:
+    """Reusable model input batch that decoded images are written into in place
+
+    Use dtype=np.uint8 for backends that normalize inside the model.
+    """
+
+    def __init__(self, capacity, dtype=np.float32, size=INPUT_SIZE):
+        self.array = np.empty((capacity, size[1], size[0], 3), dtype=dtype)
+        self.count = 0
+
+    @property
+    def capacity(self):
+        return self.array.shape[0]
+
+    def reset(self):
+        self.count = 0
+
+    def add(self, image):
+        """Append one model-sized RGB image and return its slot index"""
+        if self.count == self.capacity:
+            raise ValueError(f"batch buffer is full ({self.capacity} images)")
+        write_pixels(image, self.array[self.count])
+        self.count += 1
+        return self.count - 1
+
+    def view(self):
+        """The filled part of the buffer, without copying"""
+        return self.array[:self.count]
+
+def load_batch(sources, buffer):
+    """Decode sources into a reset buffer; return one error string (or None) per source
+
+    Unreadable files are skipped rather than raised so a single bad upload
+    does not sink the batch.
+    """
+    buffer.reset()
+    errors = []
+    for source in sources:
+        try:
+            buffer.add(load_image(source))
+            errors.append(None)
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            errors.append(str(exc))
+    return errors
+
+def predict_batch(model, batch):
+    """Run one forward pass over a batch array of preprocessed images"""
+    with metrics.timed("predict"):
+        predictions = np.asarray(model(batch))
+    metrics.count("plant_images_predicted", "Images passed through the model", amount=len(batch))
+    return predictions
+
+def top_k(preds, k):
+    """Return the indices of the k highest-scoring classes, best first"""
+    k = min(k, preds.shape[-1])
+    idx = np.argpartition(preds, -k)[-k:]
+    return idx[np.argsort(preds[idx])[::-1]]
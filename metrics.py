@@ -0,0 +1,204 @@
+import bisect
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# ===============================================================
+# In-process metrics: counters, gauges and rolling histograms
+# ===============================================================
+# Every process (Streamlit app, server, CLI) records into the module-level
+# REGISTRY. Histograms keep cumulative Prometheus buckets plus a rolling
+# window of recent observations for percentiles, so the sidebar debug panel
+# and the About page can show live p50/p95 without an external backend.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self, name, labels):
+        return [(f"{name}_total{_label_text(labels)}", self._value)]
+
+
+class Gauge:
+    """A value that is set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, fn=None):
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._fn() if self._fn is not None else self._value
+
+    def samples(self, name, labels):
+        value = self.value
+        return [] if value is None else [(f"{name}{_label_text(labels)}", value)]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._recent.append(value)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def quantile(self, q):
+        """Quantile over the rolling window, or None before the first observation"""
+        with self._lock:
+            recent = list(self._recent)
+        return float(np.quantile(recent, q)) if recent else None
+
+    def summary(self):
+        return {"count": self.count, "p50": self.quantile(0.5), "p95": self.quantile(0.95),
+                "p99": self.quantile(0.99)}
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples.append((f"{name}_bucket{_label_text({**labels, 'le': le})}", cumulative))
+        samples.append((f"{name}_sum{_label_text(labels)}", total))
+        samples.append((f"{name}_count{_label_text(labels)}", cumulative))
+        return samples
+
+
+class Registry:
+    """Named metric families, each holding one metric per label set"""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, {"kind": cls.kind, "help": help, "metrics": {}})
+            metric = family["metrics"].get(key)
+            if metric is None:
+                metric = family["metrics"][key] = cls(**kwargs)
+        return metric
+
+    def counter(self, name, help="", **labels):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", fn=None, **labels):
+        gauge = self._get(Gauge, name, help, labels)
+        if fn is not None:
+            gauge._fn = fn
+        return gauge
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def values(self, name):
+        """{labels dict as sorted tuple: current value} for one counter or gauge family"""
+        with self._lock:
+            family = self._families.get(name, {"metrics": {}})
+            metrics = dict(family["metrics"])
+        return {key: metric.value for key, metric in metrics.items()}
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            families = {name: dict(f, metrics=dict(f["metrics"])) for name, f in self._families.items()}
+        lines = []
+        for name, family in sorted(families.items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for key, metric in family["metrics"].items():
+                for sample, value in metric.samples(name, dict(key)):
+                    lines.append(f"{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+    def stage_summaries(self):
+        """{stage: {count, p50, p95, p99}} in seconds for every recorded pipeline stage"""
+        with self._lock:
+            family = self._families.get(STAGE_METRIC, {"metrics": {}})
+            metrics = dict(family["metrics"])
+        return {dict(key)["stage"]: metric.summary() for key, metric in metrics.items()}
+
+
+REGISTRY = Registry()
+STAGE_METRIC = "plant_stage_seconds"
+
+
+def stage(name):
+    """Histogram timing one pipeline stage (decode, resize, predict, render, ...)"""
+    return REGISTRY.histogram(STAGE_METRIC, "Latency of each detection pipeline stage", stage=name)
+
+def timed(name):
+    """Context manager recording the duration of a pipeline stage"""
+    return stage(name).time()
+
+def count(name, help="", amount=1, **labels):
+    REGISTRY.counter(name, help, **labels).inc(amount)
+
+def rss_bytes():
+    """Current resident set size, falling back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+REGISTRY.gauge("plant_process_resident_memory_bytes", "Resident memory of this process", fn=rss_bytes)
+
+def write_prometheus_file(path):
+    """Atomically write the current metrics for a node-exporter textfile collector"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp, path)
@@ -0,0 +1,119 @@
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import inference
+import metrics
+
+# ===============================================================
+# Prefetching ingest pipeline
+# ===============================================================
+# Decoding and resizing one batch serially and then running the model on it
+# leaves the cores idle in one phase while the other runs. Here each image is
+# decoded, resized and written into its batch slot on a thread pool (PIL and
+# the NumPy copy release the GIL), up to ``prefetch`` batches ahead of the
+# consumer, so the next batch is usually ready when the model finishes the
+# current one. The window of batches in flight is the bounded queue: nothing
+# more is submitted until the consumer takes a batch, so a slow model holds
+# back decoding instead of letting decoded images pile up.
+
+INGEST_WORKERS = int(os.environ.get("PLANT_INGEST_WORKERS", "0")) or os.cpu_count() or 1
+INGEST_PREFETCH = int(os.environ.get("PLANT_INGEST_PREFETCH", "2"))
+DECODE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class IngestPipeline:
+    """Thread-pooled decode into double-buffered model input batches
+
+    ``loader`` turns one item into a model-sized RGB image; the default
+    decodes a path, file object or bytes blob. One pipeline (and its thread
+    pool) can serve several consumers at once; each batches() call gets its
+    own buffers and may bring its own loader.
+    """
+
+    def __init__(self, batch_size=32, workers=INGEST_WORKERS, prefetch=INGEST_PREFETCH,
+                 dtype=np.float32, loader=inference.load_image):
+        self.batch_size = batch_size
+        self.prefetch = max(1, prefetch)
+        self.dtype = dtype
+        self.loader = loader
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="ingest")
+        self._wait = metrics.stage("ingest_wait")
+
+    def _fill(self, loader, item, out):
+        try:
+            inference.write_pixels(loader(item), out)
+            return None
+        except DECODE_ERRORS as exc:
+            return str(exc)
+
+    def _submit(self, loader, chunk, buffer):
+        return chunk, [self._pool.submit(self._fill, loader, item, buffer.array[i])
+                       for i, item in enumerate(chunk)], buffer
+
+    def _collect(self, chunk, futures, buffer):
+        start = time.perf_counter()
+        errors = [future.result() for future in futures]
+        self._wait.observe(time.perf_counter() - start)
+        ok = [i for i, error in enumerate(errors) if error is None]
+        if len(ok) != len(chunk):
+            # Close the gaps left by unreadable items so the batch is contiguous
+            buffer.array[:len(ok)] = buffer.array[ok]
+        buffer.count = len(ok)
+        return chunk, errors, buffer.view()
+
+    def batches(self, items, batch_size=None, loader=None):
+        """Yield (items, errors, batch array) for successive chunks of an iterable
+
+        ``errors`` has one entry per item, None where it decoded; the array
+        holds the decoded items in order. It lives in a ring of up to
+        prefetch + 1 buffers, allocated as chunks arrive and no larger than a
+        sized input needs, and stays valid until the next batch is requested.
+        """
+        batch_size = batch_size or self.batch_size
+        loader = loader or self.loader
+        if hasattr(items, "__len__"):
+            batch_size = max(1, min(batch_size, len(items)))
+        buffers = []
+        pending = deque()
+        try:
+            for n, chunk in enumerate(_chunks(items, batch_size)):
+                if len(buffers) <= self.prefetch:
+                    buffers.append(inference.BatchBuffer(batch_size, dtype=self.dtype))
+                pending.append(self._submit(loader, chunk, buffers[n % len(buffers)]))
+                if len(pending) > self.prefetch:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            # A consumer that stops early should not leave decodes queued for nobody
+            for _, futures, _ in pending:
+                for future in futures:
+                    future.cancel()
+
+    def run(self, items, predict, batch_size=None):
+        """Yield (items, errors, predictions) with decoding overlapped with ``predict(batch array)``"""
+        for chunk, errors, batch in self.batches(items, batch_size):
+            yield chunk, errors, predict(batch) if len(batch) else []
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+
+# ===============================================================
+# Content-addressed prediction cache
+# ===============================================================
+# Predictions are keyed by a hash of the uploaded bytes plus the model
+# version, so identical photos share one result regardless of file name and
+# a model swap never serves stale scores. Tier 1 is a bounded in-process LRU
+# shared by every Streamlit session; tier 2 is an optional SQLite file that
+# several worker processes can share.
+
+def content_digest(image_bytes):
+    """Hex SHA-256 of an upload, shared by the prediction cache and the preview cache"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def cache_key(image_bytes, model_version, digest=None):
+    """Key a prediction by image content and the model that produced it"""
+    return f"{digest or content_digest(image_bytes)}:{model_version}"
+
+
+class PredictionCache:
+    """Two-tier LRU + SQLite cache with single-flight computation"""
+
+    def __init__(self, max_entries=512, db_path=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0}
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, preds BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    # -----------------------
+    # Tiers
+    # -----------------------
+    def _record(self, outcome):
+        """Count a lookup outcome; caller must hold self._lock"""
+        self._counts[outcome] += 1
+        metrics.count("plant_prediction_cache_lookups", "Prediction cache lookups by outcome",
+                      outcome=outcome)
+
+    def _remember(self, key, preds):
+        """Insert into the LRU tier; caller must hold self._lock"""
+        self._entries[key] = preds
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT preds FROM predictions WHERE key = ?", (key,)).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def _disk_put(self, key, preds):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO predictions (key, preds) VALUES (?, ?)",
+                             (key, preds.tobytes()))
+            self._db.commit()
+
+    # -----------------------
+    # Public API
+    # -----------------------
+    def peek(self, key):
+        """Return a cached prediction from the in-process tier without touching counters"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def get(self, key):
+        """Look a key up in memory, then on disk; None on a miss"""
+        with self._lock:
+            preds = self._entries.get(key)
+            if preds is not None:
+                self._entries.move_to_end(key)
+                self._record("hits")
+                return preds
+
+        preds = self._disk_get(key)
+        if preds is not None:
+            with self._lock:
+                self._remember(key, preds)
+                self._record("disk_hits")
+        return preds
+
+    def put(self, key, preds):
+        preds = np.asarray(preds, dtype=np.float32)
+        preds.flags.writeable = False
+        with self._lock:
+            self._remember(key, preds)
+        self._disk_put(key, preds)
+        return preds
+
+    def get_or_compute(self, key, compute):
+        """Return the cached prediction for key, running compute() at most once per key
+
+        Concurrent callers asking for the same key while it is being computed
+        wait for the first caller's result instead of running inference again.
+        """
+        preds = self.get(key)
+        if preds is not None:
+            return preds
+
+        with self._lock:
+            preds = self._entries.get(key)
+            if preds is not None:
+                self._record("hits")
+                return preds
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+                self._record("misses")
+            else:
+                self._record("coalesced")
+
+        if not leader:
+            return flight.result()
+
+        try:
+            preds = self.put(key, compute())
+            flight.set_result(preds)
+            return preds
+        except BaseException as exc:
+            flight.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def stats(self):
+        """Snapshot of hit/miss counters and current size"""
+        with self._lock:
+            counts = dict(self._counts)
+            counts["entries"] = len(self._entries)
+        lookups = counts["hits"] + counts["disk_hits"] + counts["misses"] + counts["coalesced"]
+        served = lookups - counts["misses"]
+        counts["hit_rate"] = served / lookups if lookups else 0.0
+        return counts
+
+
+def cache_from_env():
+    """Build a cache configured by PLANT_CACHE_SIZE and PLANT_CACHE_DB"""
+    return PredictionCache(
+        max_entries=int(os.environ.get("PLANT_CACHE_SIZE", "512")),
+        db_path=os.environ.get("PLANT_CACHE_DB") or None,
+    )
@@ -0,0 +1,135 @@
+import cProfile
+import io
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# ===============================================================
+# On-demand profiling of one Streamlit script run
+# ===============================================================
+# Only imported when profiling is requested (?profile=1 or PLANT_PROFILE=1),
+# so normal runs pay nothing. cProfile covers the script thread: CSS
+# injection, markdown rows, the plotly figure build. The forward pass runs
+# on the scheduler's worker thread, so it is captured separately with TF's
+# own profiler, which records op-level timings for every thread.
+
+PROFILE_DIR = os.environ.get("PLANT_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "plant-profiles"))
+
+def _frame_label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def collapsed_stacks(stats, min_seconds=1e-5, max_depth=64):
+    """Fold a pstats caller graph into ``frame;frame;frame microseconds`` lines
+
+    cProfile keeps caller/callee edges rather than whole stacks, so time is
+    split across paths in proportion to each edge's cumulative time, as
+    flameprof and similar tools do. The output loads in flamegraph.pl and
+    speedscope.
+    """
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge
+    folded = defaultdict(float)
+
+    def walk(func, path, seen, cumtime):
+        _, _, tottime, total_cumtime, _ = stats.stats[func]
+        share = cumtime / total_cumtime if total_cumtime else 0.0
+        path = path + (_frame_label(func),)
+        folded[";".join(path)] += tottime * share
+        if len(path) >= max_depth:
+            return
+        for callee, (_, _, _, edge_cumtime) in callees.get(func, {}).items():
+            if callee not in seen and edge_cumtime * share >= min_seconds:
+                walk(callee, path, seen | {callee}, edge_cumtime * share)
+
+    for func, (_, _, _, cumtime, callers) in stats.stats.items():
+        if not callers:
+            walk(func, (), {func}, cumtime)
+    lines = [f"{stack} {round(seconds * 1e6)}" for stack, seconds in folded.items() if seconds * 1e6 >= 1]
+    return "\n".join(sorted(lines)) + "\n"
+
+
+class RunProfiler:
+    """Deterministic profile of one script run, plus an optional TF trace of the predict call"""
+
+    def __init__(self, label="run", directory=PROFILE_DIR):
+        self.label = label
+        self.directory = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self):x}")
+        self._profile = cProfile.Profile()
+        self._tf_logdir = None
+        self._start = None
+        self.running = False
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._start = time.perf_counter()
+        self._profile.enable()
+        self.running = True
+        return self
+
+    @contextmanager
+    def tf_trace(self):
+        """Capture TF op-level timings; a no-op unless TensorFlow is already loaded (keras backend)"""
+        tf = sys.modules.get("tensorflow")
+        if tf is None:
+            yield
+            return
+        self._tf_logdir = os.path.join(self.directory, "tf_trace")
+        tf.profiler.experimental.start(self._tf_logdir)
+        try:
+            yield
+        finally:
+            tf.profiler.experimental.stop()
+
+    def stop(self, label=None):
+        """Stop profiling and write the artifacts; returns a dict describing them"""
+        self._profile.disable()
+        self.running = False
+        elapsed = time.perf_counter() - self._start
+        pstats_path = os.path.join(self.directory, "run.pstats")
+        self._profile.dump_stats(pstats_path)
+
+        stats = pstats.Stats(pstats_path)
+        collapsed_path = os.path.join(self.directory, "run.collapsed.txt")
+        with open(collapsed_path, "w") as f:
+            f.write(collapsed_stacks(stats))
+
+        summary = io.StringIO()
+        pstats.Stats(pstats_path, stream=summary).sort_stats("cumulative").print_stats(25)
+
+        tf_trace_path = None
+        if self._tf_logdir and os.path.isdir(self._tf_logdir):
+            tf_trace_path = shutil.make_archive(self._tf_logdir, "zip", self._tf_logdir)
+        return {
+            "label": label or self.label,
+            "seconds": elapsed,
+            "directory": self.directory,
+            "pstats": pstats_path,
+            "collapsed": collapsed_path,
+            "tf_trace": tf_trace_path,
+            "summary": summary.getvalue(),
+        }
+
+
+@contextmanager
+def session(keep, label="run"):
+    """Profile the block and hand its artifacts to ``keep``, however the block exits"""
+    profiler = RunProfiler(label).start()
+    try:
+        yield profiler
+    finally:
+        keep(profiler.stop())
+
+def finish_interrupted(profiler, keep):
+    """Stop and keep a profiler left running by a script run that ended early"""
+    if profiler is not None and profiler.running:
+        keep(profiler.stop(f"{profiler.label} (interrupted)"))
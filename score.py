@@ -0,0 +1,353 @@
+"""Headless batch scorer for the plant disease classifier.
+
+Score a directory tree or a manifest of image paths and stream top-k
+predictions to JSONL or CSV:
+
+    python score.py run images/ -o scores.jsonl --top-k 5
+    python score.py run manifest.txt -o part0.jsonl --shard 0/4
+    python score.py merge scores.jsonl part0.jsonl part1.jsonl part2.jsonl part3.jsonl
+
+The output file doubles as the checkpoint: re-running the same command skips
+every path already written, so a killed run resumes where it stopped. A
+resume with a different --top-k is refused rather than mixing widths.
+
+embed runs only the backbone and keeps each image's embedding in the float16
+store (keyed by content hash, so it also resumes and skips duplicates);
+rescore then applies a retrained or recalibrated head to the whole store
+without decoding an image or running the backbone again:
+
+    python score.py embed images/ --store embeddings/
+    python score.py rescore -o rescored.jsonl --head new_head.npz --temperature 1.3
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import embeddings
+import inference
+from pipeline import IngestPipeline
+from worker_pool import InferencePool
+
+# =======================
+# Inputs
+# =======================
+def list_images(source):
+    """Return image paths from a directory (walked recursively) or a manifest file"""
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(inference.IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        return paths
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r") as f:
+        lines = (line.strip() for line in f)
+        return [p if os.path.isabs(p) else os.path.join(base, p)
+                for p in lines if p and not p.startswith("#")]
+
+def parse_shard(value):
+    """Parse 'i/N' into (i, N)"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {count}), got {index}")
+    return index, count
+
+def positive_int(value):
+    """Parse a count that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def select_shard(paths, shard):
+    """Deal manifest entries round-robin so every shard gets a deterministic slice"""
+    index, count = shard
+    return paths[index::count]
+
+# =======================
+# Output Formats
+# =======================
+def output_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def csv_header(k):
+    header = ["path", "error"]
+    for rank in range(1, k + 1):
+        header += [f"class_{rank}", f"prob_{rank}"]
+    return header
+
+def record_to_csv_row(record, k):
+    row = [record["path"], record.get("error", "")]
+    for rank in range(k):
+        if rank < len(record["top_k"]):
+            entry = record["top_k"][rank]
+            row += [entry["class"], f"{entry['probability']:.6f}"]
+        else:
+            row += ["", ""]
+    return row
+
+def csv_row_to_record(row):
+    record = {"path": row["path"], "top_k": []}
+    if row.get("error"):
+        record["error"] = row["error"]
+    rank = 1
+    while row.get(f"class_{rank}"):
+        record["top_k"].append({"class": row[f"class_{rank}"],
+                                "probability": float(row[f"prob_{rank}"])})
+        rank += 1
+    return record
+
+def read_records(path):
+    """Yield every complete record from a JSONL or CSV results file"""
+    with open(path, "r", newline="") as f:
+        if output_format(path) == "csv":
+            for row in csv.DictReader(f):
+                yield csv_row_to_record(row)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def checkpoint_k(path):
+    """The top-k width a results file was written with; None until it holds a scored record"""
+    if output_format(path) == "csv":
+        with open(path, "r", newline="") as f:
+            header = next(csv.reader(f), None)
+        return sum(1 for name in header if name.startswith("class_")) if header else None
+    for record in read_records(path):
+        if "error" not in record:
+            return len(record["top_k"])
+    return None
+
+def truncate_partial_line(path):
+    """Drop a trailing half-written line left behind by a killed run"""
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+
+class ResultWriter:
+    """Append-only JSONL/CSV writer that flushes after every batch"""
+
+    def __init__(self, path, k, append=True):
+        self.format = output_format(path)
+        self.k = k
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "a" if append else "w", newline="")
+        if self.format == "csv":
+            self.csv = csv.writer(self.file)
+            if not exists:
+                self.csv.writerow(csv_header(k))
+
+    def write(self, records):
+        for record in records:
+            if self.format == "csv":
+                self.csv.writerow(record_to_csv_row(record, self.k))
+            else:
+                self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+# =======================
+# Commands
+# =======================
+def build_records(paths, errors, predictions, class_names, k):
+    """Combine per-path decode errors and the predictions of the decoded paths into records"""
+    records = []
+    rows = iter(predictions)
+    for path, error in zip(paths, errors):
+        record = {"path": path, "top_k": []}
+        if error is not None:
+            record["error"] = error
+        else:
+            preds = next(rows)
+            record["top_k"] = [
+                {"class": class_names[i], "probability": float(preds[i])}
+                for i in inference.top_k(preds, k)
+            ]
+        records.append(record)
+    return records
+
+def scored_batches(args, todo, class_names, k):
+    """Yield record lists for successive batches, in process or on a worker pool"""
+    batches = [todo[i:i + args.batch_size] for i in range(0, len(todo), args.batch_size)]
+    if args.workers > 1:
+        with InferencePool(args.workers, args.backend, path=args.model,
+                           intra_op_threads=args.threads) as pool:
+            for paths, (errors, predictions) in zip(batches, pool.imap_paths(batches)):
+                yield build_records(paths, errors, predictions, class_names, k)
+        return
+
+    # In process, decoding of the next batches overlaps the forward pass on this one
+    model = inference.load_model(args.backend, path=args.model, threads=args.threads)
+    with IngestPipeline(args.batch_size) as ingest:
+        for paths, errors, predictions in ingest.run(todo, lambda batch: inference.predict_batch(model, batch)):
+            yield build_records(paths, errors, predictions, class_names, k)
+
+def run(args):
+    paths = list_images(args.input)
+    if args.shard:
+        paths = select_shard(paths, args.shard)
+
+    class_names = inference.load_class_names(args.class_names)
+    k = min(args.top_k, len(class_names))
+    done = set()
+    if os.path.exists(args.output):
+        truncate_partial_line(args.output)
+        written_k = checkpoint_k(args.output)
+        if written_k is not None and written_k != k:
+            print(f"{args.output} holds top-{written_k} results; resume with --top-k {written_k} "
+                  f"or write to a new file", file=sys.stderr)
+            return 2
+        done = {record["path"] for record in read_records(args.output)}
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} images in shard, {len(done)} already scored, {len(todo)} to go",
+          file=sys.stderr)
+    if not todo:
+        return 0
+
+    writer = ResultWriter(args.output, k)
+    start = time.perf_counter()
+    scored = 0
+    try:
+        for records in scored_batches(args, todo, class_names, k):
+            writer.write(records)
+            scored += len(records)
+            rate = scored / (time.perf_counter() - start)
+            print(f"\r{scored}/{len(todo)} images ({rate:.1f} img/s)", end="", file=sys.stderr)
+    finally:
+        writer.close()
+        print(file=sys.stderr)
+    return 0
+
+def embed(args):
+    paths = list_images(args.input)
+    if args.shard:
+        paths = select_shard(paths, args.shard)
+
+    model = embeddings.load_split_model(args.model or inference.MODEL_PATH)
+    store = embeddings.EmbeddingStore(args.store, model.head.dim, model.version)
+    print(f"{len(paths)} images, {len(store)} embeddings already stored for backbone {model.version}",
+          file=sys.stderr)
+    start = time.perf_counter()
+
+    def progress(done, added, failed):
+        print(f"\r{done}/{len(paths)} images, {added} embedded, {failed} unreadable "
+              f"({done / (time.perf_counter() - start):.1f} img/s)", end="", file=sys.stderr)
+
+    embeddings.embed_files(store, model, paths, args.batch_size, progress)
+    print(file=sys.stderr)
+    return 0
+
+def rescore(args):
+    version = args.version
+    if version is None:
+        versions = embeddings.store_versions(args.store)
+        if len(versions) != 1:
+            print(f"{args.store} holds {len(versions)} backbone versions; pick one with --version",
+                  file=sys.stderr)
+            return 2
+        version = versions[0]
+    head = embeddings.load_head(args.head or inference.MODEL_PATH)
+    if args.temperature is not None:
+        head.temperature = args.temperature
+    store = embeddings.EmbeddingStore(args.store, head.dim, version)
+    class_names = inference.load_class_names(args.class_names)
+    k = min(args.top_k, len(class_names))
+
+    writer = ResultWriter(args.output, k, append=False)
+    start = time.perf_counter()
+    try:
+        for keys, sources, rows in store.iter_chunks():
+            predictions = head(rows)
+            paths = [source or key for key, source in zip(keys, sources)]
+            writer.write(build_records(paths, [None] * len(paths), predictions, class_names, k))
+    finally:
+        writer.close()
+    print(f"Rescored {len(store)} embeddings in {time.perf_counter() - start:.2f}s into {args.output}",
+          file=sys.stderr)
+    return 0
+
+def merge(args):
+    merged = {}
+    k = 0
+    for path in args.shards:
+        truncate_partial_line(path)
+        for record in read_records(path):
+            merged[record["path"]] = record
+            k = max(k, len(record["top_k"]))
+
+    writer = ResultWriter(args.output, k, append=False)
+    writer.write(merged[p] for p in sorted(merged))
+    writer.close()
+    print(f"Merged {len(merged)} records from {len(args.shards)} files into {args.output}",
+          file=sys.stderr)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Score plant leaf images without the Streamlit UI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="score a directory or manifest")
+    run_parser.add_argument("input", help="image directory or manifest file (one path per line)")
+    run_parser.add_argument("-o", "--output", required=True, help="results file (.jsonl or .csv)")
+    run_parser.add_argument("--top-k", type=positive_int, default=5,
+                            help="classes per image, capped at the number of classes")
+    run_parser.add_argument("--batch-size", type=int, default=32)
+    run_parser.add_argument("--shard", type=parse_shard, help="process slice i of N, e.g. 0/4")
+    run_parser.add_argument("--backend", choices=inference.BACKENDS, default="keras")
+    run_parser.add_argument("--threads", type=int,
+                            help="TFLite interpreter threads, or TF intra-op threads per pool worker")
+    run_parser.add_argument("--workers", type=int, default=1,
+                            help="inference processes, each pinned to its own cores")
+    run_parser.add_argument("--model", help="override the backend's model file")
+    run_parser.add_argument("--class-names", default=inference.CLASS_NAMES_PATH)
+    run_parser.set_defaults(func=run)
+
+    embed_parser = commands.add_parser("embed", help="store backbone embeddings for later rescoring")
+    embed_parser.add_argument("input", help="image directory or manifest file (one path per line)")
+    embed_parser.add_argument("--store", default=embeddings.EMBEDDINGS_DIR, help="embedding store directory")
+    embed_parser.add_argument("--batch-size", type=int, default=32)
+    embed_parser.add_argument("--shard", type=parse_shard, help="process slice i of N, e.g. 0/4")
+    embed_parser.add_argument("--model", help="Keras model file to take the backbone from")
+    embed_parser.set_defaults(func=embed)
+
+    rescore_parser = commands.add_parser("rescore", help="apply a head to every stored embedding")
+    rescore_parser.add_argument("-o", "--output", required=True, help="results file (.jsonl or .csv)")
+    rescore_parser.add_argument("--store", default=embeddings.EMBEDDINGS_DIR, help="embedding store directory")
+    rescore_parser.add_argument("--version", help="backbone version, when the store holds several")
+    rescore_parser.add_argument("--head", help="head .npz, or a Keras model whose head to use")
+    rescore_parser.add_argument("--temperature", type=float, help="softmax temperature, overriding the head's")
+    rescore_parser.add_argument("--top-k", type=positive_int, default=5,
+                                help="classes per image, capped at the number of classes")
+    rescore_parser.add_argument("--class-names", default=inference.CLASS_NAMES_PATH)
+    rescore_parser.set_defaults(func=rescore)
+
+    merge_parser = commands.add_parser("merge", help="combine shard outputs into one file")
+    merge_parser.add_argument("output", help="merged results file (.jsonl or .csv)")
+    merge_parser.add_argument("shards", nargs="+", help="shard result files")
+    merge_parser.set_defaults(func=merge)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Standalone HTTP inference service for the plant disease classifier.
+
+    python server.py --port 8080 --max-batch-size 32 --max-delay-ms 5
+
+Endpoints:
+    GET  /healthz   process is up
+    GET  /readyz    model is loaded and warmed up (503 until then)
+    GET  /metrics   Prometheus text format: stage latencies, queue depth, cache, memory
+    POST /predict   classify one or more images; ?top_k=N (default 5)
+
+/predict accepts three body types:
+    image/jpeg, image/png, application/octet-stream
+        one encoded image
+    application/json
+        {"images": ["<base64 encoded image>", ...]}
+    application/x-uint8-tensor
+        raw uint8 pixels with an ``X-Tensor-Shape: N,224,224,3`` header,
+        which skips decoding entirely
+
+Requests from all connections are coalesced by batching.DynamicBatcher into
+shared forward passes. Only the Python standard library is used on top of
+the model's own dependencies.
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import queue
+import sys
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from PIL import Image
+
+import inference
+import metrics
+from batching import DynamicBatcher
+from worker_pool import start_pool_async
+
+TENSOR_CONTENT_TYPE = "application/x-uint8-tensor"
+
+
+class RequestError(Exception):
+    """A client error reported back as JSON with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class InferenceService:
+    """Model, class metadata and batcher shared by every request handler"""
+
+    def __init__(self, backend, threads, max_batch_size, max_delay_ms, max_queue, workers=1):
+        self.class_names = inference.load_class_names()
+        self.model_version = f"{backend}-{inference.model_version(inference.model_path_for(backend))}"
+        if workers > 1:
+            # Forward passes run in pinned worker processes; ship uint8 pixels to them
+            self.model_future = start_pool_async(workers, backend, intra_op_threads=threads)
+            self.batcher = DynamicBatcher(self._predict, max_batch_size, max_delay_ms, max_queue,
+                                          workers=workers, dtype=np.uint8, name="server")
+        else:
+            self.model_future = inference.load_model_async(backend, threads=threads)
+            self.batcher = DynamicBatcher(self._predict, max_batch_size, max_delay_ms, max_queue,
+                                          name="server")
+
+    def _predict(self, batch):
+        return inference.predict_batch(self.model_future.result(), batch)
+
+    @property
+    def ready(self):
+        return self.model_future.done() and self.model_future.exception() is None
+
+    def decode_images(self, content_type, headers, body):
+        """Turn a request body into a list of model-sized images or uint8 arrays"""
+        if content_type == TENSOR_CONTENT_TYPE:
+            try:
+                shape = tuple(int(d) for d in headers.get("X-Tensor-Shape", "").split(","))
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "X-Tensor-Shape must look like N,224,224,3")
+            expected = (inference.INPUT_SIZE[1], inference.INPUT_SIZE[0], 3)
+            if len(shape) != 4 or shape[1:] != expected:
+                raise RequestError(HTTPStatus.BAD_REQUEST, f"tensor shape must be N,{','.join(map(str, expected))}")
+            if np.prod(shape) != len(body):
+                raise RequestError(HTTPStatus.BAD_REQUEST, "body size does not match X-Tensor-Shape")
+            return list(np.frombuffer(body, dtype=np.uint8).reshape(shape))
+
+        if content_type == "application/json":
+            try:
+                blobs = [base64.b64decode(item, validate=True) for item in json.loads(body)["images"]]
+            except (ValueError, KeyError, TypeError, binascii.Error):
+                raise RequestError(HTTPStatus.BAD_REQUEST, 'expected {"images": [<base64>, ...]}')
+        else:
+            blobs = [body]
+
+        images = []
+        for blob in blobs:
+            try:
+                images.append(inference.load_image(blob))
+            except inference.ImageRejected as exc:
+                raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"image rejected: {exc}")
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                raise RequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f"cannot decode image: {exc}")
+        return images
+
+    def predict(self, images, k):
+        if not self.ready:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "model is still loading")
+        try:
+            futures = [self.batcher.submit(image) for image in images]
+        except queue.Full:
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "inference queue is full")
+
+        results = []
+        for future in futures:
+            preds = future.result()
+            top = inference.top_k(preds, k)
+            results.append({
+                "prediction": self.class_names[top[0]],
+                "label": inference.format_disease_name(self.class_names[top[0]]),
+                "healthy": inference.is_healthy(self.class_names[top[0]]),
+                "top_k": [{"class": self.class_names[i], "probability": float(preds[i])} for i in top],
+            })
+        return {"model_version": self.model_version, "predictions": results}
+
+
+def parse_top_k(query):
+    """The ?top_k=N query value, at least 1; the default is 5"""
+    value = parse_qs(query).get("top_k", ["5"])[0]
+    try:
+        k = int(value)
+    except ValueError:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"top_k must be an integer, got {value!r}")
+    if k < 1:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"top_k must be at least 1, got {k}")
+    return k
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+    max_body_bytes = 0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_metrics(self):
+        body = metrics.REGISTRY.render().encode()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/healthz":
+            self._send_json(HTTPStatus.OK, {"status": "ok"})
+        elif path == "/readyz":
+            if self.service.ready:
+                self._send_json(HTTPStatus.OK, {"status": "ready", "batcher": self.service.batcher.stats()})
+            else:
+                self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"status": "loading"})
+        elif path == "/metrics":
+            self._send_metrics()
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/predict":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            return
+        try:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Content-Length must be an integer")
+            if length <= 0:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "empty body")
+            if length > self.max_body_bytes:
+                raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                   f"body exceeds {self.max_body_bytes} bytes")
+            body = self.rfile.read(length)
+            k = parse_top_k(url.query)
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+            images = self.service.decode_images(content_type, self.headers, body)
+            with metrics.timed("request"):
+                result = self.service.predict(images, k)
+            self._send_json(HTTPStatus.OK, result)
+            metrics.count("plant_requests", "Prediction requests by outcome", endpoint="predict", status="200")
+        except RequestError as exc:
+            self._send_json(exc.status, {"error": str(exc)})
+            metrics.count("plant_requests", "Prediction requests by outcome", endpoint="predict",
+                          status=str(int(exc.status)))
+        except Exception as exc:
+            # A model failure surfaces through future.result(); answer instead of dropping the connection
+            traceback.print_exc(file=sys.stderr)
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"inference failed: {exc}"})
+            metrics.count("plant_requests", "Prediction requests by outcome", endpoint="predict", status="500")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="HTTP inference service for the plant disease classifier")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--backend", choices=inference.BACKENDS, default="keras")
+    parser.add_argument("--threads", type=int,
+                        help="TFLite interpreter threads, or TF intra-op threads per worker process")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="inference processes, each pinned to its own cores")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0,
+                        help="longest a request waits for others to join its batch")
+    parser.add_argument("--max-queue", type=int, default=1024)
+    parser.add_argument("--max-body-mb", type=float, default=50.0)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    Handler.service = InferenceService(args.backend, args.threads, args.max_batch_size,
+                                       args.max_delay_ms, args.max_queue, args.workers)
+    Handler.max_body_bytes = int(args.max_body_mb * 2**20)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"Serving on http://{args.host}:{args.port} (model loading in background)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        Handler.service.batcher.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Nearest-neighbour index of labelled reference leaves over backbone embeddings.
+
+    python similarity.py build PlantVillage/train [--index similarity_index/]
+    python similarity.py train-ivf [--lists 1024]
+    python similarity.py query leaf.jpg [--k 5] [--exact]
+
+build embeds a PlantVillage-style tree (one folder per class) into an
+append-only float16 matrix of L2-normalized embeddings; re-running it adds
+only images whose content is not indexed yet, a batch at a time, so the
+matrix never has to fit in RAM. Search is exact cosine similarity over the
+memory-mapped matrix, or, after train-ivf, an inverted-file (IVF) search
+that scans only the lists nearest the query. Rows added after the last
+train-ivf are always scanned exactly, so the index stays correct while it
+grows.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import embeddings
+import inference
+import metrics
+
+SIMILARITY_DIR = os.environ.get("PLANT_SIMILARITY_DIR", os.path.join(inference.BASE_DIR, "similarity_index"))
+IVF_NPROBE = int(os.environ.get("PLANT_IVF_NPROBE", "8"))
+SEARCH_CHUNK = 16384
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+def chunked_scores(vectors, query, chunk=SEARCH_CHUNK):
+    """Dot products of float16 rows with a float32 query, widened to float32 a chunk at a time
+
+    NumPy has no BLAS path for float16, so converting bounded chunks and
+    using sgemv is several times faster than a float16 product and keeps
+    the extra memory to one chunk.
+    """
+    scores = np.empty(len(vectors), dtype=np.float32)
+    buffer = np.empty((min(chunk, len(vectors)), vectors.shape[1]), dtype=np.float32)
+    for start in range(0, len(vectors), chunk):
+        rows = vectors[start:start + chunk]
+        widened = buffer[:len(rows)]
+        widened[...] = rows
+        np.dot(widened, query, out=scores[start:start + len(rows)])
+    return scores
+
+def best_rows(scores, k):
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(scores, -k)[-k:]
+    return top[np.argsort(scores[top])[::-1]]
+
+def spherical_kmeans(sample, lists, iterations=15, seed=0):
+    """Unit-norm centroids for normalized float32 sample rows (cosine k-means)"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=lists) == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class SimilarityIndex:
+    """Labelled reference embeddings with exact and IVF cosine search
+
+    Rows live in an EmbeddingStore (memory-mapped float16, keyed by content
+    hash, one directory per backbone version); each row's label is the class
+    folder its source image came from.
+    """
+
+    def __init__(self, directory=SIMILARITY_DIR, dim=1280, version="default", class_names=None):
+        self.store = embeddings.EmbeddingStore(directory, dim, version)
+        self.class_names = class_names or inference.load_class_names()
+        self._class_index = {name: i for i, name in enumerate(self.class_names)}
+        self.labels = [self._label(source) for source in self.store.sources]
+        self._ivf_path = os.path.join(self.store.directory, "ivf.npz")
+        self.ivf = None
+        if os.path.exists(self._ivf_path):
+            with np.load(self._ivf_path) as data:
+                ivf = {name: data[name] for name in data.files}
+            # A crash can trim the store below what the lists cover; fall back to exact search then
+            if int(ivf["rows"]) <= len(self.store):
+                self.ivf = ivf
+
+    def _label(self, source):
+        return self._class_index.get(os.path.basename(os.path.dirname(source)), -1)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def add(self, keys, embeddings, sources):
+        added = self.store.add(keys, normalize(embeddings), sources)
+        self.labels.extend(self._label(source) for source in self.store.sources[len(self.labels):])
+        return added
+
+    def train_ivf(self, lists=1024, sample_rows=32768, seed=0):
+        """Cluster a sample of rows into ``lists`` inverted lists and file every row under one
+
+        Only the sample and one chunk of rows are in memory at a time.
+        """
+        vectors = self.store.vectors()
+        if not len(vectors):
+            raise ValueError(f"the index in {self.store.directory} is empty; run `similarity.py build` first")
+        lists = min(lists, len(vectors))
+        rng = np.random.default_rng(seed)
+        sample_rows = min(len(vectors), max(sample_rows, lists))
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_rows, replace=False))],
+                            dtype=np.float32)
+        centroids = spherical_kmeans(sample, lists, seed=seed)
+        del sample
+
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), SEARCH_CHUNK):
+            rows = np.asarray(vectors[start:start + SEARCH_CHUNK], dtype=np.float32)
+            assign[start:start + len(rows)] = np.argmax(rows @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assign[order], np.arange(lists + 1)).astype(np.int64)
+        self.ivf = {"centroids": centroids, "order": order, "offsets": offsets,
+                    "rows": np.int64(len(vectors))}
+        np.savez(self._ivf_path, **self.ivf)
+        return self.ivf
+
+    def candidates(self, query, nprobe):
+        """Row ids in the nprobe lists nearest the query, plus every row added after the lists were built"""
+        ivf = self.ivf
+        nearest = best_rows(ivf["centroids"] @ query, nprobe)
+        rows = [ivf["order"][ivf["offsets"][i]:ivf["offsets"][i + 1]] for i in nearest]
+        rows.append(np.arange(int(ivf["rows"]), len(self.store), dtype=np.int32))
+        return np.sort(np.concatenate(rows))
+
+    def search(self, embedding, k=5, nprobe=None, exact=False):
+        """The k most similar reference rows: dicts with path, label, class and cosine similarity"""
+        if not len(self.store):
+            return []
+        query = normalize(embedding).reshape(-1)
+        vectors = self.store.vectors()
+        with metrics.timed("similarity"):
+            if exact or self.ivf is None:
+                rows = None
+                scores = chunked_scores(vectors, query)
+            else:
+                rows = self.candidates(query, nprobe or IVF_NPROBE)
+                scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+            top = best_rows(scores, k)
+            scores = scores[top]
+            if rows is not None:
+                top = rows[top]
+        results = []
+        for row, score in zip(top, scores):
+            label = self.labels[row]
+            results.append({
+                "path": self.store.sources[row],
+                "label": label,
+                "class": self.class_names[label] if label >= 0 else None,
+                "similarity": float(score),
+            })
+        return results
+
+def open_index(model, directory=SIMILARITY_DIR):
+    """The index for a SplitModel's backbone version"""
+    return SimilarityIndex(directory, model.head.dim, model.version)
+
+def index_stamp(directory, version):
+    """(size, mtime) of a version's keys.tsv and ivf.npz; changes whenever build or train-ivf writes"""
+    stamp = []
+    for name in ("keys.tsv", "ivf.npz"):
+        try:
+            stat = os.stat(os.path.join(directory, version, name))
+            stamp.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def build(args):
+    model = embeddings.load_split_model(args.model or inference.MODEL_PATH)
+    index = open_index(model, args.index)
+    samples = inference.list_labelled_images(args.input, index.class_names)
+    print(f"{len(samples)} labelled images, {len(index)} already indexed", file=sys.stderr)
+    start = time.perf_counter()
+
+    def progress(done, added, failed):
+        print(f"\r{done}/{len(samples)} images, {added} added, {failed} unreadable "
+              f"({done / (time.perf_counter() - start):.1f} img/s)", end="", file=sys.stderr)
+
+    embeddings.embed_files(index, model, [path for path, _ in samples], args.batch_size, progress)
+    print(file=sys.stderr)
+    if index.ivf is not None:
+        print(f"{len(index) - int(index.ivf['rows'])} rows are outside the IVF lists and scanned "
+              f"exactly; re-run train-ivf to file them", file=sys.stderr)
+    return 0
+
+def train_ivf(args):
+    model = embeddings.load_split_model(args.model or inference.MODEL_PATH)
+    index = open_index(model, args.index)
+    if not len(index):
+        print(f"No indexed rows for backbone {model.version}; run `similarity.py build` first", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    ivf = index.train_ivf(args.lists, args.sample)
+    sizes = np.diff(ivf["offsets"])
+    print(f"Filed {len(index)} rows into {len(sizes)} lists (median {np.median(sizes):.0f}, "
+          f"max {sizes.max()}) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+def query(args):
+    model = embeddings.load_split_model(args.model or inference.MODEL_PATH)
+    index = open_index(model, args.index)
+    embedding = model.embed(inference.preprocess_image(inference.load_image(args.image))[None])[0]
+    start = time.perf_counter()
+    results = index.search(embedding, args.k, args.nprobe, args.exact)
+    print(f"{len(index)} rows searched {'exactly' if args.exact or index.ivf is None else 'via IVF'} "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+    for result in results:
+        print(f"{result['similarity']:.3f}  {result['class']}  {result['path']}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Similar reference leaves from backbone embeddings")
+    parser.add_argument("--index", default=SIMILARITY_DIR, help="index directory")
+    parser.add_argument("--model", help="Keras model file to take the backbone from")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_command = commands.add_parser("build", help="add a labelled image tree to the index")
+    build_command.add_argument("input", help="directory with one folder per class")
+    build_command.add_argument("--batch-size", type=int, default=32)
+    build_command.set_defaults(func=build)
+
+    ivf_parser = commands.add_parser("train-ivf", help="(re)build the inverted lists for approximate search")
+    ivf_parser.add_argument("--lists", type=int, default=1024)
+    ivf_parser.add_argument("--sample", type=int, default=32768, help="rows used to fit the centroids")
+    ivf_parser.set_defaults(func=train_ivf)
+
+    query_parser = commands.add_parser("query", help="print the references most similar to an image")
+    query_parser.add_argument("image")
+    query_parser.add_argument("--k", type=int, default=5)
+    query_parser.add_argument("--nprobe", type=int, help=f"IVF lists to scan (default {IVF_NPROBE})")
+    query_parser.add_argument("--exact", action="store_true", help="scan every row")
+    query_parser.set_defaults(func=query)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
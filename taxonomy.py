@@ -0,0 +1,88 @@
+import numpy as np
+
+from inference import format_disease_name, get_disease_name, get_plant_name, is_healthy
+
+# ===============================================================
+# Class taxonomy index
+# ===============================================================
+# class_names.json holds "Plant___Disease" strings. Parsing them once into
+# arrays lets the UI look labels up by class index, and lets a softmax row,
+# or a whole batch of them, be rolled up to per-plant, per-condition and
+# healthy/diseased probabilities with one matrix product (a segment sum over
+# classes). A condition such as Late Blight can span several plants.
+
+
+class Taxonomy:
+    """Labels, plant and disease ids and healthy flags for every class, indexed like the model output"""
+
+    def __init__(self, class_names):
+        self.class_names = list(class_names)
+        self.labels = [format_disease_name(name) for name in self.class_names]
+        self.healthy = np.array([is_healthy(name) for name in self.class_names], dtype=bool)
+        self.plant_names, self.plant_ids = self._vocabulary(get_plant_name)
+        self.disease_names, self.disease_ids = self._vocabulary(get_disease_name)
+
+        # (num_classes, num_groups) indicators: preds @ membership sums each group's classes
+        self.membership = self._membership(self.plant_ids, len(self.plant_names))
+        self.disease_membership = self._membership(self.disease_ids, len(self.disease_names))
+
+    def _vocabulary(self, parse):
+        """Sorted unique values of parse(class name), and each class's index into them"""
+        values = [parse(name) for name in self.class_names]
+        vocabulary = sorted(set(values))
+        index = {value: i for i, value in enumerate(vocabulary)}
+        return vocabulary, np.array([index[value] for value in values], dtype=np.intp)
+
+    def _membership(self, ids, groups):
+        membership = np.zeros((len(self.class_names), groups), dtype=np.float32)
+        membership[np.arange(len(self.class_names)), ids] = 1.0
+        return membership
+
+    @property
+    def num_classes(self):
+        return len(self.class_names)
+
+    @property
+    def num_plants(self):
+        return len(self.plant_names)
+
+    @property
+    def num_diseases(self):
+        return len(self.disease_names)
+
+    def plant_name(self, class_index):
+        return self.plant_names[self.plant_ids[class_index]]
+
+    def disease_name(self, class_index):
+        return self.disease_names[self.disease_ids[class_index]]
+
+    def plant_probabilities(self, preds):
+        """Sum class probabilities per plant: (..., num_classes) -> (..., num_plants)"""
+        return np.asarray(preds, dtype=np.float32) @ self.membership
+
+    def disease_probabilities(self, preds):
+        """Sum class probabilities per condition: (..., num_classes) -> (..., num_diseases)"""
+        return np.asarray(preds, dtype=np.float32) @ self.disease_membership
+
+    def healthy_probability(self, preds):
+        """Total probability on healthy classes: (..., num_classes) -> (...)"""
+        return np.asarray(preds, dtype=np.float32) @ self.healthy.astype(np.float32)
+
+    def rollup(self, preds):
+        """Per-plant, per-condition and healthy/diseased probabilities for one prediction or a batch
+
+        Returns arrays shaped like the input minus the class axis: "plant"
+        and "disease" get a trailing num_plants / num_diseases axis,
+        "top_plant" and "top_disease" hold ids into those.
+        """
+        plants = self.plant_probabilities(preds)
+        diseases = self.disease_probabilities(preds)
+        healthy = self.healthy_probability(preds)
+        return {
+            "plant": plants,
+            "top_plant": np.argmax(plants, axis=-1),
+            "disease": diseases,
+            "top_disease": np.argmax(diseases, axis=-1),
+            "healthy": healthy,
+            "diseased": 1.0 - healthy,
+        }
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+import embeddings
+import inference
+from benchmarks._common import synthetic_leaf
+
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+
+@pytest.fixture(scope="session")
+def leaf_jpeg():
+    return synthetic_leaf(0.3)
+
+@pytest.fixture
+def uniform_model():
+    """Stand-in for the classifier: equal probability for every class"""
+    num_classes = len(inference.load_class_names())
+
+    def model(batch):
+        return np.full((len(batch), num_classes), 1.0 / num_classes, dtype=np.float32)
+    return model
+
+@pytest.fixture
+def app_model(uniform_model):
+    """The model the app fixture loads; override in a test module to use another"""
+    return uniform_model
+
+@pytest.fixture
+def app(monkeypatch, app_model):
+    """app.py on the Disease Detection page, with the model stubbed out"""
+    # AppTest runs app.py in this process, so the stubs replace the model the script would load
+    monkeypatch.setenv("PLANT_PRELOAD_MODEL", "0")
+    monkeypatch.setattr(inference, "load_model", lambda *args, **kwargs: app_model)
+    monkeypatch.setattr(embeddings, "load_classifier", lambda *args, **kwargs: app_model)
+    monkeypatch.setattr(inference, "model_version", lambda *args, **kwargs: "test")
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.run()
+    app.radio[0].set_value("Disease Detection").run()
+    yield app
+    st.cache_resource.clear()
+    st.cache_data.clear()
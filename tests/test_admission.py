@@ -0,0 +1,56 @@
+import io
+
+import pytest
+from PIL import Image
+
+import inference
+
+def encoded(size, fmt, mode="RGB"):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 128 if mode == "L" else None).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+def test_png_over_the_pixel_budget_is_rejected_from_its_header():
+    # 100 MP of 1-bit pixels compresses to a few KB: a cheap decompression bomb
+    data = encoded((10000, 10000), "PNG", mode="1")
+    with pytest.raises(inference.ImageRejected, match="the limit is"):
+        inference.probe_image(data)
+    with pytest.raises(inference.ImageRejected):
+        inference.load_image(data)
+
+def test_oversized_jpeg_is_decoded_at_reduced_scale():
+    data = encoded((2000, 1500), "JPEG", mode="L")
+    image, scale = inference.probe_image(data, max_pixels=1_000_000)
+    assert image.size == (2000, 1500)
+    assert scale == 2
+
+    opened = inference.open_image(data, max_pixels=1_000_000)
+    assert opened.size[0] * opened.size[1] <= 1_000_000
+    assert inference.load_image(data).size == inference.INPUT_SIZE
+
+def test_oversized_jpeg_is_rejected_under_the_reject_policy():
+    data = encoded((2000, 1500), "JPEG", mode="L")
+    with pytest.raises(inference.ImageRejected):
+        inference.probe_image(data, max_pixels=1_000_000, policy="reject")
+
+def test_file_over_the_byte_budget_is_rejected():
+    data = encoded((64, 64), "PNG")
+    with pytest.raises(inference.ImageRejected, match="MB"):
+        inference.probe_image(data, max_bytes=len(data) - 1)
+
+def test_image_within_budget_is_admitted(leaf_jpeg):
+    _, scale = inference.probe_image(leaf_jpeg)
+    assert scale == 1
+
+def test_rejection_message_shows_sub_megapixel_budgets():
+    data = encoded((1000, 1000), "PNG")
+    with pytest.raises(inference.ImageRejected, match=r"the limit is 0\.3 MP"):
+        inference.probe_image(data, max_pixels=300_000)
+
+def test_corrupt_single_upload_is_reported_not_raised(app):
+    app.file_uploader[0].set_value(("broken.jpg", b"not an image", "image/jpeg")).run()
+    assert not app.exception
+    [error] = app.error
+    assert error.value == "This image was not analyzed: broken.jpg could not be read as an image."
+    assert all(button.key != "analyze_image" for button in app.button)
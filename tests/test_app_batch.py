@@ -0,0 +1,28 @@
+import io
+
+import pytest
+from PIL import Image
+
+def png(size, mode="1"):
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+def test_batch_reports_budget_rejections_apart_from_unreadable_files(app, leaf_jpeg):
+    app.toggle[0].set_value(True).run()
+    app.file_uploader[0].set_value([
+        ("leaf.jpg", leaf_jpeg, "image/jpeg"),
+        ("huge.png", png((10000, 10000)), "image/png"),
+        ("broken.jpg", b"not an image", "image/jpeg"),
+    ]).run()
+    app.button[0].click().run()
+    assert not app.exception
+
+    warnings = [w.value for w in app.warning]
+    budget = next(w for w in warnings if "huge.png" in w)
+    unreadable = next(w for w in warnings if "broken.jpg" in w)
+    assert "Uploads are limited to" in budget and "broken.jpg" not in budget
+    assert "could not be read" in unreadable and "Uploads are limited to" not in unreadable
+    assert "UploadedFile" not in budget + unreadable
+    assert len(app.dataframe) == 1 and len(app.dataframe[0].value) == 1
@@ -0,0 +1,50 @@
+import functools
+
+from streamlit.testing.v1 import local_script_runner
+
+import metrics
+
+# Everything a full run of the Disease Detection page executes with an image uploaded
+FULL_RUN = {"page_setup": 1, "sidebar": 1, "detection": 1, "upload_preview": 1, "analysis_pane": 1}
+
+def section_counts():
+    return {dict(key)["section"]: value for key, value in
+            metrics.REGISTRY.values("plant_script_sections").items()}
+
+def sections_run(action):
+    before = section_counts()
+    action()
+    after = section_counts()
+    return {name: after[name] - before.get(name, 0) for name in after if after[name] != before.get(name, 0)}
+
+def click_in_fragment(app, monkeypatch):
+    """Click Analyze the way the browser does: a rerun scoped to the fragment holding the button
+
+    AppTest.run() always reruns the whole script, so the fragment ids it has
+    registered are put on the rerun request, as a widget event inside a
+    fragment would.
+    """
+    fragment_ids = list(app._fragment_storage._fragments)
+    with monkeypatch.context() as patch:
+        patch.setattr(local_script_runner, "RerunData",
+                      functools.partial(local_script_runner.RerunData, fragment_id_queue=fragment_ids))
+        app.button(key="analyze_image").click().run()
+
+def test_analyze_click_reruns_only_the_results_fragment(app, leaf_jpeg, monkeypatch):
+    upload = sections_run(lambda: app.file_uploader[0].set_value(("leaf.jpg", leaf_jpeg, "image/jpeg")).run())
+    assert not app.exception
+    assert upload == FULL_RUN
+
+    sections = sections_run(lambda: click_in_fragment(app, monkeypatch))
+    assert not app.exception
+    assert sections == {"analysis_pane": 1}
+    assert any("Primary Detection" in block.value for block in app.markdown)
+
+    cached = sections_run(lambda: click_in_fragment(app, monkeypatch))
+    assert cached == {"analysis_pane": 1}
+    assert any("Primary Detection" in block.value for block in app.markdown)
+
+def test_full_rerun_executes_every_section(app, leaf_jpeg):
+    app.file_uploader[0].set_value(("leaf.jpg", leaf_jpeg, "image/jpeg")).run()
+    assert sections_run(lambda: app.button(key="analyze_image").click().run()) == FULL_RUN
+    assert any("Primary Detection" in block.value for block in app.markdown)
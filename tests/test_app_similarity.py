@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+import embeddings
+import inference
+import metrics
+import similarity
+from benchmarks._common import synthetic_leaf
+
+DIM = 8
+
+
+class FakeSplitModel(embeddings.SplitModel):
+    """SplitModel without TensorFlow: the 'embedding' is a few mean pixel values"""
+
+    def __init__(self, num_classes):
+        rng = np.random.default_rng(0)
+        self.version = "fake"
+        self.head = embeddings.DenseHead([
+            ("affine", rng.standard_normal((DIM, num_classes)).astype(np.float32), np.zeros(num_classes, np.float32)),
+            ("act", "softmax"),
+        ])
+        self.embedded = 0
+
+    def embed(self, batch):
+        self.embedded += len(batch)
+        batch = np.asarray(batch, dtype=np.float32)
+        return batch.reshape(len(batch), DIM, -1).mean(axis=2)
+
+
+@pytest.fixture
+def app_model():
+    return FakeSplitModel(len(inference.load_class_names()))
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity, "SIMILARITY_DIR", str(tmp_path / "index"))
+    return tmp_path
+
+def build_index(directory, model, rows=range(3)):
+    class_names = inference.load_class_names()
+    folder = directory / "refs" / class_names[0]
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in rows:
+        path = folder / f"{i}.jpg"
+        path.write_bytes(synthetic_leaf(0.05, seed=i))
+        paths.append(str(path))
+    index = similarity.SimilarityIndex(str(directory / "index"), DIM, model.version, class_names)
+    vectors = model.embed(np.stack([inference.preprocess_image(inference.load_image(p)) for p in paths]))
+    index.add([f"{i:064x}" for i in rows], vectors, paths)
+
+def shows_similar(app):
+    return any("Similar Reference Leaves" in block.value for block in app.markdown)
+
+def similar_count(app):
+    return sum("% similar" in caption.value for caption in app.caption)
+
+def queued_images():
+    return metrics.REGISTRY.stage_summaries()["queue_wait"]["count"]
+
+def test_similar_leaves_reuse_the_forward_pass_and_appear_once_an_index_is_built(app, app_model, index_dir,
+                                                                                  leaf_jpeg):
+    app.file_uploader[0].set_value(("leaf.jpg", leaf_jpeg, "image/jpeg")).run()
+    app.button(key="analyze_image").click().run()
+    assert not app.exception
+    assert not shows_similar(app)
+    assert app_model.embedded == 1
+
+    build_index(index_dir, app_model)
+    app_model.embedded = 0
+    app.button(key="analyze_image").click().run()
+    assert not app.exception
+    assert shows_similar(app)
+    # The cached prediction's embedding from the first click is reused; no second backbone pass
+    assert app_model.embedded == 0
+
+def test_rows_built_while_the_app_runs_are_searched(app, app_model, index_dir, leaf_jpeg):
+    build_index(index_dir, app_model, rows=range(2))
+    app.file_uploader[0].set_value(("leaf.jpg", leaf_jpeg, "image/jpeg")).run()
+    app.button(key="analyze_image").click().run()
+    assert similar_count(app) == 2
+
+    build_index(index_dir, app_model, rows=range(2, 5))
+    app.button(key="analyze_image").click().run()
+    assert not app.exception
+    assert similar_count(app) == 4
+
+def test_missing_embedding_is_computed_through_the_scheduler(app, app_model, index_dir, leaf_jpeg):
+    app.file_uploader[0].set_value(("leaf.jpg", leaf_jpeg, "image/jpeg")).run()
+    app.button(key="analyze_image").click().run()
+    build_index(index_dir, app_model)
+    # As after a prediction cache hit from another session: no embedding from this session's pass
+    app.session_state["embedding_key"] = None
+    app_model.embedded = 0
+    queued = queued_images()
+    app.button(key="analyze_image").click().run()
+    assert not app.exception
+    assert shows_similar(app)
+    assert app_model.embedded == 1
+    assert queued_images() == queued + 1
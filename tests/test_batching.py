@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from batching import DynamicBatcher
+
+def image(value):
+    return np.full((224, 224, 3), value, dtype=np.uint8)
+
+@pytest.fixture
+def batcher_for():
+    batchers = []
+
+    def make(predict_fn, **kwargs):
+        batchers.append(DynamicBatcher(predict_fn, max_delay_ms=1, **kwargs))
+        return batchers[-1]
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+def test_each_caller_gets_its_own_row(batcher_for):
+    batcher = batcher_for(lambda batch: batch[:, 0, 0, :].copy(), max_batch_size=4)
+    futures = batcher.submit_many([image(i) for i in range(6)])
+    rows = [future.result(5) for future in futures]
+    np.testing.assert_allclose([row[0] for row in rows], np.arange(6) / 255, atol=1e-6)
+
+def test_embeddings_returned_alongside_predictions_reach_each_future(batcher_for):
+    batcher = batcher_for(lambda batch: (batch[:, 0, 0, :].copy(), batch[:, 0, 0, :2] * 2))
+    futures = batcher.submit_many([image(i) for i in range(3)])
+    for i, future in enumerate(futures):
+        future.result(5)
+        np.testing.assert_allclose(future.embedding, [2 * i / 255] * 2, atol=1e-6)
+
+def test_model_errors_reach_every_caller_in_the_batch(batcher_for):
+    def fail(batch):
+        raise RuntimeError("model failed")
+
+    batcher = batcher_for(fail)
+    for future in batcher.submit_many([image(0), image(1)]):
+        with pytest.raises(RuntimeError):
+            future.result(5)
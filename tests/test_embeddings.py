@@ -0,0 +1,135 @@
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+import embeddings
+import inference
+from benchmarks._common import synthetic_leaf
+from conftest import REPO_DIR
+
+DIM = 8
+
+def rows(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+def test_store_round_trips_and_skips_known_keys(tmp_path):
+    store = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert store.add(["a", "b", "a"], rows(3), ["a.jpg", "b.jpg", "a.jpg"]) == 2
+    assert store.add(["b", "c"], rows(2, seed=1), ["b.jpg", "c.jpg"]) == 1
+
+    reopened = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert reopened.keys == ["a", "b", "c"]
+    assert reopened.sources == ["a.jpg", "b.jpg", "c.jpg"]
+    np.testing.assert_allclose(reopened.get(["c"])[0], rows(2, seed=1)[1], atol=1e-3)
+    assert embeddings.store_versions(str(tmp_path)) == ["v1"]
+
+@pytest.mark.parametrize("tear", ["vector_tail", "key_tail", "both"])
+def test_store_reopens_at_the_last_complete_row_after_a_crash(tmp_path, tear):
+    store = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    store.add(["a", "b"], rows(2), ["a.jpg", "b.jpg"])
+    if tear in ("vector_tail", "both"):
+        # A crash mid-write: a partial row and a whole row with no key
+        with open(store._vectors_path, "ab") as f:
+            f.write(rows(1).astype(np.float16).tobytes() + b"\x00" * 5)
+    if tear in ("key_tail", "both"):
+        with open(store._keys_path, "a", encoding="utf-8") as f:
+            f.write("c\tc.j")
+
+    reopened = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert reopened.keys == ["a", "b"]
+    assert reopened.vectors().shape == (2, DIM)
+    np.testing.assert_allclose(reopened.vectors(), rows(2), atol=1e-3)
+
+    assert reopened.add(["c"], rows(1, seed=2), ["c.jpg"]) == 1
+    again = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert again.keys == ["a", "b", "c"]
+    np.testing.assert_allclose(again.get(["c"]), rows(1, seed=2), atol=1e-3)
+
+def test_store_drops_a_partial_row_behind_the_last_key(tmp_path):
+    store = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    store.add(["a", "b"], rows(2), ["a.jpg", "b.jpg"])
+    with open(store._vectors_path, "ab") as f:
+        f.write(b"\x00" * 5)
+
+    reopened = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert reopened.add(["c"], rows(1, seed=2), ["c.jpg"]) == 1
+    again = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert again.keys == ["a", "b", "c"]
+    np.testing.assert_allclose(again.vectors(), np.vstack([rows(2), rows(1, seed=2)]), atol=1e-3)
+
+# Dies in add() after the row is written but before its key is
+KILLED_BEFORE_KEYS = """
+import builtins, os, sys
+import numpy as np
+import embeddings
+store = embeddings.EmbeddingStore(sys.argv[1], {dim}, "v1")
+real_open = builtins.open
+def open_or_die(path, mode="r", *args, **kwargs):
+    if path == store._keys_path and "a" in mode:
+        os._exit(1)
+    return real_open(path, mode, *args, **kwargs)
+builtins.open = open_or_die
+store.add(["c"], np.full((1, {dim}), 9.0), ["c.jpg"])
+"""
+
+def test_store_recovers_from_a_kill_between_row_and_key_writes(tmp_path):
+    store = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    store.add(["a", "b"], rows(2), ["a.jpg", "b.jpg"])
+    child = subprocess.run([sys.executable, "-c", KILLED_BEFORE_KEYS.format(dim=DIM), str(tmp_path)],
+                           cwd=REPO_DIR)
+    assert child.returncode == 1
+
+    reopened = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert reopened.keys == ["a", "b"]
+    assert reopened.add(["c", "d"], rows(2, seed=2), ["c.jpg", "d.jpg"]) == 2
+    again = embeddings.EmbeddingStore(str(tmp_path), DIM, "v1")
+    assert again.keys == ["a", "b", "c", "d"]
+    np.testing.assert_allclose(again.get(["c", "d"]), rows(2, seed=2), atol=1e-3)
+
+class FakeEmbedder:
+    def embed(self, batch):
+        return np.asarray(batch).reshape(len(batch), -1)[:, :DIM]
+
+def test_embed_files_counts_missing_and_unreadable_files(tmp_path):
+    good = tmp_path / "leaf.jpg"
+    good.write_bytes(synthetic_leaf(0.05))
+    duplicate = tmp_path / "copy.jpg"
+    duplicate.write_bytes(good.read_bytes())
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    paths = [str(good), str(tmp_path / "missing.jpg"), str(broken), str(duplicate)]
+
+    store = embeddings.EmbeddingStore(str(tmp_path / "store"), DIM, "v1")
+    assert embeddings.embed_files(store, FakeEmbedder(), paths, batch_size=2) == (1, 2)
+    assert store.sources == [str(good)]
+
+def test_embed_files_decodes_on_the_ingest_pool_and_skips_stored_content(tmp_path, monkeypatch):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.jpg"
+        path.write_bytes(synthetic_leaf(0.05, seed=i))
+        paths.append(str(path))
+    decoded_on = []
+    load_image = inference.load_image
+
+    def recording_load_image(source, *args, **kwargs):
+        decoded_on.append(threading.current_thread().name)
+        return load_image(source, *args, **kwargs)
+    monkeypatch.setattr(inference, "load_image", recording_load_image)
+
+    store = embeddings.EmbeddingStore(str(tmp_path / "store"), DIM, "v1")
+    assert embeddings.embed_files(store, FakeEmbedder(), paths[:3], batch_size=2) == (3, 0)
+    assert len(decoded_on) == 3
+    assert all(name.startswith("ingest") for name in decoded_on)
+
+    decoded_on.clear()
+    progress = []
+    added = embeddings.embed_files(store, FakeEmbedder(), paths, batch_size=2,
+                                   progress=lambda *counts: progress.append(counts))
+    assert added == (2, 0)
+    assert len(decoded_on) == 2  # stored content is hashed, not decoded
+    assert progress[-1] == (5, 2, 0)
+    assert store.sources == paths
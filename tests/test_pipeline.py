@@ -0,0 +1,33 @@
+import numpy as np
+
+import inference
+from pipeline import IngestPipeline
+from benchmarks._common import synthetic_leaf
+
+def test_batches_keep_order_and_compact_unreadable_items():
+    items = [synthetic_leaf(0.05, seed=i) for i in range(7)]
+    items[2] = b"not an image"
+    expected = [inference.preprocess_image(inference.load_image(item)) for i, item in enumerate(items) if i != 2]
+
+    with IngestPipeline(batch_size=3, workers=2, prefetch=1) as ingest:
+        seen, rows = [], []
+        for chunk, errors, batch in ingest.batches(items):
+            seen.extend(chunk)
+            assert len(batch) == sum(error is None for error in errors)
+            rows.extend(np.array(batch))
+    assert seen == items
+    np.testing.assert_allclose(np.stack(rows), np.stack(expected))
+
+def test_single_item_uses_a_one_slot_buffer(leaf_jpeg):
+    with IngestPipeline(dtype=np.uint8) as ingest:
+        _, errors, batch = next(ingest.batches([leaf_jpeg]))
+    assert errors == [None]
+    assert batch.dtype == np.uint8
+    assert batch.base.shape[0] == 1
+
+def test_run_skips_the_model_for_batches_with_nothing_decoded():
+    calls = []
+    with IngestPipeline(batch_size=2) as ingest:
+        results = list(ingest.run([b"x", b"y"], lambda batch: calls.append(len(batch))))
+    assert calls == []
+    assert results[0][2] == [] and all(results[0][1])
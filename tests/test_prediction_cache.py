@@ -0,0 +1,59 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from prediction_cache import PredictionCache, cache_key
+
+def test_concurrent_misses_on_one_key_compute_once():
+    cache = PredictionCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return np.array([0.25, 0.75])
+
+    with ThreadPoolExecutor(8) as pool:
+        leader = pool.submit(cache.get_or_compute, "k", compute)
+        assert started.wait(5)
+        followers = [pool.submit(cache.get_or_compute, "k", compute) for _ in range(7)]
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] + stats["coalesced"] == 7
+
+def test_failed_computation_reaches_waiters_and_is_not_cached():
+    cache = PredictionCache()
+
+    def fail():
+        raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", fail)
+    assert cache.peek("k") is None
+    assert cache.get_or_compute("k", lambda: [1.0]).tolist() == [1.0]
+
+def test_lru_evicts_oldest_and_disk_tier_refills(tmp_path):
+    db = str(tmp_path / "cache.sqlite")
+    cache = PredictionCache(max_entries=2, db_path=db)
+    for key in "abc":
+        cache.put(key, [ord(key)])
+    assert cache.peek("a") is None
+    assert cache.get("a").tolist() == [ord("a")]
+
+    shared = PredictionCache(db_path=db)
+    assert shared.get("c").tolist() == [ord("c")]
+    assert shared.stats()["disk_hits"] == 1
+
+def test_key_depends_on_content_and_model_version():
+    assert cache_key(b"leaf", "v1") == cache_key(b"leaf", "v1")
+    assert cache_key(b"leaf", "v1") != cache_key(b"leaf", "v2")
+    assert cache_key(b"leaf", "v1") != cache_key(b"leaf2", "v1")
@@ -0,0 +1,28 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import inference
+from benchmarks._common import synthetic_leaf
+
+MAX_MEAN_DELTA = 0.01
+
+@pytest.mark.parametrize("megapixels", [0.3, 3, 12])
+def test_fast_decode_stays_close_to_full_resolution_preprocessing(megapixels):
+    data = synthetic_leaf(megapixels)
+    full = Image.open(io.BytesIO(data)).convert("RGB").resize(inference.INPUT_SIZE)
+    fast = inference.load_image(data)
+
+    assert fast.size == inference.INPUT_SIZE
+    delta = np.abs(inference.preprocess_image(fast) - inference.preprocess_image(full))
+    assert delta.mean() <= MAX_MEAN_DELTA
+
+def test_batch_buffer_matches_per_image_preprocessing(leaf_jpeg):
+    buffer = inference.BatchBuffer(2)
+    errors = inference.load_batch([leaf_jpeg, b"not an image"], buffer)
+
+    assert errors[0] is None and errors[1]
+    assert buffer.view().shape == (1, inference.INPUT_SIZE[1], inference.INPUT_SIZE[0], 3)
+    np.testing.assert_allclose(buffer.view()[0], inference.preprocess_image(inference.load_image(leaf_jpeg)))
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import inference
+import profiling
+from conftest import APP_PATH
+
+@pytest.fixture
+def run_profiled(monkeypatch, tmp_path):
+    """Run app.py once with PLANT_PROFILE=1, writing profiles under tmp_path"""
+    monkeypatch.setenv("PLANT_PRELOAD_MODEL", "0")
+    monkeypatch.setenv("PLANT_PROFILE", "1")
+    monkeypatch.setattr(profiling.RunProfiler.__init__, "__defaults__", ("run", str(tmp_path)))
+    st.cache_resource.clear()
+
+    def run():
+        return AppTest.from_file(APP_PATH, default_timeout=60).run()
+    yield run
+    st.cache_resource.clear()
+
+def test_profile_is_saved_after_a_full_run(run_profiled):
+    app = run_profiled()
+    assert not app.exception
+    [profile] = app.session_state["profiles"]
+    assert profile["label"] == "Home"
+    assert os.path.exists(profile["pstats"])
+
+def test_profile_of_a_run_that_raised_is_saved_by_the_next_run(run_profiled, monkeypatch):
+    with monkeypatch.context() as patch:
+        def broken():
+            raise RuntimeError("backend probe failed")
+        patch.setattr(inference, "available_backends", broken)
+        app = run_profiled()
+    assert app.exception
+
+    app.run()
+    assert not app.exception
+    interrupted, finished = app.session_state["profiles"]
+    assert interrupted["label"] == "Home (interrupted)"
+    assert os.path.exists(interrupted["collapsed"])
+    assert finished["label"] == "Home"
+
+def test_session_keeps_the_profile_when_the_block_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling.RunProfiler.__init__, "__defaults__", ("run", str(tmp_path)))
+    kept = []
+    with pytest.raises(RuntimeError):
+        with profiling.session(kept.append, "block") as profiler:
+            assert profiler.running
+            raise RuntimeError("stopped early")
+    assert not profiler.running
+    [artifacts] = kept
+    assert artifacts["label"] == "block"
+    assert os.path.exists(artifacts["pstats"])
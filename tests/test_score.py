@@ -0,0 +1,111 @@
+import argparse
+import json
+
+import pytest
+
+import inference
+import score
+from benchmarks._common import synthetic_leaf
+
+@pytest.fixture
+def images(tmp_path):
+    folder = tmp_path / "images"
+    for plant in ("apple", "tomato"):
+        (folder / plant).mkdir(parents=True)
+        for i in range(3):
+            (folder / plant / f"{i}.jpg").write_bytes(synthetic_leaf(0.05, seed=i))
+    (folder / "tomato" / "broken.jpg").write_bytes(b"not an image")
+    return folder
+
+@pytest.fixture
+def scored_paths(monkeypatch, uniform_model):
+    """Paths the stub model was asked to score, across every load"""
+    seen = []
+
+    def load_model(*args, **kwargs):
+        def model(batch):
+            seen.extend([None] * len(batch))
+            return uniform_model(batch)
+        return model
+    monkeypatch.setattr(inference, "load_model", load_model)
+    return seen
+
+def records(path):
+    return list(score.read_records(str(path)))
+
+def test_run_scores_every_image_and_records_unreadable_ones(images, tmp_path, scored_paths):
+    out = tmp_path / "scores.jsonl"
+    assert score.main(["run", str(images), "-o", str(out), "--batch-size", "2", "--top-k", "3"]) == 0
+
+    results = records(out)
+    assert [r["path"] for r in results] == score.list_images(str(images))
+    assert len(scored_paths) == 6
+    broken = [r for r in results if r["path"].endswith("broken.jpg")]
+    assert broken[0]["error"] and broken[0]["top_k"] == []
+    assert all(len(r["top_k"]) == 3 for r in results if "error" not in r)
+
+def test_run_resumes_after_a_torn_final_line(images, tmp_path, scored_paths):
+    out = tmp_path / "scores.jsonl"
+    score.main(["run", str(images), "-o", str(out), "--batch-size", "2"])
+    complete = out.read_text()
+    lines = complete.splitlines(keepends=True)
+    out.write_text("".join(lines[:3]) + lines[3][:10])
+    scored_paths.clear()
+
+    score.main(["run", str(images), "-o", str(out), "--batch-size", "2"])
+    assert len(scored_paths) == len(lines) - 3 - 1  # the unreadable file never reaches the model
+    assert [json.loads(line)["path"] for line in out.read_text().splitlines()] == \
+           [json.loads(line)["path"] for line in complete.splitlines()]
+
+def test_shards_partition_the_input_and_merge_back(images, tmp_path, scored_paths):
+    full = tmp_path / "full.jsonl"
+    score.main(["run", str(images), "-o", str(full)])
+    parts = []
+    for i in range(3):
+        part = tmp_path / f"part{i}.csv"
+        score.main(["run", str(images), "-o", str(part), "--shard", f"{i}/3"])
+        parts.append(part)
+
+    shard_paths = [{r["path"] for r in records(part)} for part in parts]
+    assert sum(len(paths) for paths in shard_paths) == len(records(full))
+    assert set.union(*shard_paths) == {r["path"] for r in records(full)}
+
+    merged = tmp_path / "merged.jsonl"
+    score.main(["merge", str(merged)] + [str(part) for part in parts])
+    expected = sorted(records(full), key=lambda r: r["path"])
+    for got, want in zip(records(merged), expected):
+        assert got["path"] == want["path"]
+        assert got.get("error", "") == want.get("error", "")
+        assert [e["class"] for e in got["top_k"]] == [e["class"] for e in want["top_k"]]
+    assert len(records(merged)) == len(expected)
+
+def test_parse_shard_rejects_out_of_range_indices():
+    assert score.parse_shard("1/4") == (1, 4)
+    for value in ("4/4", "-1/2", "1/0", "x"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            score.parse_shard(value)
+
+def test_top_k_must_be_positive_and_is_capped_at_the_class_count(images, tmp_path, scored_paths):
+    for value in ("0", "-2", "x"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            score.positive_int(value)
+        with pytest.raises(SystemExit):
+            score.main(["run", str(images), "-o", str(tmp_path / "bad.jsonl"), "--top-k", value])
+
+    out = tmp_path / "scores.csv"
+    assert score.main(["run", str(images), "-o", str(out), "--top-k", "100"]) == 0
+    num_classes = len(inference.load_class_names())
+    assert all(len(r["top_k"]) == num_classes for r in records(out) if "error" not in r)
+
+@pytest.mark.parametrize("name", ["scores.jsonl", "scores.csv"])
+def test_resume_with_a_different_top_k_is_refused(images, tmp_path, scored_paths, name):
+    out = tmp_path / name
+    score.main(["run", str(images), "-o", str(out), "--top-k", "3"])
+    lines = out.read_text().splitlines(keepends=True)
+    out.write_text("".join(lines[:3]))
+    partial = out.read_text()
+
+    assert score.main(["run", str(images), "-o", str(out), "--top-k", "5"]) == 2
+    assert out.read_text() == partial
+    assert score.main(["run", str(images), "-o", str(out), "--top-k", "3"]) == 0
+    assert all(len(r["top_k"]) == 3 for r in records(out) if "error" not in r)
@@ -0,0 +1,60 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import inference
+import server
+
+@pytest.fixture
+def serve(monkeypatch, uniform_model):
+    """Start the service on a free port around a given model; returns a request function"""
+    servers = []
+
+    def start(model=uniform_model):
+        monkeypatch.setattr(inference, "load_model", lambda *args, **kwargs: model)
+        monkeypatch.setattr(inference, "model_version", lambda *args, **kwargs: "test")
+        service = server.InferenceService("keras", None, max_batch_size=4, max_delay_ms=1, max_queue=16)
+        service.model_future.result(timeout=10)
+        handler = type("TestHandler", (server.Handler,), {"service": service, "max_body_bytes": 2**24})
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append((httpd, service))
+
+        def request(path, body, content_type="image/jpeg"):
+            connection = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+            connection.request("POST", path, body, {"Content-Type": content_type})
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        return request
+
+    yield start
+    for httpd, service in servers:
+        httpd.shutdown()
+        httpd.server_close()
+        service.batcher.close()
+
+def test_predict_returns_top_k_classes(serve, leaf_jpeg):
+    status, payload = serve()("/predict?top_k=3", leaf_jpeg)
+    assert status == 200
+    assert len(payload["predictions"][0]["top_k"]) == 3
+
+@pytest.mark.parametrize("value", ["0", "-1", "two"])
+def test_invalid_top_k_is_a_client_error(serve, leaf_jpeg, value):
+    status, payload = serve()(f"/predict?top_k={value}", leaf_jpeg)
+    assert status == 400
+    assert "top_k" in payload["error"]
+
+def test_model_failure_returns_a_json_500(serve, leaf_jpeg):
+    def broken(batch):
+        raise RuntimeError("out of memory")
+
+    status, payload = serve(broken)("/predict", leaf_jpeg)
+    assert status == 500
+    assert "out of memory" in payload["error"]
+
+def test_undecodable_body_is_rejected(serve):
+    status, _ = serve()("/predict", b"not an image")
+    assert status == 415
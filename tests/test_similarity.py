@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+import similarity
+
+DIM = 16
+CLASS_NAMES = ["Apple___healthy", "Tomato___Late_blight"]
+
+@pytest.fixture
+def index(tmp_path):
+    return similarity.SimilarityIndex(str(tmp_path), DIM, "v1", CLASS_NAMES)
+
+def fill(index, n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    sources = [f"refs/{CLASS_NAMES[i % 2]}/{i}.jpg" for i in range(n)]
+    index.add([f"{i:064x}" for i in range(n)], vectors, sources)
+    return vectors
+
+def test_exact_search_finds_the_query_row_first(index):
+    vectors = fill(index)
+    hits = index.search(vectors[7], k=3, exact=True)
+    assert hits[0]["path"] == "refs/Tomato___Late_blight/7.jpg"
+    assert hits[0]["class"] == "Tomato___Late_blight"
+    assert hits[0]["similarity"] == pytest.approx(1.0, abs=1e-2)
+
+def test_ivf_search_covers_rows_added_after_training(index):
+    vectors = fill(index)
+    index.train_ivf(lists=8, sample_rows=400)
+    late = np.random.default_rng(1).standard_normal(DIM).astype(np.float32)
+    index.add(["late"], late[None], [f"refs/{CLASS_NAMES[0]}/late.jpg"])
+    assert index.search(late, k=1, nprobe=1)[0]["path"].endswith("late.jpg")
+    assert index.search(vectors[3], k=1, nprobe=8)[0]["path"].endswith("/3.jpg")
+
+def test_train_ivf_on_an_empty_index_is_a_clear_error(index):
+    with pytest.raises(ValueError, match="empty"):
+        index.train_ivf(lists=8)
+    assert index.search(np.ones(DIM, np.float32)) == []
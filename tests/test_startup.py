@@ -0,0 +1,8 @@
+from benchmarks.bench_startup import cold_run
+
+def test_home_page_does_not_import_heavy_modules():
+    # The benchmark's own cold run: a fresh interpreter, since this process may already have imported them
+    result = cold_run()
+
+    assert not result["exception"]
+    assert result["heavy_modules"] == []
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import inference
+from taxonomy import Taxonomy
+
+@pytest.fixture(scope="module")
+def taxonomy():
+    return Taxonomy(inference.load_class_names())
+
+def softmax_rows(n, num_classes, seed=0):
+    logits = np.random.default_rng(seed).normal(size=(n, num_classes))
+    exp = np.exp(logits)
+    return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+def looped(taxonomy, row):
+    """The roll-ups the slow way, one class at a time"""
+    plants = {name: 0.0 for name in taxonomy.plant_names}
+    diseases = {name: 0.0 for name in taxonomy.disease_names}
+    healthy = 0.0
+    for name, p in zip(taxonomy.class_names, row):
+        plants[inference.get_plant_name(name)] += p
+        diseases[inference.get_disease_name(name)] += p
+        if inference.is_healthy(name):
+            healthy += p
+    return list(plants.values()), list(diseases.values()), healthy
+
+def test_ids_index_into_sorted_vocabularies(taxonomy):
+    assert taxonomy.num_classes == 38
+    assert taxonomy.plant_names == sorted(set(taxonomy.plant_names))
+    assert taxonomy.disease_names == sorted(set(taxonomy.disease_names))
+    for i, name in enumerate(taxonomy.class_names):
+        assert taxonomy.plant_name(i) == inference.get_plant_name(name)
+        assert taxonomy.disease_name(i) == inference.get_disease_name(name)
+        assert taxonomy.labels[i] == inference.format_disease_name(name)
+        assert taxonomy.healthy[i] == inference.is_healthy(name)
+    # Conditions shared across plants collapse to one id
+    assert taxonomy.num_diseases < taxonomy.num_classes
+
+def test_single_prediction_rollup_matches_a_loop(taxonomy):
+    row = softmax_rows(1, taxonomy.num_classes)[0]
+    plants, diseases, healthy = looped(taxonomy, row)
+    np.testing.assert_allclose(taxonomy.plant_probabilities(row), plants, atol=1e-6)
+    np.testing.assert_allclose(taxonomy.disease_probabilities(row), diseases, atol=1e-6)
+    assert taxonomy.healthy_probability(row) == pytest.approx(healthy, abs=1e-6)
+    rollup = taxonomy.rollup(row)
+    assert rollup["plant"].sum() == pytest.approx(1.0, abs=1e-5)
+    assert rollup["disease"].sum() == pytest.approx(1.0, abs=1e-5)
+    assert rollup["healthy"] + rollup["diseased"] == pytest.approx(1.0)
+
+def test_batch_rollup_matches_a_loop_row_by_row(taxonomy):
+    batch = softmax_rows(16, taxonomy.num_classes, seed=1)
+    rollup = taxonomy.rollup(batch)
+    assert rollup["plant"].shape == (16, taxonomy.num_plants)
+    assert rollup["disease"].shape == (16, taxonomy.num_diseases)
+    assert rollup["healthy"].shape == (16,)
+    for i, row in enumerate(batch):
+        plants, diseases, healthy = looped(taxonomy, row)
+        np.testing.assert_allclose(rollup["plant"][i], plants, atol=1e-6)
+        np.testing.assert_allclose(rollup["disease"][i], diseases, atol=1e-6)
+        assert rollup["healthy"][i] == pytest.approx(healthy, abs=1e-6)
+        assert rollup["top_plant"][i] == np.argmax(plants)
+    np.testing.assert_allclose(rollup["plant"].sum(axis=1), 1.0, atol=1e-5)
+    np.testing.assert_allclose(rollup["disease"].sum(axis=1), 1.0, atol=1e-5)
@@ -0,0 +1,34 @@
+import io
+
+import numpy as np
+
+from tta import AdaptiveTTA
+
+def unsure(images):
+    return np.full((len(images), 4), 0.25, dtype=np.float32)
+
+def test_slow_first_pass_still_runs_one_view():
+    tta = AdaptiveTTA(budget_ms=10)
+    assert tta.views_within_budget(first_pass_seconds=1.0) == 1
+
+def test_per_view_estimate_recovers_after_a_slow_start():
+    tta = AdaptiveTTA(budget_ms=100)
+    assert tta.views_within_budget(first_pass_seconds=1.0) == 1
+    for _ in range(20):
+        tta._record(1, 0.001)
+    assert tta.views_within_budget(first_pass_seconds=1.0) == len(tta.views)
+
+def test_uncertain_prediction_is_refined_even_over_budget(leaf_jpeg):
+    tta = AdaptiveTTA(threshold=0.9, budget_ms=0.001)
+    for _ in range(3):
+        probs, info = tta(unsure, io.BytesIO(leaf_jpeg))
+        # The budget is spent by the first pass alone, yet a view still runs and is timed
+        assert info["views"] >= 1
+        assert info["extra_ms"] > 0
+        np.testing.assert_allclose(probs, 0.25)
+    assert tta._seconds_per_view is not None
+
+def test_confident_prediction_is_left_alone(leaf_jpeg):
+    tta = AdaptiveTTA(threshold=0.2)
+    _, info = tta(unsure, io.BytesIO(leaf_jpeg))
+    assert info["views"] == 0
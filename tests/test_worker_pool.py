@@ -0,0 +1,51 @@
+import os
+import queue
+
+import pytest
+
+import inference
+import worker_pool
+
+@pytest.fixture
+def stub_model(monkeypatch, uniform_model):
+    monkeypatch.setattr(inference, "load_model", lambda *args, **kwargs: uniform_model)
+    monkeypatch.setattr(inference, "configure_threading", lambda *args, **kwargs: None)
+    yield
+    worker_pool._worker.clear()
+
+def test_worker_takes_its_core_set_and_reports_ready(stub_model):
+    core_sets, ready = queue.Queue(), queue.Queue()
+    cores = worker_pool.available_cores()
+    core_sets.put(cores)
+    worker_pool._init_worker("keras", None, None, 1, core_sets, ready)
+    assert worker_pool._worker["cores"] == cores
+    assert ready.get_nowait() == (os.getpid(), None)
+
+def test_respawned_worker_falls_back_to_all_cores(stub_model):
+    # multiprocessing.Pool respawns a crashed worker after the core sets were handed out
+    ready = queue.Queue()
+    worker_pool._init_worker("keras", None, None, 1, queue.Queue(), ready)
+    assert worker_pool._worker["cores"] == worker_pool.available_cores()
+    assert ready.get_nowait() == (os.getpid(), None)
+
+def test_worker_reports_a_failed_load(monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("no model file")
+    monkeypatch.setattr(inference, "load_model", fail)
+    ready = queue.Queue()
+    with pytest.raises(OSError):
+        worker_pool._init_worker("tflite-fp32", None, None, 1, queue.Queue(), ready)
+    pid, error = ready.get_nowait()
+    assert "no model file" in error
+
+def test_wait_ready_raises_when_workers_cannot_load(tmp_path):
+    pool = worker_pool.InferencePool(1, "tflite-fp32", path=str(tmp_path / "missing.tflite"))
+    try:
+        with pytest.raises(RuntimeError, match="failed to load"):
+            pool.wait_ready(timeout=120)
+    finally:
+        pool.terminate()
+
+def test_partition_cores_covers_every_worker():
+    sets = worker_pool.partition_cores(3)
+    assert len(sets) == 3 and all(sets)
@@ -0,0 +1,122 @@
+import io
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+import inference
+import metrics
+
+# ===============================================================
+# Tiled sliding-window inference
+# ===============================================================
+# The standard path squeezes a whole photo into one 224x224 input, which
+# erases small lesions on canopy and field shots. Tiled mode cuts the photo
+# into overlapping model-sized tiles at (up to) full resolution, scores them
+# in batches and rolls the tiles up into an image-level verdict plus a
+# per-tile disease map. When the full-resolution grid would exceed the tile
+# cap, the photo is analysed at the largest scale whose grid fits.
+
+TILE_SIZE = inference.INPUT_SIZE[0]
+TILE_OVERLAP = float(os.environ.get("PLANT_TILE_OVERLAP", "0.25"))
+MAX_TILES = int(os.environ.get("PLANT_MAX_TILES", "256"))
+TILE_BATCH = int(os.environ.get("PLANT_TILE_BATCH", "32"))
+DISEASED_TILE = 0.5
+
+def tile_origins(length, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Tile offsets along one axis: evenly spread, overlapping, the last one flush with the edge"""
+    if length <= tile:
+        return np.zeros(1, dtype=int)
+    count = math.ceil((length - tile) / (tile * (1 - overlap))) + 1
+    return np.linspace(0, length - tile, count).round().astype(int)
+
+def plan_tiles(size, scale_limit=1.0, max_tiles=MAX_TILES, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Working scale, working size and tile offsets for an image of ``size``
+
+    ``scale_limit`` is the largest scale the admission budget allows. Images
+    whose short side is below one tile are scaled up to it.
+    """
+    width, height = size
+    floor = tile / min(width, height)
+    scale = max(min(1.0, scale_limit), floor)
+    while True:
+        working = (max(tile, round(width * scale)), max(tile, round(height * scale)))
+        xs, ys = tile_origins(working[0], tile, overlap), tile_origins(working[1], tile, overlap)
+        if len(xs) * len(ys) <= max_tiles or scale <= floor:
+            break
+        scale = max(floor, scale * 0.9)
+    return {"scale": scale, "size": working, "xs": xs, "ys": ys}
+
+def plan_for(source, max_tiles=MAX_TILES):
+    """Tile plan for an upload, read from its header only"""
+    image, draft_scale = inference.probe_image(source)
+    return plan_tiles(image.size, 1.0 / draft_scale, max_tiles)
+
+def open_tiled(source, max_tiles=MAX_TILES):
+    """Decode an upload at its tiling scale; returns the RGB image and its tile plan"""
+    plan = plan_for(source, max_tiles)
+    image = inference.open_image(source, plan["size"])
+    with metrics.timed("decode"):
+        image = image.convert("RGB")
+    if image.size != plan["size"]:
+        image = inference.resize_image(image, plan["size"])
+    return image, plan
+
+def predict_tiles(predict_many, image, plan, batch_size=TILE_BATCH):
+    """Per-tile probabilities, row-major over the plan's grid: (rows * cols, num_classes)
+
+    ``predict_many`` maps a list of tile images to one row of probabilities
+    each; tiles are cropped and submitted ``batch_size`` at a time so only
+    one batch of crops is alive at once.
+    """
+    origins = [(x, y) for y in plan["ys"] for x in plan["xs"]]
+    outputs = []
+    for start in range(0, len(origins), batch_size):
+        with metrics.timed("tile"):
+            tiles = [image.crop((x, y, x + TILE_SIZE, y + TILE_SIZE))
+                     for x, y in origins[start:start + batch_size]]
+        outputs.append(np.asarray(predict_many(tiles), dtype=np.float32))
+    metrics.count("plant_tiles_predicted", "Tiles scored in tiled mode", amount=len(origins))
+    return np.concatenate(outputs)
+
+def aggregate(tile_probs, plan, taxonomy, threshold=DISEASED_TILE):
+    """Image-level verdict and disease map from per-tile probabilities
+
+    The verdict averages the tiles that look diseased, so a few lesions are
+    not outvoted by the healthy canopy around them; with no such tile it
+    averages every tile.
+    """
+    rows, cols = len(plan["ys"]), len(plan["xs"])
+    tile_probs = np.asarray(tile_probs, dtype=np.float32).reshape(rows * cols, -1)
+    diseased = taxonomy.rollup(tile_probs)["diseased"]
+    affected = diseased >= threshold
+    preds = tile_probs[affected].mean(axis=0) if affected.any() else tile_probs.mean(axis=0)
+    return {
+        "preds": preds,
+        "heatmap": diseased.reshape(rows, cols),
+        "affected_share": float(affected.mean()),
+        "tiles": rows * cols,
+    }
+
+def heatmap_overlay(image, plan, heatmap, alpha=0.55, quality=85):
+    """Tint a preview image red where tiles look diseased; returns JPEG bytes
+
+    Overlapping tiles are averaged per pixel, at the preview's resolution.
+    """
+    image = image.convert("RGB")
+    fx, fy = image.width / plan["size"][0], image.height / plan["size"][1]
+    total = np.zeros((image.height, image.width), dtype=np.float32)
+    hits = np.zeros_like(total)
+    for r, y in enumerate(plan["ys"]):
+        top, bottom = round(y * fy), round((y + TILE_SIZE) * fy)
+        for c, x in enumerate(plan["xs"]):
+            left, right = round(x * fx), round((x + TILE_SIZE) * fx)
+            total[top:bottom, left:right] += heatmap[r, c]
+            hits[top:bottom, left:right] += 1
+    weight = (alpha * total / np.maximum(hits, 1))[..., None]
+    pixels = np.asarray(image, dtype=np.float32)
+    tinted = pixels * (1 - weight) + np.array([220, 38, 38], dtype=np.float32) * weight
+    out = io.BytesIO()
+    Image.fromarray(tinted.astype(np.uint8)).save(out, "JPEG", quality=quality)
+    return out.getvalue()
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+import inference
+import metrics
+
+# ===============================================================
+# Adaptive test-time augmentation
+# ===============================================================
+# Borderline predictions are re-scored on flipped, cropped and slightly
+# rotated views of the same photo and the softmax outputs are averaged. The
+# views go to the model together, so they share one forward pass, and only
+# when the first pass is below the confidence threshold. The number of views
+# is capped so the extra pass fits the latency budget, using the measured
+# cost per view of earlier augmented passes. At least one view always runs,
+# so an estimate seeded by a slow first pass (queue wait included) keeps
+# being re-measured instead of switching augmentation off for good.
+
+TTA_THRESHOLD = float(os.environ.get("PLANT_TTA_THRESHOLD", "0.75"))
+TTA_BUDGET_MS = float(os.environ.get("PLANT_TTA_BUDGET_MS", "500"))
+
+# Ordered by usefulness, so a tight budget keeps the strongest views
+VIEWS = ("hflip", "crop_center", "rotate_cw", "rotate_ccw", "vflip", "crop_top_left", "crop_bottom_right")
+CROP_FRACTION = 0.85
+ROTATION_DEGREES = 10
+
+
+def _crop(image, anchor):
+    width, height = image.size
+    w, h = int(width * CROP_FRACTION), int(height * CROP_FRACTION)
+    left = {"center": (width - w) // 2, "top_left": 0, "bottom_right": width - w}[anchor]
+    top = {"center": (height - h) // 2, "top_left": 0, "bottom_right": height - h}[anchor]
+    return image.crop((left, top, left + w, top + h))
+
+def working_image(image, size=inference.INPUT_SIZE):
+    """Shrink a decoded photo so every crop still covers the model input
+
+    Augmenting at this size instead of the decoded one keeps the rotations
+    cheap; the views are resized to the input size anyway.
+    """
+    scale = max(size[0] / image.width, size[1] / image.height) / CROP_FRACTION
+    if scale >= 1:
+        return image
+    target = (max(size[0], round(image.width * scale)), max(size[1], round(image.height * scale)))
+    return image.resize(target, Image.BICUBIC, reducing_gap=inference.REDUCING_GAP)
+
+def augment(image, view):
+    """One augmented view of a decoded RGB image, resized to the model input"""
+    if view == "hflip":
+        image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    elif view == "vflip":
+        image = image.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+    elif view.startswith("crop_"):
+        image = _crop(image, view[len("crop_"):])
+    elif view in ("rotate_cw", "rotate_ccw"):
+        angle = -ROTATION_DEGREES if view == "rotate_cw" else ROTATION_DEGREES
+        # Crop the centre afterwards so the blank rotated corners drop out
+        image = _crop(image.rotate(angle, Image.BILINEAR), "center")
+    else:
+        raise ValueError(f"unknown augmentation {view!r}")
+    return inference.resize_image(image)
+
+
+class AdaptiveTTA:
+    """Average augmented views into uncertain predictions, within a latency budget"""
+
+    def __init__(self, threshold=TTA_THRESHOLD, budget_ms=TTA_BUDGET_MS, views=VIEWS):
+        self.threshold = threshold
+        self.budget_ms = budget_ms
+        self.views = tuple(views)
+        self._seconds_per_view = None
+        self._lock = threading.Lock()
+
+    def views_within_budget(self, first_pass_seconds):
+        """How many views the augmented pass can afford
+
+        Before any augmented pass has been timed, each view is assumed to
+        cost as much as the whole first pass. Never fewer than one, so the
+        per-view estimate is refreshed and can recover from a slow start.
+        """
+        with self._lock:
+            per_view = self._seconds_per_view or first_pass_seconds
+        if per_view <= 0:
+            return len(self.views)
+        return int(max(1, min(len(self.views), self.budget_ms / 1000 / per_view)))
+
+    def _record(self, views, seconds):
+        per_view = seconds / views
+        with self._lock:
+            previous = self._seconds_per_view
+            self._seconds_per_view = per_view if previous is None else 0.8 * previous + 0.2 * per_view
+
+    def __call__(self, predict_many, source, force=False):
+        """Predict one image, adding augmented views when the first pass is unsure
+
+        ``predict_many`` maps a list of model-sized images to one row of
+        probabilities each, ideally as a single batch. Returns the
+        probabilities and a dict describing what was done.
+        """
+        decoded = inference.decode_image(source)
+        start = time.perf_counter()
+        first = np.asarray(predict_many([inference.resize_image(decoded)])[0])
+        first_seconds = time.perf_counter() - start
+        confidence = float(first.max())
+        info = {"first_confidence": confidence, "views": 0, "extra_ms": 0.0}
+        if confidence >= self.threshold and not force:
+            return first, info
+
+        n_views = self.views_within_budget(first_seconds)
+        start = time.perf_counter()
+        with metrics.timed("tta"):
+            working = working_image(decoded)
+            images = [augment(working, view) for view in self.views[:n_views]]
+            outputs = np.asarray(predict_many(images))
+        elapsed = time.perf_counter() - start
+        self._record(n_views, elapsed)
+        metrics.count("plant_tta_passes", "Predictions refined with test-time augmentation")
+        info.update(views=n_views, extra_ms=elapsed * 1000)
+        return (first + outputs.sum(axis=0)) / (n_views + 1), info
@@ -0,0 +1,170 @@
+import collections
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+import inference
+
+# ===============================================================
+# Multi-process inference pool
+# ===============================================================
+# One Python process cannot use a large node well: the GIL is held during
+# pre/post-processing and a single TF runtime's default thread pools do not
+# match a per-image workload. Each pool worker instead loads its own copy of
+# the model once, is pinned to a disjoint set of cores, and sizes TF's
+# intra-op pool to those cores (inter-op to 1), so workers do not fight over
+# the same CPUs and throughput scales with the worker count.
+
+_worker = {}
+
+def available_cores():
+    """CPUs this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def partition_cores(workers):
+    """Split the CPUs this process may run on into ``workers`` contiguous core sets"""
+    cores = available_cores()
+    per_worker = max(1, len(cores) // workers)
+    return [cores[i * per_worker:(i + 1) * per_worker] or cores for i in range(workers)]
+
+def _init_worker(backend, path, intra_op_threads, inter_op_threads, core_sets, ready):
+    try:
+        # A worker respawned after a crash finds the core sets already handed out
+        cores = core_sets.get_nowait()
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+    except queue.Empty:
+        cores = available_cores()
+    try:
+        threads = intra_op_threads or len(cores)
+        if backend == "keras":
+            inference.configure_threading(threads, inter_op_threads)
+        _worker["model"] = inference.load_model(backend, path=path, threads=threads)
+        _worker["buffer"] = inference.BatchBuffer(1)
+        _worker["cores"] = cores
+    except BaseException as exc:
+        ready.put((os.getpid(), f"{type(exc).__name__}: {exc}"))
+        raise
+    ready.put((os.getpid(), None))
+
+def _score_paths(paths):
+    """Decode and score one batch of files inside a worker"""
+    buffer = _worker["buffer"]
+    if buffer.capacity < len(paths):
+        buffer = _worker["buffer"] = inference.BatchBuffer(len(paths))
+    errors = inference.load_batch(paths, buffer)
+    predictions = inference.predict_batch(_worker["model"], buffer.view()) if buffer.count else []
+    return errors, predictions
+
+def _predict_array(batch):
+    """Score an already-decoded batch; uint8 input is normalized here to keep IPC payloads small"""
+    if batch.dtype == np.uint8:
+        batch = np.multiply(batch, inference.PIXEL_SCALE, dtype=np.float32)
+    return inference.predict_batch(_worker["model"], batch)
+
+def _worker_cores():
+    return os.getpid(), _worker["cores"]
+
+
+class InferencePool:
+    """Process pool where every worker holds its own pinned, thread-tuned model"""
+
+    def __init__(self, workers, backend="keras", path=None, intra_op_threads=None,
+                 inter_op_threads=1, max_pending=None):
+        ctx = multiprocessing.get_context("spawn")
+        core_sets = ctx.Queue()
+        for cores in partition_cores(workers):
+            core_sets.put(cores)
+        self._ready = ctx.Queue()
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self._pool = ctx.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(backend, path, intra_op_threads, inter_op_threads, core_sets, self._ready),
+        )
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded its model; raises if a worker failed to
+
+        Each worker reports once its initializer finishes, so this does not
+        rely on tasks happening to be spread across all workers.
+        """
+        loaded = set()
+        while len(loaded) < self.workers:
+            try:
+                pid, error = self._ready.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError(f"{len(loaded)} of {self.workers} workers loaded within {timeout}s")
+            if error is not None:
+                raise RuntimeError(f"inference worker {pid} failed to load the model: {error}")
+            loaded.add(pid)
+        return self
+
+    def imap_paths(self, batches):
+        """Score batches of file paths in order, keeping at most max_pending batches in flight
+
+        Yields (errors, predictions) per batch: one error string or None per
+        path, and one row of probabilities per path that decoded.
+        """
+        pending = collections.deque()
+        for paths in batches:
+            pending.append(self._pool.apply_async(_score_paths, (paths,)))
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def predict(self, batch):
+        """Blocking forward pass on whichever worker is free; safe to call from several threads"""
+        return self._pool.apply_async(_predict_array, (batch,)).get()
+
+    __call__ = predict
+
+    def core_assignment(self):
+        """Map of worker pid to pinned cores, for diagnostics"""
+        results = [self._pool.apply_async(_worker_cores) for _ in range(self.workers * 4)]
+        return dict(r.get() for r in results)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
+
+
+def start_pool_async(workers, backend="keras", path=None, intra_op_threads=None):
+    """Start an InferencePool on a background thread; the Future resolves once every worker has loaded"""
+    future = Future()
+
+    def target():
+        try:
+            pool = InferencePool(workers, backend, path=path, intra_op_threads=intra_op_threads)
+            try:
+                pool.wait_ready()
+            except BaseException:
+                pool.terminate()
+                raise
+            future.set_result(pool)
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=target, name="start-inference-pool", daemon=True).start()
+    return future